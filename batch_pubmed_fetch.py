@@ -1,15 +1,30 @@
 import time
-import pandas as pd
 import argparse
 import sys
 import os
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 # 親ディレクトリへのパスを追加
 sys.path.append(str(Path(__file__).parent.parent))
 
 # pubmed_api モジュールをインポート
-from pubmed_api import fetch_pubmed_studies, get_pubmed_article_details, update_papers_csv
+from pubmed_api import (
+    fetch_pubmed_studies,
+    get_pubmed_article_details,
+    fetch_pubmed_xml,
+    enrich_xml_chunks,
+    update_papers_csv,
+    upsert_papers_csv,
+    load_known_pmids,
+    get_api_key,
+    get_rate_limiter,
+    get_pubmed_client
+)
+from evidence_db import get_evidence_db
+from pubmed_cache import get_pubmed_cache
+from pubmed_sync import SyncState
 
 # 歯科矯正関連の検索キーワードリスト
 ORTHO_KEYWORDS = [
@@ -47,10 +62,59 @@ ORTHO_KEYWORDS = [
     "japanese malocclusion prevalence"
 ]
 
-def batch_fetch_articles(keywords=None, max_per_keyword=30, days_recent=365, pause_seconds=3):
+# efetch 1回あたりに要求するPMIDの最大数
+EFETCH_BATCH_SIZE = 200
+
+# 差分同期の検索1回あたりの最大件数（esearch の retmax の上限）
+SYNC_MAX_RESULTS = 10000
+
+def search_keyword(keyword, max_per_keyword=30, days_recent=365, pause_seconds=0, window=None):
+    """
+    1つのキーワードで検索（esearch）し、ヒットしたPMIDのリストを返します。
+    
+    window（更新日の範囲 (mindate, maxdate)）を指定した場合は、その期間に
+    追加・更新された論文をすべて検索します（差分同期）。
+    ワーカースレッドから呼ばれるため、CSVへの書き込みは行いません。
+    """
+    if window is None:
+        search_results = fetch_pubmed_studies(keyword, max_per_keyword, days_recent)
+    else:
+        search_results = fetch_pubmed_studies(keyword, SYNC_MAX_RESULTS, mindate=window[0], maxdate=window[1])
+    
+    if 'esearchresult' not in search_results or 'idlist' not in search_results['esearchresult']:
+        raise ValueError(f"検索結果が無効な形式です: {search_results}")
+    
+    if window is not None:
+        # 件数のない結果（通信エラー・オフラインでの未キャッシュ）は同期日を進めないようエラーにする
+        if 'count' not in search_results['esearchresult']:
+            raise ValueError("更新分の検索結果を取得できませんでした")
+        if int(search_results['esearchresult']['count']) > SYNC_MAX_RESULTS:
+            print(f"  '{keyword}': 更新が{SYNC_MAX_RESULTS}件を超えたため、一部のみ取得します")
+    
+    # 追加の待機が指定されている場合のみ待つ（通常の間隔はレート制限が管理）
+    if pause_seconds > 0:
+        time.sleep(pause_seconds)
+    
+    return search_results['esearchresult']['idlist']
+
+def batch_fetch_articles(keywords=None, max_per_keyword=30, days_recent=365, pause_seconds=0, workers=1, processes=1,
+                         incremental=False, state_file='pubmed_sync.json'):
     """
     一連のキーワードから論文をバッチで取得し、CSVに保存します
     
+    取得は2段階で行います。
+    1. 全キーワードで検索し、PMIDの和集合と各PMIDにヒットしたキーワードを記録
+    2. データベースに未登録のPMIDだけを最大 EFETCH_BATCH_SIZE 件ずつまとめて詳細取得
+    
+    各段階のリクエストは最大 workers 個を並行して実行し、CSVへの書き込みは
+    メインスレッドだけが順に行います。送信間隔は pubmed_api のレート制限が管理します。
+    
+    差分同期（incremental=True）では、同期済みのキーワードは前回の同期日以降に
+    追加・更新（mdat）された論文だけを検索します。登録済みの論文が見つかった場合は
+    更新されたものとしてキャッシュを使わずに取得し直し、内容が変わった行だけを
+    上書きします。すべて成功した場合に限り、キーワードごとの同期日を更新します
+    （pubmed_sync.SyncState を参照）。未同期のキーワードは通常どおり検索します。
+    
     Parameters:
     -----------
     keywords : list of str
@@ -60,102 +124,215 @@ def batch_fetch_articles(keywords=None, max_per_keyword=30, days_recent=365, pau
     days_recent : int
         何日前までの論文を検索するか
     pause_seconds : int
-        APIリクエスト間の待機秒数（レート制限対策）
+        キーワード間に追加で挟む待機秒数（通常は不要。リクエスト間隔は
+        pubmed_api のレート制限が自動で調整します）
+    workers : int
+        並行して処理するリクエスト数
+    processes : int
+        論文XMLの解析・分類に使うプロセス数（1の場合は取得と同じスレッドで処理）
+    incremental : bool
+        差分同期を行うかどうか
+    state_file : str
+        差分同期の状態ファイルのパス
     
     Returns:
     --------
     int
-        取得・保存された総論文数
+        新たに追加した論文数（上書き・更新した論文は含みません）
     """
     if keywords is None:
         keywords = ORTHO_KEYWORDS
     
     total_articles = 0
     total_new_articles = 0
+    total_updated_articles = 0
+    failed = False
     
-    # APIキーの存在を確認
-    api_key = os.environ.get("NCBI_API_KEY")
+    # APIキーの存在を確認（レート制限はキーの有無に応じて自動で選択される）
+    api_key = get_api_key()
+    limiter = get_rate_limiter(api_key)
     if api_key:
-        print(f"NCBIのAPIキーが見つかりました。より高いレート制限でリクエストを実行します。")
-        # APIキーがある場合は待機時間を短縮可能
-        actual_pause = max(1, pause_seconds // 3)  # 最低1秒
+        print(f"NCBIのAPIキーが見つかりました。毎秒{limiter.rate:g}リクエストでリクエストを実行します。")
     else:
-        print(f"NCBIのAPIキーが見つかりません。標準のレート制限でリクエストを実行します。")
+        print(f"NCBIのAPIキーが見つかりません。毎秒{limiter.rate:g}リクエストの標準レート制限でリクエストを実行します。")
         print(f"より効率的な取得には、APIキーを設定することをお勧めします。詳細は README.md を参照してください。")
-        actual_pause = pause_seconds
     
-    print(f"開始: {len(keywords)}個のキーワードから論文を取得します")
+    workers = max(1, workers)
+    print(f"開始: {len(keywords)}個のキーワードから論文を取得します（並行数: {workers}）")
+    
+    # 登録済みPMID（ストアのキーインデックスから取得）
+    known_pmids = load_known_pmids('papers.csv')
+    
+    # 差分同期: 同期済みのキーワードは前回の同期日以降の更新だけを検索する
+    today = date.today()
+    sync_state = SyncState(state_file) if incremental else None
+    windows = {keyword: sync_state.search_window(keyword, today) if sync_state else None for keyword in keywords}
+    if sync_state:
+        synced = sum(1 for window in windows.values() if window)
+        print(f"差分同期: 同期済み{synced}個のキーワードは更新分のみ、{len(keywords) - synced}個は通常どおり検索します")
     
-    for i, keyword in enumerate(keywords):
-        print(f"\n[{i+1}/{len(keywords)}] キーワード: '{keyword}'")
+    client = get_pubmed_client()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 1. 全キーワードで検索し、PMIDごとにヒットしたキーワードを記録
+        print("\n[1/2] PubMed検索中...")
+        pmid_keywords = {}
+        keyword_pmids = {}
+        revised = set()
+        keyword_hits = 0
+        keywords_with_hits = 0
+        futures = {
+            executor.submit(search_keyword, keyword, max_per_keyword, days_recent, pause_seconds,
+                            windows[keyword]): keyword
+            for keyword in keywords
+        }
         
-        try:
-            # 検索実行
-            print(f"  PubMed検索中...")
-            search_results = fetch_pubmed_studies(keyword, max_per_keyword, days_recent)
+        for future in as_completed(futures):
+            keyword = futures[future]
+            try:
+                pmid_list = future.result()
+            except Exception as e:
+                print(f"  '{keyword}': エラーが発生しました: {str(e)}")
+                continue
             
-            if 'esearchresult' in search_results and 'idlist' in search_results['esearchresult']:
-                pmid_list = search_results['esearchresult']['idlist']
-                
-                if pmid_list:
-                    print(f"  {len(pmid_list)}件の論文が見つかりました")
-                    
-                    # 論文詳細の取得
-                    print(f"  論文詳細を取得中...")
-                    articles = get_pubmed_article_details(pmid_list)
-                    
-                    # CSVに追加
-                    if articles:
-                        # CSVファイルの存在確認
-                        csv_exists = os.path.exists('papers.csv')
-                        
-                        # CSVファイルを更新
-                        updated_df = update_papers_csv(articles)
-                        
-                        # 新規追加論文数（CSVが存在した場合）
-                        if csv_exists:
-                            new_articles = len(articles) - (len(updated_df) - len(articles))
-                            total_new_articles += new_articles
-                            print(f"  {new_articles}件の新規論文をデータベースに追加しました")
-                        else:
-                            total_new_articles += len(articles)
-                            print(f"  {len(articles)}件の論文をデータベースに追加しました")
-                        
-                        total_articles += len(articles)
-                    else:
-                        print("  論文詳細の取得に失敗しました")
-                else:
-                    print("  該当する論文が見つかりませんでした")
+            window = windows[keyword]
+            if window:
+                print(f"  '{keyword}': {len(pmid_list)}件（{window[0]}以降の追加・更新）")
+                # 登録済みの論文は更新されたもの（同じ日の前回の実行で取得済みのものを除く）
+                fetched_today = sync_state.fetched_today(keyword, today)
+                revised.update(pmid for pmid in pmid_list if pmid in known_pmids and pmid not in fetched_today)
             else:
-                print(f"  検索結果が無効な形式です: {search_results}")
+                print(f"  '{keyword}': {len(pmid_list)}件")
+            keyword_pmids[keyword] = pmid_list
+            if pmid_list:
+                keywords_with_hits += 1
+                keyword_hits += len(pmid_list)
+            for pmid in pmid_list:
+                pmid_keywords.setdefault(pmid, []).append(keyword)
         
-        except Exception as e:
-            print(f"  エラーが発生しました: {str(e)}")
+        pending = [pmid for pmid in pmid_keywords if pmid not in known_pmids]
+        revised_pmids = [pmid for pmid in pmid_keywords if pmid in revised]
+        print(f"  延べ{keyword_hits}件、重複を除いて{len(pmid_keywords)}件、"
+              f"うち未登録{len(pending)}件" + (f"、更新を確認する登録済み{len(revised_pmids)}件" if sync_state else ""))
         
-        # 次のリクエストまで待機（レート制限対策）
-        if i < len(keywords) - 1:
-            print(f"  次のキーワードまで{actual_pause}秒待機中...")
-            time.sleep(actual_pause)
+        # 2. 未登録のPMID（差分同期では更新された登録済みのPMIDも）だけをまとめて詳細取得
+        # 更新された論文はキャッシュの古いレコードを使わずに取得し直す
+        print(f"\n[2/2] 論文詳細を取得中...")
+        batches = [(pending[i:i + EFETCH_BATCH_SIZE], False) for i in range(0, len(pending), EFETCH_BATCH_SIZE)]
+        batches += [(revised_pmids[i:i + EFETCH_BATCH_SIZE], True)
+                    for i in range(0, len(revised_pmids), EFETCH_BATCH_SIZE)]
+        fetched_count = len(pending) + len(revised_pmids)
+        bytes_before = client.stats()['bytes_received']
+        
+        def store_articles(batch_label, articles):
+            # 書き込みはメインスレッドだけが順に行う
+            nonlocal total_new_articles, total_updated_articles, total_articles, failed
+            print(f"\n[{batch_label}] {len(articles)}件の論文を保存")
+            
+            if not articles:
+                print("  論文詳細の取得に失敗しました")
+                failed = True
+                return
+            
+            # どのキーワードでヒットしたかを付与
+            for article in articles:
+                article['matched_keywords'] = pmid_keywords.get(article['pmid'], [])
+            
+            try:
+                if sync_state:
+                    # 登録済みの論文は内容が変わっていれば上書き
+                    new_articles, updated_articles = upsert_papers_csv(articles)
+                    total_updated_articles += updated_articles
+                else:
+                    # CSVファイルに追記（戻り値は新規追加論文数）
+                    new_articles = update_papers_csv(articles)
+            except Exception as e:
+                # 保存できなかった論文は次回の差分同期で取得し直す（同期日を進めない）
+                print(f"  CSVファイル更新エラー: {e}")
+                failed = True
+                return
+            
+            total_new_articles += new_articles
+            total_articles += len(articles)
+            print(f"  {new_articles}件の新規論文をデータベースに追加しました")
+            if sync_state:
+                print(f"  {updated_articles}件の論文を更新しました")
+        
+        if processes > 1:
+            # 取得はスレッド、解析・分類は別プロセスで行い、一定数ずつ順に保存
+            window = max(workers, processes) * 2
+            with ProcessPoolExecutor(max_workers=processes) as enrich_pool:
+                for start in range(0, len(batches), window):
+                    group = batches[start:start + window]
+                    try:
+                        xml_chunks = list(executor.map(lambda batch: fetch_pubmed_xml(*batch), group))
+                        enriched = enrich_xml_chunks(xml_chunks, executor=enrich_pool)
+                    except Exception as e:
+                        print(f"  エラーが発生しました: {str(e)}")
+                        failed = True
+                        continue
+                    for offset, articles in enumerate(enriched):
+                        store_articles(f"{start + offset + 1}/{len(batches)}", articles)
+        else:
+            futures = {executor.submit(get_pubmed_article_details, *batch): batch for batch in batches}
+            for i, future in enumerate(as_completed(futures)):
+                try:
+                    store_articles(f"{i+1}/{len(batches)}", future.result())
+                except Exception as e:
+                    print(f"  エラーが発生しました: {str(e)}")
+                    failed = True
+        
+        fetched_bytes = client.stats()['bytes_received'] - bytes_before
+    
+    # キーワードごとに取得していた場合との比較
+    saved_requests = keywords_with_hits - len(batches)
+    saved_records = keyword_hits - fetched_count
+    bytes_per_record = fetched_bytes / fetched_count if fetched_count else 0
+    print(f"\n重複排除の効果: efetchリクエスト {keywords_with_hits}件 → {len(batches)}件"
+          f"（{saved_requests}件削減）、取得レコード {keyword_hits}件 → {fetched_count}件"
+          f"（{saved_records}件削減、推定{saved_records * bytes_per_record / 1024:.0f}KB削減）")
+    
+    print(f"\n完了: 処理した論文数: {total_articles}, 新規追加: {total_new_articles}"
+          + (f", 更新: {total_updated_articles}" if sync_state else ""))
     
-    print(f"\n完了: 処理した論文数: {total_articles}, 新規追加: {total_new_articles}")
+    # 差分同期の状態を更新（エラーがあった場合は次回も同じ期間を検索し直す）
+    if sync_state:
+        if failed:
+            print("差分同期: エラーがあったため同期日を更新しません")
+        else:
+            fetched = set(pending) | revised
+            for keyword, pmid_list in keyword_pmids.items():
+                sync_state.update(keyword, [pmid for pmid in pmid_list if pmid in fetched], today)
+            sync_state.save()
+            print(f"差分同期: {len(keyword_pmids)}個のキーワードの同期日を{today:%Y/%m/%d}に更新しました")
+    
+    # レート制限の統計
+    limiter_stats = limiter.stats()
+    print(f"レート制限: リクエスト{limiter_stats['acquired']}件, "
+          f"待機{limiter_stats['waits']}回 (計{limiter_stats['wait_seconds']:.1f}秒), "
+          f"429受信{limiter_stats['throttled']}回")
+    
+    # 応答キャッシュの統計
+    cache_stats = get_pubmed_cache().stats()
+    print(f"応答キャッシュ: ヒット{cache_stats['hits']}件, ミス{cache_stats['misses']}件, "
+          f"保存{cache_stats['entries']}件 ({cache_stats['bytes'] / 1024 / 1024:.1f}MB)"
+          f"{' [オフライン]' if cache_stats['offline'] else ''}")
     
     # 現在のデータベース状態を表示
     try:
-        db_df = pd.read_csv('papers.csv')
+        evidence_db = get_evidence_db('papers.csv')
         print(f"\nデータベース統計:")
-        print(f"- 総論文数: {len(db_df)}")
+        print(f"- 総論文数: {evidence_db.count()}")
         
-        if 'issue' in db_df.columns:
-            issue_counts = db_df['issue'].value_counts()
-            print("\n歯列問題別の論文数:")
-            for issue, count in issue_counts.items():
-                print(f"- {issue}: {count}件")
+        issue_counts = evidence_db.value_counts('issue')
+        print("\n歯列問題別の論文数:")
+        for issue, count in issue_counts.items():
+            print(f"- {issue}: {count}件")
         
-        if 'evidence_level' in db_df.columns:
-            evidence_counts = db_df['evidence_level'].value_counts()
-            print("\nエビデンスレベル別の論文数:")
-            for level, count in evidence_counts.items():
-                print(f"- レベル{level}: {count}件")
+        evidence_counts = evidence_db.value_counts('evidence_level')
+        print("\nエビデンスレベル別の論文数:")
+        for level, count in evidence_counts.items():
+            print(f"- レベル{level}: {count}件")
     except Exception as e:
         print(f"データベース統計の取得中にエラーが発生しました: {str(e)}")
     
@@ -166,9 +343,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='PubMedから歯科矯正関連の論文を一括取得します')
     parser.add_argument('--max', type=int, default=30, help='キーワードごとの最大取得数')
     parser.add_argument('--days', type=int, default=365, help='何日前までの論文を検索するか')
-    parser.add_argument('--pause', type=int, default=3, help='APIリクエスト間の待機秒数')
+    parser.add_argument('--pause', type=int, default=0, help='キーワード間に追加で挟む待機秒数（間隔は通常レート制限が自動調整）')
     parser.add_argument('--custom', type=str, help='カスタムキーワード（カンマ区切り）')
     parser.add_argument('--key', type=str, help='NCBIのAPIキー（環境変数未設定の場合）')
+    parser.add_argument('--workers', type=int, default=1, help='並行して処理するリクエスト数')
+    parser.add_argument('--processes', type=int, default=1, help='論文XMLの解析・分類に使うプロセス数')
+    parser.add_argument('--offline', action='store_true', help='NCBIに接続せず、キャッシュ済みの応答だけを使う')
+    parser.add_argument('--incremental', action='store_true', help='前回の同期以降に追加・更新された論文だけを取得する')
+    parser.add_argument('--state', type=str, default='pubmed_sync.json', help='差分同期の状態ファイルのパス')
     
     args = parser.parse_args()
     
@@ -177,6 +359,11 @@ if __name__ == "__main__":
         os.environ["NCBI_API_KEY"] = args.key
         print(f"コマンドラインからのAPIキーを使用します")
     
+    # オフラインモード（応答キャッシュだけを使用）
+    if args.offline:
+        os.environ["PUBMED_OFFLINE"] = "1"
+        print("オフラインモード: キャッシュ済みの応答だけを使用します")
+    
     # カスタムキーワードが指定された場合
     keywords = None
     if args.custom:
@@ -188,5 +375,9 @@ if __name__ == "__main__":
         keywords=keywords,
         max_per_keyword=args.max,
         days_recent=args.days,
-        pause_seconds=args.pause
+        pause_seconds=args.pause,
+        workers=args.workers,
+        processes=args.processes,
+        incremental=args.incremental,
+        state_file=args.state
     )
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+論文1件あたりの書誌情報の取り出し時間の比較。
+
+変更前の get_pubmed_article_details() と同じ .// の検索（項目ごとに部分木全体を
+検索し直す）と、_article_fields()（子要素を1回だけたどる）を、合成した
+PubmedArticleSet（tests/fake_eutils.py）の木に対して実行します。
+研究タイプなどのテキストマイニングは含めません。
+
+    python benchmarks/bench_article_fields.py [--articles 5000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+from fake_eutils import article_set_xml
+from pubmed_api import _article_fields
+
+
+def xpath_fields(article):
+    # 変更前の解析と同じ検索（値の整形はしない）
+    title = article.find('.//ArticleTitle')
+    abstract_texts = [element.text for element in article.findall('.//AbstractText') if element.text]
+    doi = article.find('.//ArticleId[@IdType="doi"]')
+    year = article.find('.//PubDate').find('./Year')
+    authors = []
+    for author in article.findall('.//Author'):
+        last_name = author.find('./LastName')
+        fore_name = author.find('./ForeName')
+        if last_name is not None and fore_name is not None:
+            authors.append(f"{last_name.text} {fore_name.text}")
+        elif last_name is not None:
+            authors.append(last_name.text)
+    keywords = [element.text for element in article.findall('.//Keyword') if element.text]
+    mesh_terms = [element.text for element in article.findall('.//MeshHeading/DescriptorName') if element.text]
+    pmid = article.find('.//PMID')
+    journal = article.find('.//Journal/Title')
+    return title, abstract_texts, doi, year, authors, keywords, mesh_terms, pmid, journal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    articles = ET.fromstring(article_set_xml([str(20000000 + i) for i in range(args.articles)])).findall('PubmedArticle')
+    print(f'{len(articles)} articles, best of {args.repeat}')
+    results = {}
+    for name, extract in (('.// search', xpath_fields), ('_article_fields', _article_fields)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for article in articles:
+                extract(article)
+            best = min(best, time.perf_counter() - start)
+        results[name] = best
+        print(f'{name:16s} {best / len(articles) * 1e6:6.1f} us/article')
+    print(f'speed-up {results[".// search"] / results["_article_fields"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
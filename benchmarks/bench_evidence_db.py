@@ -0,0 +1,91 @@
+"""
+歯列問題・エビデンスレベルによる絞り込みの所要時間（DataFrameの走査とSQLiteの索引検索）。
+
+件数ごとに合成した論文CSVを作り、変更前の app.py と同じ DataFrame の絞り込み
+（papers[papers['issue'] == issue] のあと .isin(evidence_filter)）と、
+EvidenceDB.query_papers() の所要時間を比べます。絞り込む歯列問題（開咬）の論文は
+件数によらず200件にしてあり、結果の件数が同じときの検索の手間を比べられます。
+
+    python benchmarks/bench_evidence_db.py [--sizes 1000 100000 1000000] [--repeat 20]
+"""
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from evidence_db import EvidenceDB
+from paper_store import PAPER_COLUMNS
+
+COMMON_ISSUES = ['叢生', '過蓋咬合', '交叉咬合', '上顎前突', '下顎前突', 'その他の歯列問題']
+LEVELS = ['1a', '1b', '2a', '2b', '3', '4', '5']
+AGE_GROUPS = ['小児', '小児・青年', '青年', '成人', '成人・高齢者', '高齢者', '全年齢']
+TARGET_ISSUE = '開咬'
+TARGET_ROWS = 200
+EVIDENCE_FILTER = ['1a', '1b', '2a']
+
+
+def write_papers(path, count):
+    rng = random.Random(count)
+    targets = set(rng.sample(range(count), min(TARGET_ROWS, count)))
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\r\n')
+        writer.writerow(PAPER_COLUMNS)
+        for i in range(count):
+            issue = TARGET_ISSUE if i in targets else rng.choice(COMMON_ISSUES)
+            writer.writerow([issue, f'{rng.random() * 50:.1f}%上昇', f'10.1000/{i}', str(2000 + i % 25), 'rct',
+                             str(10 + i % 400), '不明', rng.choice(AGE_GROUPS), rng.choice(LEVELS),
+                             'Kim A, Lee B', f'Study {i} of orthodontic treatment outcomes',
+                             f'https://pubmed.ncbi.nlm.nih.gov/{i}/', str(i)])
+
+
+def median_ms(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'filter: issue = {TARGET_ISSUE} ({TARGET_ROWS} rows), evidence_level in {EVIDENCE_FILTER}; median of {args.repeat}')
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'papers.csv')
+            write_papers(path, size)
+
+            start = time.perf_counter()
+            papers = pd.read_csv(path)
+            load_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            db = EvidenceDB(path)
+            migrate_seconds = time.perf_counter() - start
+
+            def scan():
+                issue_papers = papers[papers['issue'] == TARGET_ISSUE]
+                return issue_papers[issue_papers['evidence_level'].isin(EVIDENCE_FILTER)]
+
+            scan_ms, scan_rows = median_ms(scan, args.repeat)
+            query_ms, query_rows = median_ms(lambda: db.query_papers(TARGET_ISSUE, EVIDENCE_FILTER), args.repeat)
+            assert scan_rows == query_rows
+            db.close()
+            print(f'{size:>9,} rows  read_csv {load_seconds:6.2f} s  migrate {migrate_seconds:6.2f} s  '
+                  f'DataFrame filter {scan_ms:7.2f} ms  SQLite query {query_ms:6.2f} ms  ({query_rows} rows)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+CLI・バッチ処理から使うモジュールの読み込み時間（新しいプロセスでの import の所要時間）。
+
+変更前は、スコア計算などが app.py に、PubMed API 連携が streamlit と pandas を
+先頭で読み込む pubmed_api.py にあったため、どちらを使う場合も streamlit・pandas・
+numpy の読み込みが必要でした。その読み込み時間と、ortho_core の各モジュール・
+pubmed_api の読み込み時間を、それぞれ新しいプロセスで測って比べます。
+
+    python benchmarks/bench_import_time.py [--repeat 7]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = [
+    ('streamlit, pandas, numpy', 'streamlit, pandas, numpy (before: app.py / pubmed_api.py)'),
+    ('ortho_core.scoring', 'ortho_core.scoring'),
+    ('ortho_core.report', 'ortho_core.report'),
+    ('ortho_core.render', 'ortho_core.render'),
+    ('pubmed_api', 'pubmed_api'),
+]
+HEAVY_MODULES = ('streamlit', 'pandas', 'numpy', 'requests')
+
+
+def import_seconds(modules):
+    code = ('import sys, time\n'
+            'start = time.perf_counter()\n'
+            f'import {modules}\n'
+            'print(time.perf_counter() - start)\n'
+            f'print(",".join(name for name in {HEAVY_MODULES!r} if name in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    seconds, _, loaded = output.stdout.partition('\n')
+    return float(seconds), loaded.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f'median of {args.repeat} fresh processes')
+    for modules, label in TARGETS:
+        # 1回目はバイトコードの作成とディスクキャッシュの影響を受けるため測定から外す
+        import_seconds(modules)
+        results = [import_seconds(modules) for _ in range(args.repeat)]
+        seconds = statistics.median(result[0] for result in results)
+        print(f'{label:58s} {seconds * 1000:8.1f} ms  loads: {results[0][1] or "-"}')
+
+
+if __name__ == '__main__':
+    main()
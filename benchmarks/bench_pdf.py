@@ -0,0 +1,67 @@
+"""
+PDFレポート1件の作成時間とメモリ（引用10・100・500件）。
+
+ortho_core.pdf の generate_pdf_report() を同じプロセスで続けて呼び、1件あたりの
+作成時間（中央値と最大）、作成中に確保したメモリのピーク（tracemalloc）、
+PDFの大きさを測ります。日本語フォントの登録（ワーカーごとに1度）の時間は別に表示します。
+
+    python benchmarks/bench_pdf.py [--citations 10 100 500] [--reports 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+from bench_render import ISSUES, make_papers
+from ortho_core.evidence_index import EvidenceIndex
+from ortho_core.pdf import generate_pdf_report, register_japanese_font
+from ortho_core.report import build_report
+
+REPORT_DATE = date(2024, 4, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--citations', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--reports', type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    font = register_japanese_font()
+    print(f'font {font}: registered in {(time.perf_counter() - start) * 1000:.1f} ms (once per worker)')
+
+    for citations in args.citations:
+        index = EvidenceIndex.from_papers(make_papers(citations))
+        # 患者ごとに年齢と特記事項を変える（引用はすべて含める）
+        reports = [build_report(5 + i % 60, '女性', ISSUES, index, evidence_filter=[],
+                                additional_notes=f'患者{i}', report_date=REPORT_DATE) for i in range(args.reports)]
+        generate_pdf_report(reports[0])
+
+        seconds, peaks, sizes = [], [], []
+        for report in reports:
+            tracemalloc.start()
+            start = time.perf_counter()
+            pdf = generate_pdf_report(report)
+            seconds.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            sizes.append(len(pdf))
+        # tracemalloc を有効にすると遅くなるため、時間は有効にしない状態でも測る
+        plain = []
+        for report in reports:
+            start = time.perf_counter()
+            generate_pdf_report(report)
+            plain.append(time.perf_counter() - start)
+        print(f'{citations:4d} citations  {statistics.median(plain) * 1000:8.1f} ms/report '
+              f'(max {max(plain) * 1000:7.1f} ms, {statistics.median(seconds) * 1000:7.1f} ms traced)  '
+              f'peak {max(peaks) / 2 ** 20:6.1f} MiB  PDF {statistics.median(sizes) / 1024:7.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
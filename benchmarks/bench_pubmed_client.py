@@ -0,0 +1,65 @@
+"""
+PubMedClient（接続プール・Keep-Alive）と、以前の毎回の requests.get の比較。
+
+ORTHO_KEYWORDS（23件）ごとに esearch と efetch を1回ずつ、ローカルの E-utilities
+サーバー（tests/fake_eutils.py）に送り、所要時間と新しい接続の数を比べます。
+接続ごとの待ち（TLSハンドシェイクの代わり）とリクエストごとの待ちは引数で指定します。
+レート制限の待ちは含めません（接続の再利用の効果だけを測る）。
+
+    python benchmarks/bench_pubmed_client.py [--connect-delay 0.05] [--response-delay 0.02]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+import requests
+
+from batch_pubmed_fetch import ORTHO_KEYWORDS
+from fake_eutils import FakeEutilsServer
+from pubmed_api import PubMedClient, TokenBucket
+
+
+def run_keywords(get, base_url):
+    # 1キーワードあたり esearch と efetch を1回ずつ送り、リクエストごとの所要時間を返す
+    latencies = []
+    for keyword in ORTHO_KEYWORDS:
+        start = time.perf_counter()
+        result = get(base_url + 'esearch.fcgi', {'db': 'pubmed', 'term': keyword, 'retmode': 'json'}).json()
+        latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        get(base_url + 'efetch.fcgi', {'db': 'pubmed', 'id': ','.join(result['esearchresult']['idlist']),
+                                       'retmode': 'xml'}).content
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--connect-delay', type=float, default=0.05, help='新しい接続ごとの待ち（秒）')
+    parser.add_argument('--response-delay', type=float, default=0.02, help='リクエストごとの待ち（秒）')
+    args = parser.parse_args()
+
+    with FakeEutilsServer(connect_delay=args.connect_delay, response_delay=args.response_delay) as server:
+        client = PubMedClient(base_url=server.url, rate_limiter=TokenBucket(1000, capacity=1000))
+        variants = (
+            ('requests.get', lambda url, params: requests.get(url, params=params)),
+            ('PubMedClient', lambda url, params: client.get(url[len(server.url):], params)),
+        )
+        print(f'{len(ORTHO_KEYWORDS)} keywords, connect delay {args.connect_delay * 1000:.0f} ms, '
+              f'response delay {args.response_delay * 1000:.0f} ms')
+        for name, get in variants:
+            server.reset_counters()
+            start = time.perf_counter()
+            latencies = sorted(run_keywords(get, server.url))
+            total = time.perf_counter() - start
+            print(f'{name:14s} requests {len(latencies):3d}  connections {server.connections:3d}  '
+                  f'total {total:6.2f} s  mean {sum(latencies) / len(latencies) * 1000:6.1f} ms  '
+                  f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+efetch のXML解析のピークメモリ（RSS）と処理速度の比較。
+
+合成した10,000件の PubmedArticleSet（tests/fake_eutils.py）を一時ファイルに書き出し、
+変更前の解析（本文全体を ET.fromstring で木にしてから .// で検索）と
+iter_parse_pubmed_articles()（ファイルから逐次解析し、論文を1件ずつ処理）を
+それぞれ別のプロセスで実行して比べます。ピークRSSは import 後の値との差も示します。
+
+    python benchmarks/bench_pubmed_parse.py [--articles 10000]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+
+def peak_rss_mb():
+    # Linux の ru_maxrss はKB単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(mode, path):
+    # 子プロセスで1つの方式だけを実行し、件数・秒数・ピークRSSを出力する
+    import baseline_pubmed
+    import pubmed_api
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'baseline':
+        with open(path, 'rb') as f:
+            count = len(baseline_pubmed.parse_articles(f.read()))
+    else:
+        with open(path, 'rb') as f:
+            count = sum(1 for _ in pubmed_api.iter_parse_pubmed_articles(f))
+    print(count, time.perf_counter() - start, before, peak_rss_mb())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', type=int, default=10000)
+    parser.add_argument('--run', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run(*args.run)
+        return
+
+    from fake_eutils import article_set_xml
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'efetch.xml')
+        with open(path, 'wb') as f:
+            f.write(article_set_xml([str(20000000 + i) for i in range(args.articles)]))
+        print(f'{args.articles} articles, {os.path.getsize(path) / 1e6:.1f} MB XML')
+        for mode in ('baseline', 'streaming'):
+            output = subprocess.run([sys.executable, __file__, '--run', mode, path],
+                                    check=True, capture_output=True, text=True).stdout.split()
+            count, seconds, before, peak = int(output[0]), *map(float, output[1:])
+            print(f'{mode:10s} {count} articles  {seconds:6.2f} s  {count / seconds:7.0f} articles/s  '
+                  f'peak RSS {peak:6.1f} MB (+{peak - before:6.1f} MB over imports)')
+
+
+if __name__ == '__main__':
+    main()
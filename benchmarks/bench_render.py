@@ -0,0 +1,81 @@
+"""
+HTMLレポート1件の描画時間（エビデンス10・100・1000件）。
+
+変更前の app.py の文字列連結による generate_html_report()（tests/baseline_report.py）と、
+ortho_core.render のテンプレートによる generate_html_report() を比べます。
+ortho_core.render は論文ごとのHTMLをキャッシュするため、キャッシュを消した
+状態（cold）と、同じ論文データで続けて作成する状態（warm）の両方を測ります。
+
+    python benchmarks/bench_render.py [--rows 10 100 1000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+import pandas as pd
+
+import baseline_report
+from ortho_core.evidence_index import EvidenceIndex
+from ortho_core.reference_data import get_reference_tables
+from ortho_core.render import _render_evidence_record, generate_html_report
+from ortho_core.report import build_report
+from paper_store import PAPER_COLUMNS
+
+LEVELS = ['1a', '1b', '2a', '2b', '3', '4', '5']
+ISSUES = ['叢生', '開咬']
+REPORT_DATE = date(2024, 4, 1)
+
+
+def make_papers(count):
+    return pd.DataFrame([{
+        'issue': ISSUES[i % len(ISSUES)], 'risk_description': f'齲蝕リスクが{10 + i % 50}%上昇します（研究{i}）',
+        'doi': f'10.1000/ortho.{i}', 'publication_year': '2020', 'study_type': 'randomized-controlled-trial',
+        'sample_size': str(20 + i) if i % 3 else '不明', 'confidence_interval': '不明', 'age_group': '全年齢',
+        'evidence_level': LEVELS[i % len(LEVELS)], 'authors': 'Kim A', 'title': f'Crowding and caries {i}',
+        'url': '', 'pmid': str(i + 1),
+    } for i in range(count)], columns=PAPER_COLUMNS)
+
+
+def best_seconds(func, repeat, before=None):
+    best = float('inf')
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    scenarios = get_reference_tables()['future_scenarios']
+    print(f'best of {args.repeat}, per report')
+    for rows in args.rows:
+        papers = make_papers(rows)
+        index = EvidenceIndex.from_papers(papers)
+        report = build_report(15, '女性', ISSUES, index, report_date=REPORT_DATE)
+        report_args = (15, '女性', ISSUES, report['markdown_lines'], report['high_risks'], report['necessity_score'],
+                       report['economic_benefits'], scenarios)
+        baseline_report.set_papers(papers)
+
+        baseline = best_seconds(lambda: baseline_report.generate_html_report(*report_args), args.repeat)
+        render = lambda: generate_html_report(*report_args, evidence_index=index, report_date=REPORT_DATE)
+        cold = best_seconds(render, args.repeat, before=_render_evidence_record.cache_clear)
+        warm = best_seconds(render, args.repeat)
+        print(f'{rows:5d} rows  baseline {baseline * 1000:8.2f} ms  template cold {cold * 1000:7.2f} ms '
+              f'({baseline / cold:5.1f}x)  warm {warm * 1000:7.2f} ms ({baseline / warm:5.1f}x)  '
+              f'{len(render().encode("utf-8")) / 1024:7.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+500件の引用を含むレポートのダウンロードに伴うページの転送量（data URI と download_button）。
+
+変更前は HTMLレポートを base64 の data URI にしてページの Markdown 要素に埋め込んで
+いました（tests/baseline_report.py の get_html_download_link()）。変更後は
+encode_report_files() で1度だけ作ったバイト列を st.download_button に渡し、ページには
+メディアファイルのURLだけが入ります（ファイル本体はボタンを押したときに転送）。
+Streamlit の要素（protobuf）を実際にシリアライズした大きさで比べます。
+
+    python benchmarks/bench_report_payload.py [--citations 500]
+"""
+import argparse
+import base64
+import os
+import sys
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+from streamlit.proto.DownloadButton_pb2 import DownloadButton
+from streamlit.proto.Markdown_pb2 import Markdown
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+import baseline_report
+from bench_render import ISSUES, make_papers
+from ortho_core.evidence_index import EvidenceIndex
+from ortho_core.reference_data import get_reference_tables
+from ortho_core.render import encode_report_files, generate_html_report
+from ortho_core.report import build_report
+
+REPORT_DATE = date(2024, 4, 1)
+FILENAME = '歯科矯正評価_2024年04月01日'
+
+
+def download_button_size(storage, label, data, mimetype, filename):
+    file_id = storage.load_and_get_id(data, mimetype, 'downloadable', filename)
+    return len(DownloadButton(label=label, url=storage.get_url(file_id)).SerializeToString())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--citations', type=int, default=500)
+    args = parser.parse_args()
+
+    papers = make_papers(args.citations)
+    index = EvidenceIndex.from_papers(papers)
+    report = build_report(15, '女性', ISSUES, index, report_date=REPORT_DATE)
+    report_args = (15, '女性', ISSUES, report['markdown_lines'], report['high_risks'], report['necessity_score'],
+                   report['economic_benefits'], get_reference_tables()['future_scenarios'])
+    baseline_report.set_papers(papers)
+    old_html = baseline_report.generate_html_report(*report_args)
+    html = generate_html_report(*report_args, evidence_index=index, report_date=REPORT_DATE)
+    markdown = '\n'.join(report['markdown_lines'])
+    storage = MemoryMediaFileStorage('/media')
+
+    print(f'{args.citations} citations: HTML {len(html.encode("utf-8")):,} bytes '
+          f'(old renderer {len(old_html.encode("utf-8")):,} bytes)')
+
+    # 変更前: HTMLは data URI の Markdown 要素、Markdown は download_button（文字列）
+    markdown_button = download_button_size(storage, 'マークダウン形式でダウンロード', markdown.encode('utf-8'),
+                                           'text/markdown', FILENAME + '.md')
+    for label, document in (('old HTML', old_html), ('current HTML', html)):
+        link = baseline_report.get_html_download_link(document, FILENAME + '.html')
+        page = len(Markdown(body=link, allow_html=True).SerializeToString()) + markdown_button
+        print(f'before ({label:12s}) page {page:10,} bytes  on click {len(markdown.encode("utf-8")):10,} bytes (md)  '
+              f'base64 {len(base64.b64encode(document.encode("utf-8"))) / len(document.encode("utf-8")):.2f}x')
+
+    # 変更後: どちらも download_button（バイト列）。HTMLはgzip圧縮も選べる
+    for compress in (False, True):
+        files = encode_report_files(report['markdown_lines'], html, compress_html=compress)
+        key, mimetype = ('html.gz', 'application/gzip') if compress else ('html', 'text/html')
+        page = (download_button_size(storage, 'HTML形式でダウンロード', files[key], mimetype, f'{FILENAME}.{key}')
+                + download_button_size(storage, 'マークダウン形式でダウンロード', files['markdown'], 'text/markdown',
+                                       FILENAME + '.md'))
+        print(f'after  ({key:12s}) page {page:10,} bytes  on click {len(files[key]):10,} bytes ({key})')
+
+
+if __name__ == '__main__':
+    main()
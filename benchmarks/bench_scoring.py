@@ -0,0 +1,70 @@
+"""
+矯正必要性スコアと経済的効果の計算の処理件数（1人ずつの計算とまとめた計算）。
+
+乱数で作った患者（年齢と歯列問題）について、calculate_ortho_necessity_score() と
+calculate_economic_benefits() を1人ずつ呼ぶ場合と、issues_to_matrix() で行列にして
+batch_ortho_necessity_scores() / batch_economic_benefits() でまとめて計算する場合を
+比べます。1人ずつの計算は時間がかかるため、--scalar-patients 人だけで測ります。
+
+    python benchmarks/bench_scoring.py [--patients 100000] [--scalar-patients 500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from ortho_core.scoring import (
+    ISSUE_COLUMNS, batch_economic_benefits, batch_ortho_necessity_scores, calculate_economic_benefits,
+    calculate_ortho_necessity_score, issues_to_matrix,
+)
+
+
+def make_patients(count, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randint(0, 90), rng.sample(ISSUE_COLUMNS, rng.randint(0, 3))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--scalar-patients', type=int, default=500)
+    args = parser.parse_args()
+
+    # 参照テーブルの読み込みを測定から外す
+    calculate_ortho_necessity_score(10, ['叢生'])
+
+    patients = make_patients(args.scalar_patients)
+    start = time.perf_counter()
+    scalar = [(calculate_ortho_necessity_score(age, issues), calculate_economic_benefits(age, issues))
+              for age, issues in patients]
+    scalar_seconds = time.perf_counter() - start
+    print(f'scalar  {len(patients):8d} patients {scalar_seconds:8.3f} s  {len(patients) / scalar_seconds:10.0f} patients/s')
+
+    # 同じ患者についてまとめた計算の結果が一致することを確かめる
+    ages = np.array([age for age, _ in patients])
+    matrix = issues_to_matrix([issues for _, issues in patients])
+    batch_scores = batch_ortho_necessity_scores(ages, matrix)
+    batch_benefits = batch_economic_benefits(ages, matrix)
+    for i, (score, benefits) in enumerate(scalar):
+        assert {name: batch_scores[name][i].item() for name in score} == score
+        assert {name: batch_benefits[name][i].item() for name in benefits} == benefits
+
+    patients = make_patients(args.patients, seed=1)
+    start = time.perf_counter()
+    ages = np.array([age for age, _ in patients])
+    matrix = issues_to_matrix([issues for _, issues in patients])
+    batch_ortho_necessity_scores(ages, matrix)
+    batch_economic_benefits(ages, matrix)
+    batch_seconds = time.perf_counter() - start
+    print(f'batch   {len(patients):8d} patients {batch_seconds:8.3f} s  {len(patients) / batch_seconds:10.0f} patients/s')
+    print(f'identical outputs, speed-up {(scalar_seconds / args.scalar_patients) / (batch_seconds / args.patients):.0f}x per patient')
+
+
+if __name__ == '__main__':
+    main()
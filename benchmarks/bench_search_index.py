@@ -0,0 +1,74 @@
+"""
+全文検索索引（SearchIndex）の検索時間（論文10万件）。
+
+合成した論文（タイトル・抄録・MeSH用語・日本語のリスク記述）を索引に追加し、
+差分（ログ）だけの状態と、本体に統合（compact）した状態で、英語・日本語の
+検索語ごとの検索時間を測ります。索引の作成と、ファイルからの読み込みの時間も表示します。
+
+    python benchmarks/bench_search_index.py [--documents 100000] [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+import search_index
+from search_index import SearchIndex
+from test_search_index import QUERIES, make_documents
+
+
+def query_times(index, repeat):
+    times = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            index.search(query)
+            samples.append(time.perf_counter() - start)
+        times[query] = samples
+    return times
+
+
+def report(label, times):
+    medians = [statistics.median(samples) for samples in times.values()]
+    worst = max(max(samples) for samples in times.values())
+    print(f'{label:14s} median {statistics.median(medians) * 1000:6.2f} ms  '
+          f'slowest query median {max(medians) * 1000:6.2f} ms  max {worst * 1000:6.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    # 追加の途中で自動的に統合しないようにする（統合前後を比べるため）
+    search_index.COMPACT_MIN_DOCS = args.documents + 1
+    with tempfile.TemporaryDirectory() as directory:
+        csv_file = os.path.join(directory, 'papers.csv')
+        start = time.perf_counter()
+        index = SearchIndex(csv_file)
+        for offset in range(0, len(documents), 1000):
+            index.add_documents(documents[offset:offset + 1000])
+        print(f'{len(index)} documents indexed in {time.perf_counter() - start:.1f} s '
+              f'(1000 per add_documents)')
+        report('log only', query_times(index, args.repeat))
+
+        start = time.perf_counter()
+        index.compact()
+        print(f'compact {time.perf_counter() - start:.2f} s, '
+              f'npz {os.path.getsize(index.base_file) / 2 ** 20:.1f} MiB')
+        start = time.perf_counter()
+        index = SearchIndex(csv_file)
+        print(f'reopen {time.perf_counter() - start:.3f} s')
+        report('compacted', query_times(index, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+テキストマイニング（研究タイプ・歯列問題・年齢層・サンプルサイズ・信頼区間・
+リスク記述）の1論文あたりの処理時間の比較。
+
+変更前の関数を1つずつ呼ぶ場合（tests/baseline_pubmed.py）と、TextMiner.mine() で
+まとめて導出する場合を、合成した論文（tests/fake_eutils.py）の抄録で比べます。
+
+    python benchmarks/bench_text_miner.py [--articles 5000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+import baseline_pubmed
+from fake_eutils import article_set_xml
+from pubmed_api import TEXT_MINER, parse_pubmed_articles
+
+
+def baseline_mine(title, abstract, keywords, mesh_terms):
+    return {
+        'study_type': baseline_pubmed.determine_study_type(title, abstract),
+        'sample_size': baseline_pubmed.extract_sample_size(abstract),
+        'confidence_interval': baseline_pubmed.extract_confidence_interval(abstract),
+        'age_group': baseline_pubmed.determine_age_group(abstract),
+        'risk_description': baseline_pubmed.extract_risk_description(title, abstract),
+        'issue': baseline_pubmed.classify_dental_issue(title, abstract, keywords, mesh_terms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    articles = parse_pubmed_articles(article_set_xml([str(20000000 + i) for i in range(args.articles)]))
+    inputs = [(a['title'], a['abstract'], a['keywords'], a['mesh_terms']) for a in articles]
+    print(f'{len(inputs)} abstracts, best of {args.repeat}')
+
+    results = {}
+    for name, mine in (('baseline functions', baseline_mine), ('TextMiner.mine', TEXT_MINER.mine)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            outputs = [mine(*item) for item in inputs]
+            best = min(best, time.perf_counter() - start)
+        results[name] = (best, outputs)
+        print(f'{name:18s} {best / len(inputs) * 1e6:6.1f} us/abstract  {len(inputs) / best:8.0f} abstracts/s')
+
+    assert results['baseline functions'][1] == results['TextMiner.mine'][1]
+    print(f'identical outputs, speed-up {results["baseline functions"][0] / results["TextMiner.mine"][0]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+# 親ディレクトリへのパスを追加
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ortho_core.report import build_report, DEFAULT_EVIDENCE_FILTER
+from ortho_core.render import generate_html_report
+from ortho_core.reference_data import get_reference_tables
+from ortho_core.scoring import ISSUE_COLUMNS, issues_to_matrix, batch_ortho_necessity_scores, batch_economic_benefits
+from evidence_db import EvidenceDB, build_evidence_index
+
+# 患者名簿の歯列問題の区切り文字（CSVの場合）
+ISSUE_SEPARATOR_PATTERN = re.compile(r'[;；、|]')
+
+# ファイル名に使えない文字
+UNSAFE_FILENAME_PATTERN = re.compile(r'[\\/:*?"<>|\s]+')
+
+# ワーカープロセスごとの状態（initializer で設定）
+_worker = {}
+
+def load_roster(path):
+    """
+    患者名簿（CSVまたはJSONL）を読み込みます。
+
+    各患者は age（年齢）、gender（性別）、issues（歯列問題）、notes（特記事項）と、
+    任意で id（出力ファイル名に使う患者ID）を持ちます。CSVの issues は
+    「;」「、」「|」区切り、JSONLの issues はリストまたは同じ区切りの文字列です。
+
+    出力ファイル名（'filename'）は患者IDのファイル名に使えない文字を「_」に置き換えたものです。
+    IDの重複や置き換え・大文字小文字の違いだけで同じ名前になる患者（"a b" と "a_b" など）は、
+    レポートを上書きしないよう2人目以降の名前に「_2」「_3」…を付けます。
+
+    Returns:
+    --------
+    list of dict
+        'id', 'filename', 'age', 'gender', 'issues', 'notes' をキーとする辞書のリスト
+    """
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            entries = list(csv.DictReader(f))
+
+    patients = []
+    # 大文字と小文字を区別しないファイルシステムでも重ならないよう、casefold した名前で判定する
+    used_filenames = set()
+    renamed = []
+    for number, entry in enumerate(entries, 1):
+        issues = entry.get('issues') or []
+        if isinstance(issues, str):
+            issues = [issue.strip() for issue in ISSUE_SEPARATOR_PATTERN.split(issues) if issue.strip()]
+        patient_id = str(entry.get('id') or f"patient_{number:05d}")
+        base = filename = UNSAFE_FILENAME_PATTERN.sub('_', patient_id)
+        suffix = 1
+        while filename.casefold() in used_filenames:
+            suffix += 1
+            filename = f"{base}_{suffix}"
+        used_filenames.add(filename.casefold())
+        if filename != base:
+            renamed.append((number, patient_id, filename))
+        patients.append({
+            'id': patient_id,
+            'filename': filename,
+            'age': int(entry['age']),
+            'gender': entry.get('gender') or 'その他',
+            'issues': issues,
+            'notes': entry.get('notes') or ''
+        })
+    for number, patient_id, filename in renamed:
+        print(f"  {number}人目の患者（ID '{patient_id}'）は出力ファイル名が他の患者と重なるため '{filename}' で出力します")
+    return patients
+
+def attach_batch_scores(patients):
+    """
+    全患者のスコアを ortho_core.scoring の一括計算でまとめて求め、各患者に付与します。
+
+    一括計算は問題行列で表せる患者（歯列問題が既知で重複がない）だけに使い、
+    それ以外の患者はレポート作成時に1人ずつ計算します（結果はどちらも同じ）。
+    """
+    known = set(ISSUE_COLUMNS)
+    targets = [patient for patient in patients
+               if len(set(patient['issues'])) == len(patient['issues']) and known.issuperset(patient['issues'])]
+    if not targets:
+        return
+    ages = np.array([patient['age'] for patient in targets])
+    issue_matrix = issues_to_matrix([patient['issues'] for patient in targets])
+    necessity = batch_ortho_necessity_scores(ages, issue_matrix)
+    economic = batch_economic_benefits(ages, issue_matrix)
+    for i, patient in enumerate(targets):
+        patient['necessity_score'] = {key: values[i].item() for key, values in necessity.items()}
+        patient['economic_benefits'] = {key: values[i].item() for key, values in economic.items()}
+
+def _init_worker(csv_file, out_dir, options, write_pdf=False):
+    # 索引と参照データはワーカーごとに1度だけ作成し、全患者で使い回す
+    _worker['evidence_index'] = build_evidence_index(csv_file)
+    _worker['future_scenarios'] = get_reference_tables()['future_scenarios']
+    _worker['out_dir'] = out_dir
+    _worker['options'] = options
+    _worker['generate_pdf_report'] = None
+    if write_pdf:
+        # 日本語フォントもワーカーごとに1度だけ読み込む
+        from ortho_core.pdf import generate_pdf_report, register_japanese_font
+        register_japanese_font()
+        _worker['generate_pdf_report'] = generate_pdf_report
+
+def _write_patient_reports(patient):
+    """
+    患者1人分のMarkdown/HTML（指定時はPDFも）レポートを書き出します（ワーカープロセスで実行）。
+
+    Returns:
+    --------
+    tuple
+        (患者ID, エラーメッセージ（成功時は None）)
+    """
+    try:
+        options = _worker['options']
+        report_data = build_report(
+            patient['age'], patient['gender'], patient['issues'], _worker['evidence_index'],
+            additional_notes=patient['notes'],
+            necessity_score=patient.get('necessity_score'),
+            economic_benefits=patient.get('economic_benefits'),
+            **options
+        )
+        html_report = generate_html_report(
+            patient['age'], patient['gender'], patient['issues'], report_data['markdown_lines'],
+            report_data['high_risks'], report_data['necessity_score'], report_data['economic_benefits'],
+            _worker['future_scenarios'],
+            additional_notes=patient['notes'],
+            evidence_index=_worker['evidence_index'],
+            report_date=options['report_date']
+        )
+
+        base = os.path.join(_worker['out_dir'], patient['filename'])
+        with open(base + '.md', 'w', encoding='utf-8') as f:
+            f.write("\n".join(report_data['markdown_lines']))
+        with open(base + '.html', 'w', encoding='utf-8') as f:
+            f.write(html_report)
+        if _worker['generate_pdf_report'] is not None:
+            with open(base + '.pdf', 'wb') as f:
+                f.write(_worker['generate_pdf_report'](report_data))
+        return patient['id'], None
+    except Exception as e:
+        return patient['id'], str(e)
+
+def generate_bulk_reports(roster_file, out_dir='reports', csv_file='papers.csv', processes=None,
+                          evidence_filter=DEFAULT_EVIDENCE_FILTER, risk_threshold=30, include_citations=True,
+                          write_pdf=False):
+    """
+    患者名簿の全員分の評価レポート（Markdown/HTML）を一括で作成します。
+
+    アプリのフォームと同じスコア計算・レポート作成（ortho_core）を使い、
+    スコアは全患者分を一括計算したうえで、患者ごとの作成は複数プロセスで並行して行います。
+
+    Parameters:
+    -----------
+    roster_file : str
+        患者名簿（CSVまたはJSONL、load_roster() を参照）
+    out_dir : str
+        レポートの出力先ディレクトリ（患者IDごとに .md と .html を作成）
+    csv_file : str
+        論文CSVのパス
+    processes : int or None
+        使用するプロセス数（None の場合はCPU数）
+    evidence_filter : list of str
+        レポートに含めるエビデンスレベル
+    risk_threshold : int
+        高リスクとみなすリスク値の閾値
+    include_citations : bool
+        論文引用を含めるかどうか
+    write_pdf : bool
+        PDF版（.pdf）も作成するかどうか（reportlab が必要）
+
+    Returns:
+    --------
+    int
+        作成できたレポート数
+
+    Raises:
+    -------
+    ImportError
+        write_pdf が指定され、reportlab がインストールされていない場合
+    """
+    # reportlab の有無はワーカーを起動する前に確かめる（読み込みはワーカーごとに行う）
+    if write_pdf and importlib.util.find_spec('reportlab') is None:
+        raise ImportError("PDFを作成するには reportlab が必要です（pip install reportlab）")
+    
+    patients = load_roster(roster_file)
+    os.makedirs(out_dir, exist_ok=True)
+    
+    # 検索用データベースの取り込みは事前に1度だけ行い、ワーカーは読み込みだけにする
+    EvidenceDB(csv_file).close()
+    
+    # スコアは全患者分を一括で計算しておく
+    attach_batch_scores(patients)
+    print(f"開始: {len(patients)}人分のレポートを作成します（出力先: {out_dir}）")
+
+    options = {
+        'evidence_filter': evidence_filter,
+        'risk_threshold': risk_threshold,
+        'include_citations': include_citations,
+        # 全患者で同じ生成日を使う（実行中に日付が変わってもそろえる）
+        'report_date': date.today()
+    }
+
+    start_time = time.time()
+    done = 0
+    failures = []
+    # 進捗は約1%ごと（最低でも100人ごと）に表示
+    report_every = max(1, min(100, len(patients) // 100))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(csv_file, out_dir, options, write_pdf)) as executor:
+        chunksize = max(1, min(64, len(patients) // ((processes or os.cpu_count() or 1) * 4)))
+        for patient_id, error in executor.map(_write_patient_reports, patients, chunksize=chunksize):
+            done += 1
+            if error:
+                failures.append((patient_id, error))
+            if done % report_every == 0 or done == len(patients):
+                elapsed = time.time() - start_time
+                print(f"  進捗: {done}/{len(patients)}件 ({done / len(patients):.0%}, {done / elapsed:.1f}件/秒)")
+
+    for patient_id, error in failures:
+        print(f"  {patient_id}: エラーが発生しました: {error}")
+    print(f"\n完了: 作成 {len(patients) - len(failures)}件, エラー {len(failures)}件 "
+          f"({time.time() - start_time:.1f}秒)")
+    return len(patients) - len(failures)
+
+if __name__ == "__main__":
+    # コマンドライン引数の解析
+    parser = argparse.ArgumentParser(description='患者名簿から歯科矯正評価レポートを一括作成します')
+    parser.add_argument('roster', type=str, help='患者名簿（CSVまたはJSONL。列: id, age, gender, issues, notes）')
+    parser.add_argument('--out', type=str, default='reports', help='レポートの出力先ディレクトリ')
+    parser.add_argument('--papers', type=str, default='papers.csv', help='論文CSVのパス')
+    parser.add_argument('--processes', type=int, default=None, help='使用するプロセス数（省略時はCPU数）')
+    parser.add_argument('--evidence', type=str, default=','.join(DEFAULT_EVIDENCE_FILTER),
+                        help='含めるエビデンスレベル（カンマ区切り）')
+    parser.add_argument('--risk', choices=list(get_reference_tables()['risk_thresholds'].keys()), default='標準',
+                        help='リスク表示レベル')
+    parser.add_argument('--no-citations', action='store_true', help='論文引用を含めない')
+    parser.add_argument('--pdf', action='store_true', help='PDF版も作成する（reportlab が必要）')
+
+    args = parser.parse_args()
+
+    try:
+        generate_bulk_reports(
+            args.roster,
+            out_dir=args.out,
+            csv_file=args.papers,
+            processes=args.processes,
+            evidence_filter=[level.strip() for level in args.evidence.split(',') if level.strip()],
+            risk_threshold=get_reference_tables()['risk_thresholds'][args.risk],
+            include_citations=not args.no_citations,
+            write_pdf=args.pdf
+        )
+    except ImportError as e:
+        print(f"エラー: {e}")
+        sys.exit(1)
@@ -0,0 +1,374 @@
+import re
+import unicodedata
+import zlib
+from urllib.parse import unquote
+import numpy as np
+
+# MinHash の関数の数と、LSH のバンド分割（LSH_BANDS × LSH_ROWS = NUM_PERM）
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# 一致するMinHashの割合（Jaccard係数の推定値）がこれ以上なら同じ論文の別版とみなす
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# タイトルを区切る文字数（文字 n-gram）と、類似判定に使うタイトルの最短の長さ（正規化後）
+SHINGLE_SIZE = 4
+MIN_TITLE_CHARS = 16
+
+# 署名1件の幅（MinHash の下位16ビット × NUM_PERM ＋ 判別子32ビット、uint16 単位）
+RECORD_WIDTH = NUM_PERM + 2
+
+# 追加分がこの件数と、整列済みの件数のこの割合を超えたらバンドの表を作り直す
+MERGE_MIN_ROWS = 10000
+MERGE_RATIO = 0.25
+
+# まとめて署名を計算・照合する件数（一時配列の大きさを抑える）
+SIGNATURE_CHUNK_ROWS = 2048
+FIND_CHUNK_ROWS = 1024
+
+# 1つのバンドのキーから取り出す候補の上限（定型のタイトルが多数ある場合の組み合わせの増加を抑える）
+MAX_BUCKET_ROWS = 32
+
+# PubMedの出版種別（PublicationType）のうち撤回に関するもの
+RETRACTED_PUBLICATION = 'Retracted Publication'
+RETRACTION_NOTICE = 'Retraction of Publication'
+
+_DOI_PREFIX_PATTERN = re.compile(r'^(?:https?://)?(?:dx\.)?doi\.org/|^doi:\s*')
+_DOI_PATTERN = re.compile(r'^10\.\d{4,9}/\S+$')
+_NON_WORD_PATTERN = re.compile(r'[\W_]+')
+_WORD_PATTERN = re.compile(r'[^\W_]+')
+# 同じ研究の続報・別の分類（1-year / 5-year、Class II / Class III など）を区別する語
+_DISTINCTIVE_PATTERN = re.compile(r'\b(?:\d+|i{1,3}|iv|vi{0,3}|ix|x)\b')
+_MISSING_AUTHORS = '著者不明'
+
+# MinHash の各関数の係数（固定の乱数。変えると保存済みの署名と一致しなくなる）
+_rng = np.random.default_rng(20240101)
+_PERM_A = _rng.integers(1, 2 ** 32, size=NUM_PERM, dtype=np.uint32) | np.uint32(1)
+_PERM_B = _rng.integers(0, 2 ** 32, size=NUM_PERM, dtype=np.uint32)
+_BAND_MIX = _rng.integers(1, 2 ** 63, size=LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+_DISCRIMINATOR_MIX = _rng.integers(1, 2 ** 63, dtype=np.uint64) | np.uint64(1)
+_SHINGLE_BASE = np.uint64(1000003)
+_MIX_MULTIPLIER = np.uint64(0xff51afd7ed558ccd)
+_EMPTY = 0xFFFF
+
+def normalize_doi(doi):
+    """
+    DOIを比較用に正規化します（小文字化し、https://doi.org/ や doi: などの接頭辞を除く）。
+
+    DOIの形式（10.xxxx/...）でないもの（「DOI不明」など）は空文字列を返します。
+    """
+    if not isinstance(doi, str):
+        return ''
+    doi = unquote(doi.strip()).lower()
+    doi = _DOI_PREFIX_PATTERN.sub('', doi).strip()
+    return doi if _DOI_PATTERN.match(doi) else ''
+
+def normalize_title(title):
+    """
+    タイトルを比較用に正規化します（NFKC・小文字化、記号を空白にまとめる）。
+    """
+    if not isinstance(title, str):
+        return ''
+    return _NON_WORD_PATTERN.sub(' ', unicodedata.normalize('NFKC', title).lower()).strip()
+
+def author_surnames(authors):
+    """
+    著者の文字列（"Smith John, Chen H" の形式）から、正規化した姓のリストを返します。
+    """
+    if not isinstance(authors, str) or authors == _MISSING_AUTHORS:
+        return []
+    surnames = []
+    for author in unicodedata.normalize('NFKC', authors).lower().split(','):
+        match = _WORD_PATTERN.search(author)
+        if match:
+            surnames.append(match.group())
+    return surnames
+
+def _discriminator(title, surnames):
+    # タイトル中の数字・ローマ数字と筆頭著者の姓が違う論文は、似ていても別の論文とみなす
+    key = ' '.join(_DISTINCTIVE_PATTERN.findall(title)) + '#' + (surnames[0] if surnames else '')
+    return zlib.crc32(key.encode('utf-8'))
+
+def _mix(hashes):
+    # 64ビットのハッシュ値を攪拌し、上位32ビットを返す
+    hashes = hashes ^ (hashes >> np.uint64(33))
+    hashes *= _MIX_MULTIPLIER
+    hashes ^= hashes >> np.uint64(33)
+    return (hashes >> np.uint64(32)).astype(np.uint32)
+
+def _minhash(hashes, offsets):
+    # ハッシュ値を NUM_PERM 個の置換（a*x+b mod 2^32）にかけ、offsets で区切ったグループごとの最小値を返す
+    permuted = _PERM_A[:, None] * hashes[None, :]
+    permuted += _PERM_B[:, None]
+    return np.minimum.reduceat(permuted, offsets, axis=1)
+
+def _offsets(counts):
+    # 長さの配列から各グループの開始位置を返す
+    offsets = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=offsets[1:])
+    return offsets
+
+def minhash_records(rows):
+    """
+    論文CSVの行（タイトルと著者）から、近似重複の判定に使う署名を計算します。
+
+    署名は、タイトルの文字4-gramと著者の姓の集合の MinHash（NUM_PERM 個、
+    下位16ビット）と、タイトル中の数字と筆頭著者の姓から作る判別子です。
+    タイトルが短すぎる・ない行は、近似重複の判定に使わない空の署名になります。
+    n-gram のハッシュ値と MinHash は SIGNATURE_CHUNK_ROWS 行ずつまとめて計算します。
+
+    Parameters:
+    -----------
+    rows : list of dict
+        'title' と 'authors' を持つ辞書のリスト
+
+    Returns:
+    --------
+    numpy.ndarray
+        (行数, RECORD_WIDTH) の uint16 配列
+    """
+    records = np.full((len(rows), RECORD_WIDTH), _EMPTY, dtype=np.uint16)
+    for start in range(0, len(rows), SIGNATURE_CHUNK_ROWS):
+        titles, owners, author_hashes, author_owners = [], [], [], []
+        for position, row in enumerate(rows[start:start + SIGNATURE_CHUNK_ROWS], start):
+            title = normalize_title(row.get('title'))
+            surnames = author_surnames(row.get('authors'))
+            discriminator = _discriminator(title, surnames)
+            records[position, NUM_PERM] = discriminator & 0xFFFF
+            records[position, NUM_PERM + 1] = discriminator >> 16
+            if len(title) < MIN_TITLE_CHARS:
+                continue
+            titles.append(title)
+            owners.append(position)
+            for surname in surnames:
+                author_hashes.append(zlib.crc32(('author ' + surname).encode('utf-8')))
+                author_owners.append(position)
+        if not titles:
+            continue
+
+        # タイトルを改行でつないで文字 n-gram のハッシュ値をまとめて計算し、行をまたぐものを除く
+        lengths = np.array([len(title) for title in titles], dtype=np.int64)
+        codes = np.frombuffer('\n'.join(titles).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        grams = codes[:len(codes) - SHINGLE_SIZE + 1].copy()
+        for offset in range(1, SHINGLE_SIZE):
+            grams *= _SHINGLE_BASE
+            grams += codes[offset:len(codes) - SHINGLE_SIZE + 1 + offset]
+        counts = lengths - SHINGLE_SIZE + 1
+        offsets = _offsets(counts)
+        grams = grams[np.repeat(_offsets(lengths + 1) - offsets, counts) + np.arange(counts.sum())]
+        minimums = _minhash(_mix(grams), offsets)
+
+        # 著者の姓も同じ集合の要素として最小値に含める
+        if author_hashes:
+            author_owners = np.array(author_owners)
+            first = np.ones(len(author_owners), dtype=bool)
+            first[1:] = author_owners[1:] != author_owners[:-1]
+            columns = np.searchsorted(owners, author_owners[first])
+            minimums[:, columns] = np.minimum(minimums[:, columns], _minhash(
+                _mix(np.array(author_hashes, dtype=np.uint64)), np.flatnonzero(first)))
+
+        records[owners, :NUM_PERM] = (minimums & 0xFFFF).T
+    return records
+
+def _band_keys(records):
+    # 各バンド（LSH_ROWS 個のMinHash）と判別子を1つの32ビットのキーにまとめる
+    # （判別子の違う行は一致しないため、同じキーに集めない）
+    signatures = records[:, :NUM_PERM].astype(np.uint64).reshape(len(records), LSH_BANDS, LSH_ROWS)
+    discriminators = records[:, NUM_PERM].astype(np.uint64) | (records[:, NUM_PERM + 1].astype(np.uint64) << np.uint64(16))
+    keys = (signatures * _BAND_MIX).sum(axis=2) + (discriminators * _DISCRIMINATOR_MIX)[:, None]
+    return (keys >> np.uint64(32)).astype(np.uint32)
+
+def _is_empty(records):
+    return (records[:, :NUM_PERM] == _EMPTY).all(axis=1)
+
+class NearDuplicateIndex:
+    """
+    MinHash の署名（minhash_records()）による近似重複の索引（LSH）。
+
+    署名を LSH_BANDS 個のバンドに分け、バンドごとに整列したキーの配列を持ちます。
+    照合はいずれかのバンドが一致する行だけを候補とし、一致するMinHashの割合が
+    NEAR_DUPLICATE_THRESHOLD 以上で判別子も等しい行を同じ論文の別版とみなします。
+    全件との総当たりは行わないため、照合の手間は登録件数にほぼよらず、
+    索引の作成の手間も件数にほぼ比例します（プレプリントと出版版などを検出できます）。
+
+    行番号は追加した順（論文CSVの行の順）の0からの番号です。
+
+    Parameters:
+    -----------
+    records : numpy.ndarray or None
+        登録済みの署名（(行数, RECORD_WIDTH) の uint16 配列）
+    """
+
+    def __init__(self, records=None):
+        if records is None:
+            records = np.zeros((0, RECORD_WIDTH), dtype=np.uint16)
+        self._records = np.array(records, dtype=np.uint16).reshape(-1, RECORD_WIDTH)
+        self._size = len(self._records)
+        # バンドの表は最初の照合のときに作る（照合しない利用者は作成の手間を払わない）
+        self._band_keys = None
+        self._pending = [{} for _ in range(LSH_BANDS)]
+        self._pending_rows = 0
+        self._sorted_rows = 0
+
+    def _build(self):
+        # すべての行でバンドの表を作り直す
+        records = self._records[:self._size]
+        rows = np.flatnonzero(~_is_empty(records)).astype(np.uint32)
+        keys = _band_keys(records[rows])
+        self._band_keys, self._band_rows = [], []
+        for band in range(LSH_BANDS):
+            order = np.argsort(keys[:, band], kind='stable')
+            self._band_keys.append(keys[order, band])
+            self._band_rows.append(rows[order])
+        self._pending = [{} for _ in range(LSH_BANDS)]
+        self._pending_rows = 0
+        self._sorted_rows = self._size
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def records(self):
+        """
+        登録済みの署名（(行数, RECORD_WIDTH) の uint16 配列）
+        """
+        return self._records[:self._size]
+
+    def _verify(self, records, owners, candidates):
+        # 候補の組 (owners[i] 行目の署名, candidates[i] 行目) のうち、別版とみなせるものを返す
+        stored = self._records[candidates]
+        matches = (stored[:, :NUM_PERM] == records[owners, :NUM_PERM]).sum(axis=1)
+        same = (matches >= NEAR_DUPLICATE_THRESHOLD * NUM_PERM) \
+            & (stored[:, NUM_PERM:] == records[owners, NUM_PERM:]).all(axis=1)
+        return owners[same], candidates[same]
+
+    def find(self, records, recent_only=False):
+        """
+        各署名について、登録済みの行のうち同じ論文の別版とみなせる行番号を返します。
+
+        Parameters:
+        -----------
+        records : numpy.ndarray
+            照合する署名（(件数, RECORD_WIDTH) の uint16 配列）
+        recent_only : bool
+            True の場合は、バンドの表に未反映の最近追加した行（前回の find() 以降に
+            追加した行を含む）だけと照合します（同じバッチの中での重複の確認用）
+
+        Returns:
+        --------
+        numpy.ndarray
+            一致した行番号（複数ある場合は最も小さい番号、ない場合は -1）
+        """
+        records = np.asarray(records, dtype=np.uint16).reshape(-1, RECORD_WIDTH)
+        if self._band_keys is None or (
+                not recent_only and self._pending_rows > max(MERGE_MIN_ROWS, MERGE_RATIO * self._sorted_rows)):
+            self._build()
+
+        result = np.full(len(records), -1, dtype=np.int64)
+        valid = np.flatnonzero(~_is_empty(records))
+        if self._size:
+            for start in range(0, len(valid), FIND_CHUNK_ROWS):
+                self._find_chunk(records, valid[start:start + FIND_CHUNK_ROWS], result, recent_only)
+        return result
+
+    def _find_chunk(self, records, positions, result, recent_only):
+        keys = _band_keys(records[positions])
+
+        # 整列済みの表から、バンドのキーが一致する候補の組をまとめて取り出す
+        # （同じキーの行が多いバンドは古い行から MAX_BUCKET_ROWS 件まで。他のバンドでも照合される）
+        owners, candidates = [], []
+        for band in range(0 if recent_only else LSH_BANDS):
+            band_keys = self._band_keys[band]
+            lo = np.searchsorted(band_keys, keys[:, band], side='left')
+            hi = np.searchsorted(band_keys, keys[:, band], side='right')
+            counts = np.minimum(hi - lo, MAX_BUCKET_ROWS)
+            total = int(counts.sum())
+            if not total:
+                continue
+            starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+            owners.append(np.repeat(positions, counts))
+            candidates.append(self._band_rows[band][starts + np.arange(total)])
+
+        # 表に未反映の追加分は辞書で照合する
+        if self._pending_rows:
+            for index, position in enumerate(positions):
+                for band in range(LSH_BANDS):
+                    pending = self._pending[band].get(int(keys[index, band]))
+                    if pending:
+                        pending = pending[:MAX_BUCKET_ROWS]
+                        owners.append(np.full(len(pending), position, dtype=np.int64))
+                        candidates.append(np.array(pending, dtype=np.int64))
+        if not owners:
+            return
+
+        # 複数のバンドで見つかった組を1つにまとめる（署名の順、候補の行番号の順に並ぶ）
+        pairs = np.unique(np.concatenate(owners).astype(np.int64) * self._size
+                          + np.concatenate(candidates).astype(np.int64))
+        owners, candidates = self._verify(records, pairs // self._size, pairs % self._size)
+        # 署名ごとに最も小さい行番号を選ぶ
+        first = np.ones(len(owners), dtype=bool)
+        first[1:] = owners[1:] != owners[:-1]
+        result[owners[first]] = candidates[first]
+
+    def add(self, records):
+        """
+        署名を末尾の行として追加し、追加した行番号を返します。
+        """
+        records = np.asarray(records, dtype=np.uint16).reshape(-1, RECORD_WIDTH)
+        if self._size + len(records) > len(self._records):
+            capacity = max(self._size + len(records), 2 * len(self._records), 1024)
+            grown = np.empty((capacity, RECORD_WIDTH), dtype=np.uint16)
+            grown[:self._size] = self._records[:self._size]
+            self._records = grown
+        rows = np.arange(self._size, self._size + len(records))
+        self._records[rows] = records
+        self._size += len(records)
+        self._index_pending(rows)
+        return rows
+
+    def replace(self, row, record):
+        """
+        row 行目の署名を置き換えます（タイトルや著者が更新された論文）。
+        """
+        self._records[row] = record
+        # 古いキーは表に残るが、照合時に署名を比べ直すため一致しない
+        self._index_pending(np.array([row]))
+
+    def _index_pending(self, rows):
+        rows = rows[~_is_empty(self._records[rows])]
+        if not len(rows):
+            return
+        keys = _band_keys(self._records[rows])
+        for index, row in enumerate(rows.tolist()):
+            for band in range(LSH_BANDS):
+                self._pending[band].setdefault(int(keys[index, band]), []).append(row)
+        self._pending_rows += len(rows)
+
+def split_retractions(articles):
+    """
+    論文詳細のリストから、撤回された論文と撤回告知を取り除きます。
+
+    出版種別が「Retracted Publication」の論文はその論文を、「Retraction of Publication」
+    （撤回告知）は撤回された論文（retraction_of）を、根拠として使わない論文として返します。
+
+    Parameters:
+    -----------
+    articles : list of dict
+        get_pubmed_article_details() などが返す論文詳細のリスト
+
+    Returns:
+    --------
+    tuple
+        (撤回に関係しない論文のリスト, 撤回された論文のPMIDの集合)
+    """
+    kept, retracted = [], set()
+    for article in articles:
+        publication_types = article.get('publication_types') or ()
+        if RETRACTED_PUBLICATION in publication_types:
+            retracted.add(str(article['pmid']))
+        elif RETRACTION_NOTICE in publication_types:
+            retracted.update(str(pmid) for pmid in article.get('retraction_of') or ())
+        else:
+            kept.append(article)
+    return kept, retracted
@@ -0,0 +1,349 @@
+import csv
+import os
+import sqlite3
+import threading
+import pandas as pd
+from paper_store import PAPER_COLUMNS, REPLACED_PMID_KEY
+from ortho_core.evidence_index import EvidenceIndex
+
+# 検索に使う列（それぞれにインデックスを作成）
+INDEXED_COLUMNS = ['issue', 'evidence_level', 'age_group', 'doi', 'pmid']
+
+def data_version(path):
+    """
+    ファイルの版を表す文字列（サイズと更新時刻）を返します。
+    ファイルがない場合は空文字列を返します。
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return ''
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def default_db_file(csv_file):
+    """
+    論文CSVに対応するSQLiteファイルのパス（papers.csv → papers.db）
+    """
+    return os.path.splitext(csv_file)[0] + '.db'
+
+class EvidenceDB:
+    """
+    論文エビデンスを検索するためのSQLiteデータベース。
+
+    論文CSV（papers.csv）を正本とし、その内容をインデックス付きのテーブルに
+    取り込んで、歯列問題・エビデンスレベル・年齢グループによる絞り込みを
+    インデックス検索で行います。取り込み済みのCSVの版を記録しておき、
+    CSVが外部で変更された場合は次の参照時に1度だけ取り込み直します。
+
+    接続はスレッド間で共有し、操作はロックで直列化します。
+
+    Parameters:
+    -----------
+    csv_file : str
+        論文CSVのパス
+    db_file : str or None
+        SQLiteファイルのパス（省略時は CSVと同じ場所の .db ファイル）
+    """
+
+    def __init__(self, csv_file='papers.csv', db_file=None):
+        self.csv_file = csv_file
+        self.db_file = db_file or default_db_file(csv_file)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        with self._lock:
+            self._create_schema()
+            self.sync_from_csv()
+
+    def _create_schema(self):
+        columns = ', '.join(f'{column} TEXT' for column in PAPER_COLUMNS)
+        with self._conn:
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS papers (id INTEGER PRIMARY KEY, {columns})')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._create_indexes()
+
+    def _create_indexes(self):
+        for column in INDEXED_COLUMNS:
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS idx_papers_{column} ON papers ({column})')
+        # 歯列問題＋エビデンスレベルの絞り込み（レポート生成時の検索）用
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_papers_issue_level ON papers (issue, evidence_level)')
+
+    def _drop_indexes(self):
+        for column in INDEXED_COLUMNS:
+            self._conn.execute(f'DROP INDEX IF EXISTS idx_papers_{column}')
+        self._conn.execute('DROP INDEX IF EXISTS idx_papers_issue_level')
+
+    # ------------------------------------------------------------------
+    # CSVとの同期
+
+    def _get_meta(self, key):
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _insert_values(self, values):
+        placeholders = ', '.join('?' for _ in PAPER_COLUMNS)
+        self._conn.executemany(
+            f"INSERT INTO papers ({', '.join(PAPER_COLUMNS)}) VALUES ({placeholders})",
+            values
+        )
+
+    def _insert(self, rows):
+        self._insert_values(
+            tuple(str(row[c]) if row.get(c) not in (None, '') else None for c in PAPER_COLUMNS)
+            for row in rows
+        )
+
+    def _read_csv_values(self, f):
+        # CSVの列順に依存せず、PAPER_COLUMNS の順の値タプルを返す（空欄は None）
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [header.index(c) if c in header else None for c in PAPER_COLUMNS]
+        for record in reader:
+            if not record:
+                continue
+            record = record + [''] * (len(header) - len(record))
+            yield tuple(record[i] or None if i is not None else None for i in positions)
+
+    def migrate_from_csv(self):
+        """
+        論文CSVの内容でテーブルを作り直します（1回のトランザクションで置き換え）。
+
+        Returns:
+        --------
+        int
+            取り込んだ論文数
+        """
+        with self._lock:
+            version = data_version(self.csv_file)
+            # 一括取り込みはインデックスを外して行い、最後に作り直す
+            with self._conn:
+                self._drop_indexes()
+                self._conn.execute('DELETE FROM papers')
+                if version:
+                    with open(self.csv_file, encoding='utf-8', newline='') as f:
+                        self._insert_values(self._read_csv_values(f))
+                self._create_indexes()
+                self._set_meta('csv_version', version)
+            return self._conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+
+    def sync_from_csv(self):
+        """
+        論文CSVが前回の取り込み以降に変更されていれば取り込み直します。
+
+        Returns:
+        --------
+        bool
+            取り込み直した場合は True
+        """
+        with self._lock:
+            if self._get_meta('csv_version') == data_version(self.csv_file):
+                return False
+            self.migrate_from_csv()
+            return True
+
+    def record_append(self, rows, version_before, version_after):
+        """
+        論文CSVに追記した行をテーブルにも追加します。
+
+        取り込み済みの版が追記前の版と一致しない（他の書き込みがあった）場合は、
+        CSV全体を取り込み直します。
+
+        Parameters:
+        -----------
+        rows : list of dict
+            追記した行
+        version_before, version_after : str
+            追記前後の data_version(csv_file)
+        """
+        with self._lock:
+            if self._get_meta('csv_version') != version_before:
+                self.migrate_from_csv()
+                return
+            with self._conn:
+                self._insert(rows)
+                self._set_meta('csv_version', version_after)
+
+    def record_upsert(self, added_rows, updated_rows, version_before, version_after):
+        """
+        論文CSVへの追記と上書き（PaperStore.upsert_rows() の結果）をテーブルにも反映します。
+
+        上書きした行はPMID（別版で置き換えた行は置き換え前のPMID）で対応する行を
+        置き換えます。取り込み済みの版が変更前の版と一致しない場合や、対応する行が
+        ない（PMIDのない古い行を置き換えた）場合は、CSV全体を取り込み直します。
+
+        Parameters:
+        -----------
+        added_rows, updated_rows : list of dict
+            追記した行と上書きした行
+        version_before, version_after : str
+            変更前後の data_version(csv_file)
+        """
+        with self._lock:
+            if self._get_meta('csv_version') != version_before:
+                self.migrate_from_csv()
+                return
+            assignments = ', '.join(f'{column} = ?' for column in PAPER_COLUMNS)
+            with self._conn:
+                for row in updated_rows:
+                    cursor = self._conn.execute(
+                        f'UPDATE papers SET {assignments} WHERE pmid = ?',
+                        tuple(str(row[c]) if row.get(c) not in (None, '') else None for c in PAPER_COLUMNS)
+                        + (str(row.get(REPLACED_PMID_KEY) or row['pmid']),)
+                    )
+                    if not cursor.rowcount:
+                        break
+                else:
+                    self._insert(added_rows)
+                    self._set_meta('csv_version', version_after)
+                    return
+            self.migrate_from_csv()
+
+    def record_remove(self, pmids, version_before, version_after):
+        """
+        論文CSVから取り除いた行（PaperStore.remove_rows() の結果）をテーブルからも削除します。
+
+        取り込み済みの版が変更前の版と一致しない場合は、CSV全体を取り込み直します。
+
+        Parameters:
+        -----------
+        pmids : list of str
+            取り除いた行のPMID
+        version_before, version_after : str
+            変更前後の data_version(csv_file)
+        """
+        with self._lock:
+            if self._get_meta('csv_version') != version_before:
+                self.migrate_from_csv()
+                return
+            with self._conn:
+                self._conn.executemany('DELETE FROM papers WHERE pmid = ?', [(str(pmid),) for pmid in pmids])
+                self._set_meta('csv_version', version_after)
+
+    # ------------------------------------------------------------------
+    # 検索API
+
+    def query_papers(self, issue=None, evidence_levels=None, age_groups=None):
+        """
+        条件に合う論文をCSVと同じ順序で返します。
+
+        Parameters:
+        -----------
+        issue : str or None
+            歯列問題（None の場合は絞り込まない）
+        evidence_levels : list of str or None
+            エビデンスレベル（None または空の場合は絞り込まない）
+        age_groups : list of str or None
+            年齢グループ（None または空の場合は絞り込まない）
+
+        Returns:
+        --------
+        pandas.DataFrame
+            論文CSVと同じ列を持つデータフレーム
+        """
+        conditions = []
+        params = []
+        if issue is not None:
+            conditions.append('issue = ?')
+            params.append(issue)
+        for column, values in (('evidence_level', evidence_levels), ('age_group', age_groups)):
+            if values:
+                values = [str(v) for v in values]
+                conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+
+        sql = f"SELECT {', '.join(PAPER_COLUMNS)} FROM papers"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY id'
+
+        with self._lock:
+            self.sync_from_csv()
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def papers_by_pmid(self, pmids):
+        """
+        指定したPMIDの論文をCSVと同じ順序で返します（登録されていないPMIDは含みません）。
+
+        Returns:
+        --------
+        pandas.DataFrame
+            論文CSVと同じ列を持つデータフレーム
+        """
+        pmids = [str(pmid) for pmid in pmids]
+        frames = []
+        with self._lock:
+            self.sync_from_csv()
+            # SQLiteの変数の上限を超えないよう分割して問い合わせる
+            for start in range(0, len(pmids), 500):
+                chunk = pmids[start:start + 500]
+                frames.append(pd.read_sql_query(
+                    f"SELECT id, {', '.join(PAPER_COLUMNS)} FROM papers WHERE pmid IN ({', '.join('?' for _ in chunk)})",
+                    self._conn, params=chunk
+                ))
+        if not frames:
+            return pd.DataFrame(columns=PAPER_COLUMNS)
+        papers = pd.concat(frames).sort_values('id')
+        return papers[PAPER_COLUMNS].reset_index(drop=True)
+
+    def issues(self):
+        """
+        登録されている歯列問題の一覧（CSVに最初に現れた順）
+        """
+        with self._lock:
+            self.sync_from_csv()
+            rows = self._conn.execute(
+                'SELECT issue FROM papers WHERE issue IS NOT NULL GROUP BY issue ORDER BY MIN(id)'
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self):
+        """
+        登録されている論文数
+        """
+        with self._lock:
+            self.sync_from_csv()
+            return self._conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+
+    def value_counts(self, column):
+        """
+        列の値ごとの論文数（件数の多い順、pandas の value_counts() と同じ形式）
+
+        Parameters:
+        -----------
+        column : str
+            'issue' や 'evidence_level' などの列名
+        """
+        if column not in PAPER_COLUMNS:
+            raise ValueError(f"不明な列です: {column}")
+        with self._lock:
+            self.sync_from_csv()
+            rows = self._conn.execute(
+                f'SELECT {column}, COUNT(*) AS n FROM papers WHERE {column} IS NOT NULL '
+                f'GROUP BY {column} ORDER BY n DESC, MIN(id)'
+            ).fetchall()
+        return pd.Series([n for _, n in rows], index=[value for value, _ in rows], name='count')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+def get_evidence_db(csv_file='papers.csv'):
+    """
+    論文CSVごとに共有する EvidenceDB を返します。
+    """
+    key = os.path.abspath(csv_file)
+    with _databases_lock:
+        if key not in _databases:
+            _databases[key] = EvidenceDB(csv_file)
+        return _databases[key]
+
+def build_evidence_index(csv_file='papers.csv'):
+    """
+    論文CSVの現在の内容から歯列問題ごとのエビデンス索引を作成します。
+    """
+    return EvidenceIndex.from_papers(get_evidence_db(csv_file).query_papers(), data_version(csv_file))
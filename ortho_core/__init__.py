@@ -0,0 +1,13 @@
+"""
+歯科矯正エビデンスレポートの中核機能（Streamlitに依存しない純粋なモジュール群）。
+
+- reference_data : 参照データ（年齢別リスク、問題別の矯正効果など）
+- scoring        : 矯正必要性スコア・経済的メリットの計算（1人ずつ／一括）
+- evidence_index : 歯列問題ごとのエビデンス索引
+- report         : 患者1人分のレポートの作成（Markdown本文と表示用のデータ）
+- render         : HTMLレポート・エビデンスレベルのバッジの作成
+- report_cache   : 作成済みレポートのキャッシュ（入力のハッシュがキー、合計サイズで上限）
+- pdf            : PDFレポートの作成（reportlab が必要、日本語フォントを埋め込み）
+
+インポート時にファイルの読み込みやStreamlitの読み込みは行いません。
+"""
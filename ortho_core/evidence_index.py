@@ -0,0 +1,151 @@
+import math
+import re
+from collections import namedtuple
+from types import MappingProxyType
+
+# エビデンスレベル（高い順）
+EVIDENCE_LEVELS = ('1a', '1b', '2a', '2b', '3', '4', '5')
+
+# 年齢グループごとの対象年齢（両端を含む）。ここにない年齢グループは全年齢が対象
+AGE_GROUP_RANGES = {
+    '小児': (-math.inf, 12),
+    '小児・青年': (-math.inf, 18),
+    '成人': (19, 60),
+    '成人・高齢者': (40, math.inf),
+}
+
+# リスク記述から最初の数値を取り出すパターン（例: "42%上昇" → 42）
+RISK_VALUE_PATTERN = re.compile(r'\d+\.?\d*')
+
+def parse_risk_value(risk_text):
+    """
+    リスク記述に含まれる最初の数値を返します（数値がない場合は0）。
+    """
+    match = RISK_VALUE_PATTERN.search(risk_text or '')
+    return float(match.group(0)) if match else 0.0
+
+def normalize_evidence_level(evidence_level):
+    """
+    エビデンスレベルを '1a'〜'5' の文字列にそろえます（不明な値は '5'）。
+    """
+    if evidence_level is None:
+        return '5'
+    level = str(evidence_level).strip().lower()
+    return level if level in EVIDENCE_LEVELS else '5'
+
+class EvidenceRecord(namedtuple('EvidenceRecord', [
+    'issue', 'risk_description', 'risk_value', 'evidence_level', 'study_type',
+    'sample_size', 'age_group', 'age_min', 'age_max', 'doi', 'title'
+])):
+    """
+    レポート生成用に前処理した論文1件分のエビデンス（変更不可）。
+
+    risk_value はリスク記述から取り出した数値、age_min / age_max は
+    年齢グループから求めた対象年齢の範囲です。
+    """
+    __slots__ = ()
+
+    def matches_age(self, age):
+        """
+        患者の年齢がこの論文の対象年齢に含まれるかどうか
+        """
+        return self.age_min <= age <= self.age_max
+
+def _text(value, default=''):
+    # 欠損値（None や NaN）は既定値に置き換える
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return default
+    return str(value)
+
+def make_evidence_record(row):
+    """
+    論文CSVの1行（辞書またはpandasの行）から EvidenceRecord を作成します。
+    """
+    risk_description = _text(row.get('risk_description'))
+    age_group = _text(row.get('age_group'))
+    age_min, age_max = AGE_GROUP_RANGES.get(age_group, (-math.inf, math.inf))
+    return EvidenceRecord(
+        issue=_text(row.get('issue')),
+        risk_description=risk_description,
+        risk_value=parse_risk_value(risk_description),
+        evidence_level=normalize_evidence_level(row.get('evidence_level')),
+        study_type=_text(row.get('study_type')),
+        sample_size=_text(row.get('sample_size'), '不明'),
+        age_group=age_group,
+        age_min=age_min,
+        age_max=age_max,
+        doi=_text(row.get('doi')),
+        title=_text(row.get('title'))
+    )
+
+class EvidenceIndex:
+    """
+    歯列問題ごとのエビデンスの索引（作成後は変更不可）。
+
+    論文データの版ごとに1度だけ作成し、レポート生成では歯列問題で引いた
+    レコードを年齢・エビデンスレベルで絞り込むだけにします。
+    各歯列問題のレコードは論文CSVと同じ順序で並んでいます。
+
+    Parameters:
+    -----------
+    records : iterable of EvidenceRecord
+        索引に含めるレコード（論文CSVの順）
+    version : str
+        元にした論文データの版（evidence_db.data_version() の値）
+    """
+
+    def __init__(self, records, version=''):
+        by_issue = {}
+        for record in records:
+            if record.issue:
+                by_issue.setdefault(record.issue, []).append(record)
+        self._by_issue = MappingProxyType({issue: tuple(items) for issue, items in by_issue.items()})
+        self.version = version
+
+    @classmethod
+    def from_papers(cls, papers, version=''):
+        """
+        論文のデータフレーム（EvidenceDB.query_papers() の結果など）から索引を作成します。
+        """
+        return cls((make_evidence_record(row) for row in papers.to_dict('records')), version)
+
+    @property
+    def issues(self):
+        """
+        索引に含まれる歯列問題（論文CSVに最初に現れた順）
+        """
+        return list(self._by_issue)
+
+    def __len__(self):
+        return sum(len(records) for records in self._by_issue.values())
+
+    def records(self, issue):
+        """
+        歯列問題のすべてのレコード（該当がなければ空のタプル）
+        """
+        return self._by_issue.get(issue, ())
+
+    def select(self, issue, evidence_levels=None, age=None):
+        """
+        歯列問題のレコードをエビデンスレベルと年齢で絞り込みます。
+
+        Parameters:
+        -----------
+        issue : str
+            歯列問題
+        evidence_levels : list of str or None
+            含めるエビデンスレベル（None または空の場合は絞り込まない）
+        age : int or None
+            患者の年齢（None の場合は絞り込まない）
+
+        Returns:
+        --------
+        list of EvidenceRecord
+        """
+        records = self.records(issue)
+        if evidence_levels:
+            levels = {normalize_evidence_level(level) for level in evidence_levels}
+            records = [record for record in records if record.evidence_level in levels]
+        if age is not None:
+            records = [record for record in records if record.matches_age(age)]
+        return list(records)
@@ -0,0 +1,244 @@
+import io
+import os
+import threading
+from functools import lru_cache
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from .reference_data import get_reference_tables
+from .render import EVIDENCE_LEVEL_STYLES
+
+# 埋め込む日本語フォント（TrueType/TrueTypeコレクション）のパスを指定する環境変数
+FONT_ENV_VAR = 'ORTHO_PDF_FONT'
+
+# 環境変数の指定がない場合に探すフォント（先に見つかったものを使用）
+FONT_CANDIDATES = [
+    '/usr/share/fonts/opentype/ipaexfont-gothic/ipaexg.ttf',
+    '/usr/share/fonts/truetype/ipaexfont-gothic/ipaexg.ttf',
+    '/usr/share/fonts/truetype/fonts-japanese-gothic.ttf',
+    '/usr/share/fonts/ipa-gothic/ipag.ttf',
+    'C:/Windows/Fonts/msgothic.ttc',
+]
+
+# 埋め込み用のフォントが見つからない場合のCIDフォント（埋め込まず、PDFビューア側のフォントで表示）
+FALLBACK_CID_FONT = 'HeiseiKakuGo-W5'
+
+# リスクの重要度の表示（PDFのフォントには絵文字がないため文字と色で表す）
+RISK_LEVEL_LABELS = {
+    '🔴 高': ('高', '#ff4444'),
+    '🟡 中': ('中', '#ffbb33'),
+    '🟢 低': ('低', '#00C851')
+}
+
+_font_name = None
+_font_lock = threading.Lock()
+
+def register_japanese_font():
+    """
+    PDFに使う日本語フォントを登録し、フォント名を返します（プロセス内で1度だけ登録）。
+
+    環境変数 ORTHO_PDF_FONT、または FONT_CANDIDATES のTrueTypeフォントを
+    PDFに埋め込みます（使用する文字だけのサブセット）。見つからない場合は
+    埋め込みなしのCIDフォント（HeiseiKakuGo-W5）を使います。
+    一括作成のワーカープロセスでは、初期化時に呼び出しておきます。
+    """
+    global _font_name
+    with _font_lock:
+        if _font_name is not None:
+            return _font_name
+
+        paths = [os.environ[FONT_ENV_VAR]] if os.environ.get(FONT_ENV_VAR) else FONT_CANDIDATES
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont('OrthoJapanese', path, subfontIndex=0))
+                _font_name = 'OrthoJapanese'
+                return _font_name
+            except Exception as e:
+                print(f"フォントの読み込みに失敗しました ({path}): {e}")
+
+        if os.environ.get(FONT_ENV_VAR):
+            print(f"{FONT_ENV_VAR} のフォントが使えないため、{FALLBACK_CID_FONT} を使用します")
+        pdfmetrics.registerFont(UnicodeCIDFont(FALLBACK_CID_FONT))
+        _font_name = FALLBACK_CID_FONT
+        return _font_name
+
+@lru_cache(maxsize=1)
+def _styles():
+    # 段落スタイル（フォント登録後にプロセス内で1度だけ作成）
+    font = register_japanese_font()
+    body = ParagraphStyle('body', fontName=font, fontSize=9.5, leading=15, wordWrap='CJK')
+    return {
+        'title': ParagraphStyle('title', parent=body, fontSize=18, leading=26, alignment=1,
+                                textColor=colors.HexColor('#0066cc'), spaceAfter=4 * mm),
+        'center': ParagraphStyle('center', parent=body, alignment=1),
+        'h2': ParagraphStyle('h2', parent=body, fontSize=13, leading=18, textColor=colors.HexColor('#0066cc'),
+                             spaceBefore=5 * mm, spaceAfter=2 * mm),
+        'body': body,
+        'box': ParagraphStyle('box', parent=body, backColor=colors.HexColor('#e8f4f8'),
+                              borderPadding=(2 * mm, 2 * mm, 2 * mm, 2 * mm), spaceBefore=1 * mm, spaceAfter=3 * mm),
+        'warning': ParagraphStyle('warning', parent=body, backColor=colors.HexColor('#fff3cd'),
+                                  borderPadding=(2 * mm, 2 * mm, 2 * mm, 2 * mm), spaceBefore=2 * mm, spaceAfter=2 * mm),
+        'risk': ParagraphStyle('risk', parent=body, spaceBefore=2 * mm),
+        'detail': ParagraphStyle('detail', parent=body, fontSize=8, leading=12, leftIndent=5 * mm,
+                                 textColor=colors.HexColor('#555555')),
+        'cell': ParagraphStyle('cell', parent=body, fontSize=8.5, leading=13)
+    }
+
+@lru_cache(maxsize=1)
+def _reference_rows():
+    # 矯正タイミング評価に使う参照データ（行単位で引ける形、プロセス内で1度だけ作成）
+    tables = get_reference_tables()
+    ortho_age_risks = tables['ortho_age_risks']
+    return {
+        'age_risks': list(zip(ortho_age_risks['age_threshold'].tolist(), ortho_age_risks['description'])),
+        'timing_benefits': tables['timing_benefits'][['age_group', 'recommendation_level', 'benefit']].to_dict('records'),
+        'future_scenarios': tables['future_scenarios'][['timeframe', 'with_ortho', 'without_ortho']].to_dict('records')
+    }
+
+def _table(rows, col_widths, styles, header=True):
+    table = Table([[Paragraph(cell, styles['cell']) for cell in row] for row in rows], colWidths=col_widths)
+    commands = [
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP')
+    ]
+    if header:
+        commands.append(('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')))
+    table.setStyle(TableStyle(commands))
+    return table
+
+def _build_story(report_data):
+    styles = _styles()
+    reference = _reference_rows()
+    patient = report_data['patient']
+    options = report_data['options']
+    necessity_score = report_data['necessity_score']
+    economic_benefits = report_data['economic_benefits']
+    age = patient['age']
+
+    story = [
+        Paragraph("歯科矯正評価レポート", styles['title']),
+        Paragraph(f"<b>生成日:</b> {escape(report_data['date'])}", styles['center']),
+        Paragraph(f"<b>患者情報:</b> {age}歳, {escape(str(patient['gender']))}", styles['center'])
+    ]
+    if patient['additional_notes']:
+        story.append(Paragraph(f"<b>特記事項:</b> {escape(patient['additional_notes'])}", styles['center']))
+
+    # 矯正必要性スコア
+    story.append(Paragraph("矯正必要性スコア", styles['h2']))
+    story.append(_table([
+        ["総合スコア", "タイミング", "問題重大度", "将来リスク"],
+        [f"<b>{necessity_score['total_score']}</b>/100", str(necessity_score['timing_score']),
+         str(necessity_score['severity_score']), str(necessity_score['risk_score'])]
+    ], [42 * mm] * 4, styles))
+    story.append(Spacer(1, 2 * mm))
+    story.append(Paragraph(f"<b>緊急度:</b> {escape(str(necessity_score['urgency']))}", styles['body']))
+    story.append(Paragraph(f"<b>解釈:</b> {escape(str(necessity_score['interpretation']))}", styles['body']))
+
+    # 高リスク項目のサマリー
+    if report_data['high_risks']:
+        story.append(Paragraph("注意すべき高リスク項目", styles['h2']))
+        for risk in report_data['high_risks']:
+            story.append(Paragraph(f"・{escape(risk)}", styles['body']))
+
+    # 矯正タイミング評価（Markdown版と同じく、年齢以上の閾値がある場合に推奨情報を表示）
+    if options['show_ortho_timing']:
+        story.append(Paragraph("矯正タイミング評価", styles['h2']))
+        next_threshold = next((description for threshold, description in reference['age_risks'] if threshold >= age), None)
+        if next_threshold is not None:
+            story.append(Paragraph(f"<b>矯正タイミング警告:</b> {escape(next_threshold)}", styles['warning']))
+            timing_rows = reference['timing_benefits']
+            benefit_info = timing_rows[min(len(timing_rows) - 1, age // 13)]
+            story.append(Paragraph(f"<b>現在の年齢グループ:</b> {escape(benefit_info['age_group'])}", styles['body']))
+            story.append(Paragraph(f"<b>推奨レベル:</b> {escape(benefit_info['recommendation_level'])}", styles['body']))
+            story.append(Paragraph(f"<b>メリット:</b> {escape(benefit_info['benefit'])}", styles['body']))
+        else:
+            story.append(Paragraph("<b>注意:</b> 現在の年齢では標準的な矯正治療に制限がある可能性があります。"
+                                   "専門医との詳細な相談を推奨します。", styles['body']))
+
+    # 経済的メリット
+    if options['show_economic_benefits']:
+        story.append(Paragraph("歯列矯正の経済的メリット", styles['h2']))
+        story.append(_table([
+            ["現在の矯正コスト", "将来の医療費削減額", "生涯の純節約額"],
+            [f"¥{economic_benefits['current_cost']:,}", f"¥{economic_benefits['future_savings']:,}",
+             f"¥{economic_benefits['net_benefit']:,}"]
+        ], [56 * mm] * 3, styles))
+        story.append(Spacer(1, 2 * mm))
+        story.append(Paragraph(f"<b>投資収益率:</b> {economic_benefits['roi']}%（矯正費用に対する長期的リターン）", styles['body']))
+        story.append(Paragraph(f"月あたり約 <b>¥{economic_benefits['monthly_benefit']:,}</b> の医療費削減効果に相当します。",
+                               styles['body']))
+
+    # 将来シナリオ比較
+    if options['show_future_scenarios']:
+        story.append(Paragraph("将来シナリオ比較", styles['h2']))
+        rows = [["期間", "矯正した場合", "矯正しなかった場合"]]
+        rows.extend([escape(row['timeframe']), escape(row['with_ortho']), escape(row['without_ortho'])]
+                    for row in reference['future_scenarios'])
+        story.append(_table(rows, [22 * mm, 73 * mm, 73 * mm], styles))
+
+    # 各歯列問題のリスク評価（年齢に関連する論文のみ、Markdown版と同じ内容）
+    for section in report_data['issue_sections']:
+        story.append(Paragraph(f"{escape(section['issue'])}のリスク評価", styles['h2']))
+        story.append(Paragraph(f"<b>矯正による改善効果:</b> {escape(str(section['benefit_info']))}", styles['box']))
+
+        for entry in section['entries']:
+            if not entry['age_relevant']:
+                continue
+            record = entry['record']
+            label, color = RISK_LEVEL_LABELS.get(entry['risk_level'], (entry['risk_level'], '#333333'))
+            story.append(Paragraph(f'<font color="{color}"><b>{label}</b></font> {escape(record.risk_description)}',
+                                   styles['risk']))
+
+            level_text = EVIDENCE_LEVEL_STYLES.get(record.evidence_level, EVIDENCE_LEVEL_STYLES["5"])['text']
+            study_type = record.study_type.replace('-', ' ').title()
+            sample_size = f" (n={record.sample_size})" if record.sample_size != '不明' else ""
+            story.append(Paragraph(f"エビデンスレベル {escape(record.evidence_level)}: {level_text}"
+                                   f" - {escape(study_type)}{escape(sample_size)}", styles['detail']))
+
+            if options['include_citations'] and record.doi:
+                title = f"{escape(record.title)} " if record.title else ""
+                story.append(Paragraph(f"参考文献: {title}DOI: {escape(record.doi)}", styles['detail']))
+    return story
+
+def generate_pdf_report(report_data):
+    """
+    レポート（build_report() の結果）からPDFを作成します。
+
+    reportlab だけで組版するため、ブラウザや外部コマンドは不要です。
+    日本語フォントは register_japanese_font() で登録したものを使います。
+
+    Parameters:
+    -----------
+    report_data : dict
+        build_report() の結果
+
+    Returns:
+    --------
+    bytes
+        PDFファイルの内容
+    """
+    font = register_japanese_font()
+    footer = f"歯科エビデンス生成システム - レポート生成日: {report_data['date']}"
+
+    def draw_footer(canvas, doc):
+        canvas.saveState()
+        canvas.setFont(font, 8)
+        canvas.setFillColor(colors.HexColor('#666666'))
+        canvas.drawCentredString(A4[0] / 2, 10 * mm, f"{footer}  ({doc.page})")
+        canvas.restoreState()
+
+    buffer = io.BytesIO()
+    # 作成日時などのメタデータを固定し、同じ内容からは同じPDFになるようにする
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20 * mm, rightMargin=20 * mm,
+                            topMargin=18 * mm, bottomMargin=20 * mm,
+                            title="歯科矯正評価レポート", author="歯科エビデンス生成システム", invariant=1)
+    doc.build(_build_story(report_data), onFirstPage=draw_footer, onLaterPages=draw_footer)
+    return buffer.getvalue()
@@ -0,0 +1,117 @@
+import threading
+
+# 歯列問題の一覧（ortho_benefits の行順。スコアの一括計算で使う問題行列の列順）
+ISSUE_NAMES = ('叢生', '開咬', '過蓋咬合', '交叉咬合', '上顎前突', '下顎前突', 'その他の歯列問題')
+
+def load_reference_tables():
+    """
+    レポート生成に使う参照データ（論文以外の固定データ）を作成します。
+    
+    アプリでは st.cache_resource でキャッシュし、全セッションで共有します。
+    共有されるため、返されたデータフレームは変更しないでください。
+    
+    Returns:
+    --------
+    dict
+        'ortho_age_risks', 'ortho_benefits', 'timing_benefits',
+        'future_scenarios', 'economic_impact', 'risk_thresholds' をキーとする辞書
+    """
+    # pandas は参照データを作成するときに初めて読み込む（インポート時間の短縮）
+    import pandas as pd
+    
+    # 年齢別矯正リスクデータ（新規追加）
+    ortho_age_risks = pd.DataFrame({
+        'age_threshold': [12, 18, 25, 40, 60],
+        'tooth_loss_risk': [5, 15, 30, 45, 60],
+        'description': [
+            '12歳までに矯正を行わないと、将来的に5%の歯を喪失するリスクがあります。',
+            '18歳までに矯正を行わないと、将来的に15%の歯を喪失するリスクがあります。また、歯周病リスクが25%上昇します。',
+            '25歳までに矯正を行わないと、将来的に30%の歯を喪失するリスクがあります。また、歯周病リスクが40%上昇し、顎関節症リスクが1.8倍になります。',
+            '40歳までに矯正を行わないと、将来的に45%の歯を喪失するリスクがあります。また、咀嚼機能が35%低下し、歯周病リスクが75%上昇します。',
+            '60歳までに矯正を行わないと、将来的に60%の歯を喪失するリスクがあります。また、咀嚼機能が50%低下し、発音障害リスクが2.4倍になります。'
+        ]
+    })
+
+    # 問題別矯正効果データ（修正版 - 「その他の歯列問題」を追加）
+    ortho_benefits = pd.DataFrame({
+        'issue': list(ISSUE_NAMES),
+        'effect': [
+            '叢生を矯正することで、齲蝕リスクが38%減少、歯周病リスクが45%減少します。',
+            '開咬を矯正することで、前歯部齲蝕リスクが58%減少、発音障害が90%改善します。',
+            '過蓋咬合を矯正することで、臼歯部破折リスクが65%減少、顎関節症リスクが55%減少します。',
+            '交叉咬合を矯正することで、顎発育異常リスクが85%減少、咀嚼効率が40%向上します。',
+            '上顎前突を矯正することで、外傷リスクが75%減少、審美性が大幅に向上します。',
+            '下顎前突を矯正することで、咀嚼障害が70%改善、発音明瞭度が30%向上します。',
+            '歯列問題を矯正することで、全般的に口腔衛生が向上し、齲蝕・歯周病リスクが減少します。また、咀嚼効率の向上や審美性の改善も期待できます。'
+        ],
+        'severity_score': [70, 65, 60, 65, 55, 60, 50]  # 問題の重大度スコア（100点満点）
+    })
+
+    # 矯正メリットのタイミングデータ（新規追加）
+    timing_benefits = pd.DataFrame({
+        'age_group': ['小児期 (7-12歳)', '青年期 (13-18歳)', '成人期前半 (19-35歳)', '成人期後半 (36-60歳)', '高齢期 (61歳以上)'],
+        'benefit': [
+            '骨格の成長を利用した効率的な矯正が可能。将来的な歯列問題を95%予防可能。治療期間が30%短縮。',
+            '顎の成長がまだ続いており、比較的効率的な矯正が可能。将来的な歯列問題を75%予防可能。',
+            '歯の移動は可能だが、治療期間が長くなる傾向。将来的な歯列問題を60%予防可能。',
+            '歯周組織の状態によっては制限あり。治療期間が50%延長。将来的な歯列問題を40%予防可能。',
+            '歯周病や骨粗鬆症などの影響で治療オプションが制限される可能性。治療期間が2倍に延長。'
+        ],
+        'recommendation_level': ['最適', '推奨', '適応', '条件付き推奨', '専門医評価必須'],
+        'timing_score': [100, 80, 60, 40, 20]  # タイミングのスコア（100点満点）
+    })
+
+    # 将来シナリオデータ（新規追加）
+    future_scenarios = pd.DataFrame({
+        'timeframe': ['5年後', '10年後', '20年後'],
+        'with_ortho': [
+            '歯並びが改善され、清掃性が向上。齲蝕・歯周病リスクが40%減少。審美性向上により社会的自信が増加。咀嚼効率が25%向上し、消化不良の問題が改善。',
+            '歯の喪失リスクが65%減少。顎関節症の発症を予防。咀嚼効率の維持により栄養状態が良好。歯並びの安定により新たな歯科問題の発生を抑制。',
+            '健康な歯列の維持により高齢になっても80%以上の歯を保持。入れ歯やインプラントの必要性が大幅に減少。良好な咀嚼機能により食事の質と栄養状態を維持。会話の明瞭さを保ち、社会的交流の質を維持。'
+        ],
+        'without_ortho': [
+            '歯列不正が継続し、清掃困難な部位での齲蝕・歯周病リスクが35%上昇。咀嚼効率の低下（約15%）により、消化不良や栄養吸収の問題が発生する可能性。',
+            '歯周病の進行により、1〜3本の歯を喪失するリスクが高まる。顎関節症を発症するリスクが2.5倍に。咀嚼効率が25%以上低下し、食事の選択肢が制限される可能性。',
+            '重度の歯周病により、5〜10本以上の歯を喪失する可能性が高い。多数の歯の欠損により入れ歯やインプラント治療が必要になる可能性が70%以上。咀嚼機能が50%以上低下し、栄養不足のリスクが増加。発音障害により社会的コミュニケーションに支障をきたす可能性。'
+        ]
+    })
+
+    # 経済的影響データ（新規追加）
+    economic_impact = pd.DataFrame({
+        'age_group': ['小児期 (7-12歳)', '青年期 (13-18歳)', '成人期前半 (19-35歳)', '成人期後半 (36-60歳)', '高齢期 (61歳以上)'],
+        'current_cost': [300000, 350000, 400000, 450000, 500000],  # 現在の矯正費用（円）
+        'future_savings': [1500000, 1200000, 900000, 600000, 300000],  # 将来的な医療費削減額（円）
+        'roi': [400, 250, 125, 35, 0]  # 投資収益率（％）
+    })
+
+    # リスク閾値の設定値（ラジオボタン用）
+    risk_thresholds = {
+        "標準": 30,
+        "厳格": 20,
+        "緩和": 40
+    }
+    
+    return {
+        'ortho_age_risks': ortho_age_risks,
+        'ortho_benefits': ortho_benefits,
+        'timing_benefits': timing_benefits,
+        'future_scenarios': future_scenarios,
+        'economic_impact': economic_impact,
+        'risk_thresholds': risk_thresholds
+    }
+
+_shared_tables = None
+_shared_tables_lock = threading.Lock()
+
+def get_reference_tables():
+    """
+    プロセス内で共有する参照データを返します（最初の呼び出し時に1度だけ作成）。
+    
+    Streamlitを使わないスコア計算・レポート作成のモジュールやバッチ処理から使います。
+    返されたデータフレームは変更しないでください。
+    """
+    global _shared_tables
+    with _shared_tables_lock:
+        if _shared_tables is None:
+            _shared_tables = load_reference_tables()
+        return _shared_tables
@@ -0,0 +1,529 @@
+import gzip
+from datetime import date
+from functools import lru_cache
+from html import escape
+from .reference_data import get_reference_tables
+
+# エビデンスレベルごとの色と説明
+EVIDENCE_LEVEL_STYLES = {
+    "1a": {"color": "#4CAF50", "bg": "#E8F5E9", "text": "メタ分析/システマティックレビュー"},
+    "1b": {"color": "#8BC34A", "bg": "#F1F8E9", "text": "ランダム化比較試験"},
+    "2a": {"color": "#FFC107", "bg": "#FFF8E1", "text": "コホート研究"},
+    "2b": {"color": "#FF9800", "bg": "#FFF3E0", "text": "症例対照研究/臨床試験"},
+    "3": {"color": "#FF5722", "bg": "#FBE9E7", "text": "横断研究/実験研究"},
+    "4": {"color": "#F44336", "bg": "#FFEBEE", "text": "症例報告/症例シリーズ"},
+    "5": {"color": "#9E9E9E", "bg": "#F5F5F5", "text": "専門家意見/不明"}
+}
+
+def render_evidence_level_badge(evidence_level, study_type="", sample_size=""):
+    """
+    エビデンスレベルを視覚的に表示するHTMLを生成します。
+    """
+    level_info = EVIDENCE_LEVEL_STYLES.get(evidence_level, EVIDENCE_LEVEL_STYLES["5"])
+
+    # サンプルサイズの表示形式
+    sample_display = f"n={sample_size}" if sample_size and sample_size != "不明" else ""
+
+    # 研究タイプの表示形式
+    study_display = study_type.replace('-', ' ').title() if study_type else ""
+
+    # HTMLコード生成
+    html = f"""
+    <div style="border-left: 4px solid {level_info['color']};
+                padding: 8px;
+                margin: 5px 0;
+                background-color: {level_info['bg']};
+                border-radius: 4px;">
+        <div style="font-weight: bold; color: {level_info['color']};">
+            エビデンスレベル {evidence_level}: {level_info['text']}
+        </div>
+        <div style="font-size: 0.85em; color: #555;">
+            {study_display} {sample_display}
+        </div>
+    </div>
+    """
+
+    return html
+
+# HTMLレポート共通のスタイルシート（全レポートで同じ内容）
+REPORT_CSS = """
+        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            color: #333;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        h1, h2, h3 {
+            color: #0066cc;
+            border-bottom: 1px solid #ddd;
+            padding-bottom: 5px;
+        }
+        h1 {
+            text-align: center;
+            border-bottom: 2px solid #0066cc;
+        }
+        .header-info {
+            text-align: center;
+            margin-bottom: 20px;
+        }
+        .section {
+            margin: 25px 0;
+            padding: 0 15px;
+        }
+        .risk-item {
+            margin: 10px 0;
+            padding: 10px;
+            border-left: 3px solid #ddd;
+        }
+        .high-risk {
+            background-color: #ffeeee;
+            border-left: 3px solid #ff4444;
+        }
+        .warning {
+            background-color: #fff3cd;
+            padding: 10px;
+            border-left: 4px solid #ffc107;
+            margin: 15px 0;
+        }
+        .benefit {
+            background-color: #e8f4f8;
+            padding: 10px;
+            border-left: 4px solid #0099cc;
+        }
+        .necessity-score {
+            text-align: center;
+            margin: 30px auto;
+            max-width: 400px;
+        }
+        .score-display {
+            font-size: 36px;
+            font-weight: bold;
+            color: white;
+            border-radius: 50%;
+            width: 120px;
+            height: 120px;
+            line-height: 120px;
+            margin: 0 auto;
+            text-align: center;
+        }
+        .score-interpretation {
+            margin-top: 15px;
+            font-weight: bold;
+            font-size: 18px;
+        }
+        .score-details {
+            display: flex;
+            justify-content: space-between;
+            margin-top: 20px;
+            text-align: center;
+        }
+        .score-component {
+            flex: 1;
+            padding: 10px;
+            border: 1px solid #ddd;
+            border-radius: 5px;
+            margin: 0 5px;
+        }
+        .component-value {
+            font-weight: bold;
+            font-size: 24px;
+            color: #0066cc;
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+            margin: 20px 0;
+        }
+        th, td {
+            padding: 8px;
+            text-align: left;
+            border-bottom: 1px solid #ddd;
+        }
+        th {
+            background-color: #f2f2f2;
+        }
+        .comparison-table td {
+            vertical-align: top;
+        }
+        .comparison-table td:first-child {
+            font-weight: bold;
+            width: 20%;
+        }
+        .comparison-good {
+            background-color: #e8f5e9;
+            border-left: 4px solid #4caf50;
+        }
+        .comparison-bad {
+            background-color: #ffebee;
+            border-left: 4px solid #f44336;
+        }
+        .economic-benefit {
+            display: flex;
+            flex-direction: column;
+            align-items: center;
+            margin: 30px 0;
+            padding: 20px;
+            background-color: #e8f5e9;
+            border-radius: 10px;
+        }
+        .economic-numbers {
+            display: flex;
+            justify-content: space-around;
+            width: 100%;
+            margin: 20px 0;
+        }
+        .economic-item {
+            text-align: center;
+            padding: 10px;
+        }
+        .economic-value {
+            font-size: 24px;
+            font-weight: bold;
+            color: #2e7d32;
+        }
+        .economic-label {
+            font-size: 14px;
+            color: #555;
+        }
+        .footer {
+            margin-top: 40px;
+            border-top: 1px solid #ddd;
+            padding-top: 10px;
+            font-size: 0.8em;
+            text-align: center;
+            color: #666;
+        }
+        .evidence-badge {
+            margin: 10px 0;
+            padding: 10px;
+            border-radius: 4px;
+            background-color: #f9f9f9;
+            border-left: 4px solid #0066cc;
+        }
+        .evidence-level {
+            font-weight: bold;
+            font-size: 14px;
+        }
+        .evidence-type {
+            font-size: 12px;
+            color: #666;
+        }
+        @media print {
+            body {
+                font-size: 12pt;
+            }
+            .no-print {
+                display: none;
+            }
+            h1, h2, h3 {
+                page-break-after: avoid;
+            }
+            .section {
+                page-break-inside: avoid;
+            }
+        }
+"""
+
+# レポートの各部分のテンプレート（モジュール読み込み時に1度だけ作成し、str.format で値を埋め込む）
+# 埋め込む値のうち文字列データはすべて escape() 済みのものを渡す
+# 文書の先頭（スタイルシートを含む固定部分）
+_DOCUMENT_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>歯科矯正評価レポート</title>
+    <style>""" + REPORT_CSS + """    </style>
+</head>
+<body>
+    <h1>歯科矯正評価レポート</h1>
+"""
+
+_HEADER_INFO_TEMPLATE = """    <div class="header-info">
+        <p><strong>生成日:</strong> {today}</p>
+        <p><strong>患者情報:</strong> {age}歳, {gender}</p>
+"""
+
+_NOTES_TEMPLATE = '        <p><strong>特記事項:</strong> {notes}</p>\n'
+
+_SCORE_TEMPLATE = """    </div>
+    <div class="section">
+        <h2>矯正必要性スコア</h2>
+        <div class="necessity-score">
+            <div class="score-display" style="background-color: {score_color};">{total_score}</div>
+            <div class="score-interpretation">{interpretation}</div>
+            <div class="score-details">
+                <div class="score-component">
+                    <div class="component-value">{timing_score}</div>
+                    <div>タイミング<br>スコア</div>
+                </div>
+                <div class="score-component">
+                    <div class="component-value">{severity_score}</div>
+                    <div>問題重大度<br>スコア</div>
+                </div>
+                <div class="score-component">
+                    <div class="component-value">{risk_score}</div>
+                    <div>将来リスク<br>スコア</div>
+                </div>
+            </div>
+        </div>
+    </div>
+"""
+
+_TIMING_TEMPLATE = """    <div class="section">
+        <h2>矯正タイミング評価</h2>
+        <p><strong>現在の年齢グループ:</strong> {age_group}</p>
+        <p><strong>推奨レベル:</strong> {recommendation_level}</p>
+        <p><strong>メリット:</strong> {benefit}</p>
+"""
+
+_TIMING_WARNING_TEMPLATE = '        <div class="warning"><strong>⚠️ 矯正タイミング警告:</strong> {description}</div>\n'
+
+_ECONOMIC_TEMPLATE = """    <div class="section">
+        <h2>歯列矯正の経済的メリット</h2>
+        <div class="economic-benefit">
+            <p>歯列矯正は健康への投資です。今矯正することで、生涯にわたって以下の経済的メリットが期待できます：</p>
+            <div class="economic-numbers">
+                <div class="economic-item">
+                    <div class="economic-value">¥{current_cost:,}</div>
+                    <div class="economic-label">現在の矯正コスト</div>
+                </div>
+                <div class="economic-item">
+                    <div class="economic-value">¥{future_savings:,}</div>
+                    <div class="economic-label">将来の医療費削減額</div>
+                </div>
+                <div class="economic-item">
+                    <div class="economic-value">¥{net_benefit:,}</div>
+                    <div class="economic-label">生涯の純節約額</div>
+                </div>
+            </div>
+            <p><strong>投資収益率: {roi}%</strong>（矯正費用に対する長期的リターン）</p>
+            <p>月あたり約 <strong>¥{monthly_benefit:,}</strong> の医療費削減効果に相当します。</p>
+        </div>
+    </div>
+"""
+
+_SCENARIO_HEAD = """    <div class="section">
+        <h2>将来シナリオ比較</h2>
+        <p>矯正治療を受けた場合と受けなかった場合の将来予測：</p>
+        <table class="comparison-table">
+            <tr>
+                <th>期間</th>
+                <th>矯正した場合</th>
+                <th>矯正しなかった場合</th>
+            </tr>
+"""
+
+_SCENARIO_ROW_TEMPLATE = """            <tr>
+                <td>{timeframe}</td>
+                <td class="comparison-good">{with_ortho}</td>
+                <td class="comparison-bad">{without_ortho}</td>
+            </tr>
+"""
+
+_BENEFIT_TEMPLATE = '        <div class="benefit"><strong>矯正による改善効果:</strong> {effect}</div>\n'
+
+# 「その他の歯列問題」など改善効果のデータがない歯列問題のメッセージ
+_DEFAULT_BENEFIT = "この歯列問題には個別の研究に基づいた具体的なデータが利用できません。専門医との詳細な相談をお勧めします。"
+
+_FOOTER_TEMPLATE = """    <div class="footer">
+        歯科エビデンス生成システム - レポート生成日: {today}
+    </div>
+    <div class="no-print" style="text-align: center; margin-top: 30px;">
+        <button onclick="window.print();" style="padding: 10px 20px; background-color: #0066cc; color: white; border: none; border-radius: 4px; cursor: pointer;">
+            印刷する / PDFとして保存
+        </button>
+    </div>
+</body>
+</html>
+"""
+
+def _score_color(total_score):
+    if total_score >= 80:
+        return "#ff4444"  # 赤（緊急）
+    elif total_score >= 60:
+        return "#ff8800"  # オレンジ（高）
+    elif total_score >= 40:
+        return "#ffbb33"  # 黄色（中）
+    return "#00C851"  # 緑（低）
+
+@lru_cache(maxsize=1)
+def _reference_rows():
+    """
+    HTMLレポートで使う参照データを、行単位で引ける形にして返します（プロセス内で1度だけ作成）。
+    """
+    tables = get_reference_tables()
+    ortho_age_risks = tables['ortho_age_risks']
+    timing_benefits = tables['timing_benefits']
+    return {
+        'age_risks': list(zip(ortho_age_risks['age_threshold'].tolist(), ortho_age_risks['description'])),
+        'timing_benefits': [
+            {key: escape(str(value)) for key, value in row.items()}
+            for row in timing_benefits[['age_group', 'recommendation_level', 'benefit']].to_dict('records')
+        ],
+        # 同じ歯列問題が複数ある場合は最初の行を使う
+        'benefits': {issue: effect for issue, effect in reversed(list(zip(
+            tables['ortho_benefits']['issue'], tables['ortho_benefits']['effect'])))}
+    }
+
+@lru_cache(maxsize=4096)
+def _render_evidence_record(record):
+    """
+    論文1件分のHTML（リスク・エビデンスレベル・引用）を返します。
+    患者によらず同じ内容になるため、レコードごとにキャッシュします。
+    """
+    # 論文数に比例して呼ばれるため、テンプレートは str.format より速い f文字列で書く
+    html = f'        <div class="risk-item high-risk"><span style="color: #ff4444; font-weight: bold;">🔴 高</span> {escape(record.risk_description)}</div>\n'
+
+    # エビデンスレベル表示
+    level = record.evidence_level
+    if level:
+        color = "#4CAF50" if level in ["1a", "1b"] else "#FFC107" if level in ["2a", "2b"] else "#F44336"
+        label = EVIDENCE_LEVEL_STYLES[level]['text'] if level in EVIDENCE_LEVEL_STYLES else "不明"
+        study_type = escape(record.study_type.replace('-', ' ').title())
+        sample_size = f"(n={escape(record.sample_size)})" if record.sample_size != '不明' else ""
+        html += f"""        <div class="evidence-badge" style="border-left-color: {color};">
+            <div class="evidence-level" style="color: {color};">エビデンスレベル {escape(level)}: {label}</div>
+            <div class="evidence-type">{study_type} {sample_size}</div>
+        </div>
+"""
+
+    # 論文引用
+    if record.doi:
+        title = f'<em>{escape(record.title)}</em> ' if record.title else ''
+        doi = escape(record.doi)
+        html += f'        <p style="margin-left: 20px; font-size: 0.9em; color: #666;">参考文献: {title}DOI: <a href="https://doi.org/{doi}" target="_blank">{doi}</a></p>\n'
+    return html
+
+# HTMLレポートを生成する関数
+def generate_html_report(age, gender, issues, report_items, high_risks, necessity_score, economic_benefits, scenarios,
+                         show_recommendations=True, additional_notes="", *, evidence_index, report_date=None):
+    """
+    印刷用のHTMLレポートを作成します。
+
+    定型部分はモジュールのテンプレートとスタイルシートを使い、各部分の文字列を
+    リストに集めて最後に1度だけ連結します。患者情報や論文データは HTML エスケープして
+    埋め込むため、同じ入力（と同じ生成日）からは常に同じバイト列が得られます。
+
+    Parameters:
+    -----------
+    age, gender, issues :
+        患者年齢、性別、歯列問題
+    report_items : list of str
+        Markdown本文の行（build_report() の 'markdown_lines'、HTMLには使わない）
+    high_risks : list of str
+        高リスク項目
+    necessity_score, economic_benefits : dict
+        矯正必要性スコアと経済的メリット
+    scenarios : pandas.DataFrame
+        将来シナリオ（参照データの future_scenarios）
+    show_recommendations : bool
+        歯列問題ごとの改善効果を含めるかどうか
+    additional_notes : str
+        特記事項
+    evidence_index : EvidenceIndex
+        歯列問題ごとのエビデンス索引
+    report_date : datetime.date or None
+        レポートの生成日（None の場合は今日）
+
+    Returns:
+    --------
+    str
+        HTML文書
+    """
+    today = (report_date or date.today()).strftime("%Y年%m月%d日")
+    reference = _reference_rows()
+
+    # ヘッダー・特記事項
+    html = [_DOCUMENT_HEAD, _HEADER_INFO_TEMPLATE.format(today=today, age=escape(str(age)), gender=escape(str(gender)))]
+    if additional_notes:
+        html.append(_NOTES_TEMPLATE.format(notes=escape(additional_notes)))
+
+    # 矯正必要性スコア
+    html.append(_SCORE_TEMPLATE.format(
+        score_color=_score_color(necessity_score["total_score"]),
+        total_score=necessity_score["total_score"],
+        interpretation=escape(str(necessity_score["interpretation"])),
+        timing_score=necessity_score["timing_score"],
+        severity_score=necessity_score["severity_score"],
+        risk_score=necessity_score["risk_score"]
+    ))
+
+    # 高リスク項目のサマリー
+    if high_risks:
+        html.append('    <div class="section">\n        <h2>注意すべき高リスク項目</h2>\n')
+        html.extend(f'        <div class="risk-item high-risk">{escape(risk)}</div>\n' for risk in high_risks)
+        html.append('    </div>\n')
+
+    # 矯正タイミング評価
+    timing_rows = reference['timing_benefits']
+    html.append(_TIMING_TEMPLATE.format(**timing_rows[min(len(timing_rows) - 1, age // 13)]))
+
+    # 患者の年齢に基づいたリスク評価（年齢以上の最初の閾値）
+    for threshold, description in reference['age_risks']:
+        if threshold >= age:
+            html.append(_TIMING_WARNING_TEMPLATE.format(description=escape(description)))
+            break
+    html.append('    </div>\n')
+
+    # 経済的メリット
+    html.append(_ECONOMIC_TEMPLATE.format(**economic_benefits))
+
+    # 将来シナリオ比較
+    html.append(_SCENARIO_HEAD)
+    for timeframe, with_ortho, without_ortho in zip(scenarios['timeframe'], scenarios['with_ortho'], scenarios['without_ortho']):
+        html.append(_SCENARIO_ROW_TEMPLATE.format(
+            timeframe=escape(timeframe), with_ortho=escape(with_ortho), without_ortho=escape(without_ortho)
+        ))
+    html.append('        </table>\n    </div>\n')
+
+    # 各歯列問題の詳細
+    for issue in issues:
+        records = evidence_index.records(issue)
+        if records:
+            html.append(f'    <div class="section">\n        <h2>{escape(issue)}のリスク評価</h2>\n')
+
+            # 矯正による改善効果
+            if show_recommendations:
+                html.append(_BENEFIT_TEMPLATE.format(effect=escape(reference['benefits'].get(issue, _DEFAULT_BENEFIT))))
+
+            # リスク項目（エビデンスレベル付き）
+            html.extend(_render_evidence_record(record) for record in records)
+            html.append('    </div>\n')
+
+    # フッター
+    html.append(_FOOTER_TEMPLATE.format(today=today))
+
+    return ''.join(html)
+
+def encode_report_files(markdown_lines, html_report, compress_html=False):
+    """
+    ダウンロード用のファイル（UTF-8のバイト列）を作成します。
+
+    画面のダウンロードボタンやキャッシュでは、ここで1度だけエンコードした
+    バイト列を共有します。
+
+    Parameters:
+    -----------
+    markdown_lines : list of str
+        Markdown本文の行（build_report() の 'markdown_lines'）
+    html_report : str
+        generate_html_report() のHTML
+    compress_html : bool
+        HTMLをgzip圧縮するかどうか（圧縮結果は同じ入力からは常に同じバイト列）
+
+    Returns:
+    --------
+    dict
+        'markdown' と 'html'（compress_html の場合は 'html.gz'）をキーとする辞書
+    """
+    files = {'markdown': "\n".join(markdown_lines).encode('utf-8')}
+    html_bytes = html_report.encode('utf-8')
+    if compress_html:
+        # 更新時刻を固定して、同じ内容からは同じ圧縮結果になるようにする
+        files['html.gz'] = gzip.compress(html_bytes, mtime=0)
+    else:
+        files['html'] = html_bytes
+    return files
@@ -0,0 +1,188 @@
+from datetime import date
+from .scoring import calculate_ortho_necessity_score, calculate_economic_benefits
+from .reference_data import get_reference_tables
+
+# エビデンスレベルの既定の絞り込み（高・中エビデンスのみ）
+DEFAULT_EVIDENCE_FILTER = ['1a', '1b', '2a']
+
+def build_report(age, gender, issues, evidence_index, evidence_filter=DEFAULT_EVIDENCE_FILTER, risk_threshold=30,
+                 additional_notes="", include_citations=True, show_ortho_timing=True,
+                 show_economic_benefits=True, show_future_scenarios=True,
+                 necessity_score=None, economic_benefits=None, report_date=None):
+    """
+    患者1人分の評価レポートを作成します（Streamlitには依存しません）。
+
+    Parameters:
+    -----------
+    age : int
+        患者年齢
+    gender : str
+        性別
+    issues : list of str
+        歯列問題
+    evidence_index : EvidenceIndex
+        歯列問題ごとのエビデンス索引
+    evidence_filter : list of str
+        レポートに含めるエビデンスレベル（空の場合は絞り込まない）
+    risk_threshold : int
+        高リスクとみなすリスク値の閾値（reference_data の risk_thresholds を参照）
+    additional_notes : str
+        特記事項
+    include_citations, show_ortho_timing, show_economic_benefits, show_future_scenarios : bool
+        各項目をレポートに含めるかどうか
+    necessity_score, economic_benefits : dict or None
+        計算済みのスコア（ortho_core.scoring の一括計算の結果など。None の場合はここで計算）
+    report_date : datetime.date or None
+        レポートの生成日（None の場合は今日）
+
+    Returns:
+    --------
+    dict
+        'date'（生成日）、'markdown_lines'（Markdown本文の行）、'high_risks'、
+        'necessity_score'、'economic_benefits'、'issue_sections'（歯列問題ごとの
+        改善効果と、各論文の EvidenceRecord・リスクの重要度・年齢との関連の有無）、
+        'patient'（年齢・性別・歯列問題・特記事項）、'options'（表示オプション）をキーとする辞書
+    """
+    # 参照データ（プロセス内で共有）
+    tables = get_reference_tables()
+    ortho_age_risks = tables['ortho_age_risks']
+    ortho_benefits = tables['ortho_benefits']
+    timing_benefits = tables['timing_benefits']
+    future_scenarios = tables['future_scenarios']
+    
+    # 現在の日付取得
+    today = (report_date or date.today()).strftime("%Y年%m月%d日")
+    
+    # 矯正必要性スコアの計算
+    if necessity_score is None:
+        necessity_score = calculate_ortho_necessity_score(age, issues)
+    
+    # 経済的メリットの計算
+    if economic_benefits is None:
+        economic_benefits = calculate_economic_benefits(age, issues)
+    
+    # レポートヘッダー
+    report = ["# 歯科矯正評価レポート", 
+              f"**生成日:** {today}",
+              f"**患者情報:** {age}歳, {gender}"]
+    
+    if additional_notes:
+        report.append(f"**特記事項:** {additional_notes}")
+    
+    # 矯正必要性スコア
+    report.append("\n## 矯正必要性スコア")
+    report.append(f"**総合スコア:** {necessity_score['total_score']}/100")
+    report.append(f"**緊急度:** {necessity_score['urgency']}")
+    report.append(f"**解釈:** {necessity_score['interpretation']}")
+    report.append(f"**スコア内訳:** タイミング({necessity_score['timing_score']}), 問題重大度({necessity_score['severity_score']}), 将来リスク({necessity_score['risk_score']})")
+    
+    # 矯正タイミングリスク評価
+    if show_ortho_timing:
+        report.append("\n## 矯正タイミング評価")
+        
+        # 患者の年齢に基づいたリスク評価
+        applicable_thresholds = ortho_age_risks[ortho_age_risks['age_threshold'] >= age]
+        
+        if not applicable_thresholds.empty:
+            next_threshold = applicable_thresholds.iloc[0]
+            report.append(f"**⚠️ 矯正タイミング警告:** {next_threshold['description']}")
+            
+            # 年齢グループに基づいた推奨情報
+            age_group_idx = min(len(timing_benefits) - 1, age // 13)
+            benefit_info = timing_benefits.iloc[age_group_idx]
+            
+            report.append(f"\n**現在の年齢グループ:** {benefit_info['age_group']}")
+            report.append(f"**推奨レベル:** {benefit_info['recommendation_level']}")
+            report.append(f"**メリット:** {benefit_info['benefit']}")
+        else:
+            # 高齢の場合
+            report.append("**注意:** 現在の年齢では標準的な矯正治療に制限がある可能性があります。専門医との詳細な相談を推奨します。")
+    
+    # 経済的メリット
+    if show_economic_benefits:
+        report.append("\n## 歯列矯正の経済的メリット")
+        report.append(f"**現在の矯正コスト:** ¥{economic_benefits['current_cost']:,}")
+        report.append(f"**将来の医療費削減額:** ¥{economic_benefits['future_savings']:,}")
+        report.append(f"**生涯の純節約額:** ¥{economic_benefits['net_benefit']:,}")
+        report.append(f"**投資収益率:** {economic_benefits['roi']}%")
+        report.append(f"**月あたりの医療費削減効果:** 約¥{economic_benefits['monthly_benefit']:,}")
+    
+    # 将来シナリオ比較
+    if show_future_scenarios:
+        report.append("\n## 将来シナリオ比較")
+        report.append("矯正治療を受けた場合と受けなかった場合の将来予測：")
+        
+        for _, row in future_scenarios.iterrows():
+            report.append(f"\n### {row['timeframe']}")
+            report.append(f"**矯正した場合:** {row['with_ortho']}")
+            report.append(f"**矯正しなかった場合:** {row['without_ortho']}")
+    
+    report.append("\n## 評価結果サマリー")
+    
+    # 各歯列問題のリスク評価（エビデンスレベルの表示機能追加）
+    high_risks = []
+    
+    issue_sections = []
+    for issue in issues:
+        # エビデンスレベルでフィルタリング（新規）
+        records = evidence_index.select(issue, evidence_levels=evidence_filter)
+        
+        if records:
+            report.append(f"\n## {issue}のリスク評価")
+            
+            # 矯正による改善効果の追加
+            benefit_info = ortho_benefits[ortho_benefits['issue'] == issue].iloc[0]['effect']
+            report.append(f"**矯正による改善効果:** {benefit_info}")
+            
+            section = {'issue': issue, 'benefit_info': benefit_info, 'entries': []}
+            issue_sections.append(section)
+            
+            # 各論文の情報
+            for record in records:
+                # リスク値（"42%上昇" → 42）は索引の作成時に抽出済み
+                risk_text = record.risk_description
+                risk_value = record.risk_value
+                
+                # リスクの重要度判定
+                risk_level = "🔴 高" if risk_value > risk_threshold else "🟡 中" if risk_value > 10 else "🟢 低"
+                
+                # 年齢に関連するリスクのみレポートに含める（対象年齢の範囲は索引の作成時に算出済み）
+                age_relevant = record.matches_age(age)
+                section['entries'].append({'record': record, 'risk_level': risk_level, 'age_relevant': age_relevant})
+                
+                if age_relevant:
+                    if risk_value > risk_threshold:
+                        high_risks.append(f"{issue}: {risk_text}")
+                    
+                    # レポート用テキスト追加
+                    report.append(f"- **{risk_level}**: {risk_text}")
+                    
+                    # エビデンスレベル情報を追加（新規：レポート用）
+                    evidence_text = f"エビデンスレベル: {record.evidence_level}"
+                    evidence_text += f" ({record.study_type.replace('-', ' ').title()})"
+                    report.append(f"  - {evidence_text}")
+                    
+                    if include_citations:
+                        report.append(f"  - 参考文献: DOI: [{record.doi}](https://doi.org/{record.doi})")
+    
+    # 高リスク項目のサマリー
+    if high_risks:
+        report.insert(4, "### 注意すべき高リスク項目")
+        for risk in high_risks:
+            report.insert(5, f"- {risk}")
+    
+    return {
+        'date': today,
+        'markdown_lines': report,
+        'high_risks': high_risks,
+        'necessity_score': necessity_score,
+        'economic_benefits': economic_benefits,
+        'issue_sections': issue_sections,
+        'patient': {'age': age, 'gender': gender, 'issues': list(issues), 'additional_notes': additional_notes},
+        'options': {
+            'include_citations': include_citations,
+            'show_ortho_timing': show_ortho_timing,
+            'show_economic_benefits': show_economic_benefits,
+            'show_future_scenarios': show_future_scenarios
+        }
+    }
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# キャッシュ全体の既定の上限（バイト）
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+class ReportCache:
+    """
+    作成済みレポートのキャッシュ（入力内容のハッシュをキーとする）。
+
+    患者情報・絞り込み条件・表示オプション・論文データの版など、レポートの内容を
+    決める入力をすべてキーに含めるため、入力が同じであれば作成済みのレポート
+    （build_report() の結果と、ダウンロード用にエンコード済みのファイル）を
+    そのまま返し、どれかが変われば作り直します。
+
+    保持するレポートのサイズ（ダウンロード用ファイルのバイト数）の合計が上限を
+    超えると、最も長く使われていないものから削除します。
+    エビデンス索引のレコードは索引と共有しているため、サイズには含めません。
+
+    Parameters:
+    -----------
+    max_bytes : int
+        保持するレポートの合計サイズの上限（バイト）
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(**inputs):
+        """
+        レポートの入力からキャッシュキー（SHA-256の16進文字列）を作成します。
+
+        値はJSONにできるもの（リストの順序は区別する）を渡してください。
+        日付などJSONにできない値は文字列として扱います。
+        """
+        payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        キャッシュ済みの (report_data, files) を返します（ない場合は None）。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, report_data, files):
+        """
+        レポートを保存し、上限を超えた分を古いものから削除します。
+        1件で上限を超えるレポートは保存しません。
+
+        Parameters:
+        -----------
+        key : str
+            make_key() で作成したキー
+        report_data : dict
+            build_report() の結果
+        files : dict
+            ダウンロード用ファイル（render.encode_report_files() の結果、値は bytes）
+        """
+        size = sum(len(data) for data in files.values())
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (report_data, files, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_create(self, key, create):
+        """
+        キャッシュ済みのレポートを返し、ない場合は create() で作成して保存します。
+
+        Parameters:
+        -----------
+        key : str
+            make_key() で作成したキー
+        create : callable
+            (report_data, files) を返す関数
+
+        Returns:
+        --------
+        tuple
+            (report_data, files)
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        report_data, files = create()
+        self.put(key, report_data, files)
+        return report_data, files
+
+    def clear(self):
+        """
+        保存しているレポートをすべて削除します（ヒット・ミスの回数はそのまま）。
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        キャッシュの状態（件数・サイズ・ヒット/ミス/削除の回数）を辞書で返します。
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_report_cache():
+    """
+    プロセス内で共有するレポートキャッシュを返します（アプリの各ページで共通）。
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ReportCache()
+        return _shared_cache
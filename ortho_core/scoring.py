@@ -0,0 +1,311 @@
+import numpy as np
+from .reference_data import get_reference_tables, ISSUE_NAMES
+
+# 一括計算で使う歯列問題の列順（問題行列の列に対応）
+ISSUE_COLUMNS = list(ISSUE_NAMES)
+
+# 年齢によるタイミングスコア（年齢が境界以下なら対応するスコア、60歳超は最後のスコア）
+TIMING_AGE_BOUNDS = np.array([12, 18, 25, 40, 60])
+TIMING_SCORES = np.array([35, 30, 25, 20, 15, 10])
+
+# 合計スコアによる緊急度の区分（境界以上で次の区分）
+URGENCY_SCORE_BOUNDS = np.array([30, 50, 70, 85])
+URGENCY_LABELS = np.array(["最小", "低", "中", "高", "緊急"])
+URGENCY_INTERPRETATIONS = np.array([
+    "現時点での矯正必要性は低いですが、定期的な評価をお勧めします。",
+    "低〜中程度の矯正必要性。定期的な経過観察をお勧めします。",
+    "中程度の矯正必要性。計画的な対応を検討してください。",
+    "高い矯正必要性。できるだけ早い対応が望ましいです。",
+    "緊急性の高い矯正必要性。早急な対応が強く推奨されます。"
+])
+
+# 矯正必要性スコア計算関数（改良版）
+def calculate_ortho_necessity_score(age, issues):
+    # 参照データ（プロセス内で共有）
+    tables = get_reference_tables()
+    ortho_benefits = tables['ortho_benefits']
+    ortho_age_risks = tables['ortho_age_risks']
+    
+    # 1. 年齢によるタイミングスコア（最大35点）
+    # より細かい年齢に基づくスコア計算
+    if age <= 12:
+        # 小児期：最適な時期（満点）
+        timing_score = 35
+    elif age <= 18:
+        # 青年期：まだ効果的
+        timing_score = 30
+    elif age <= 25:
+        # 若年成人期：効果あり
+        timing_score = 25
+    elif age <= 40:
+        # 成人期：効果は減少
+        timing_score = 20
+    elif age <= 60:
+        # 成人後期：効果は限定的
+        timing_score = 15
+    else:
+        # 高齢期：効果は最小
+        timing_score = 10
+    
+    # 2. 問題の重大性によるスコア（最大40点）
+    severity_score = 0
+    if issues:
+        # 問題ごとのスコアを収集
+        issue_scores = []
+        for issue in issues:
+            if not ortho_benefits[ortho_benefits['issue'] == issue].empty:
+                score = ortho_benefits[ortho_benefits['issue'] == issue]['severity_score'].values[0]
+                issue_scores.append(score)
+        
+        if issue_scores:
+            # 主要な問題のスコア
+            primary_issue_score = max(issue_scores)
+            
+            # 複数の問題による累積効果（最大の問題 + 追加問題の影響）
+            if len(issue_scores) > 1:
+                # 主要問題以外のスコアを合計し、スケーリング
+                secondary_issues_score = sum(sorted(issue_scores)[:-1]) * 0.5
+                severity_score = min(40, (primary_issue_score + secondary_issues_score) / 100 * 40)
+            else:
+                severity_score = primary_issue_score / 100 * 40
+    
+    # 3. 将来リスクによるスコア（最大35点、増加）
+    risk_score = 0
+    applicable_thresholds = ortho_age_risks[ortho_age_risks['age_threshold'] >= age]
+    
+    if not applicable_thresholds.empty:
+        next_threshold = applicable_thresholds.iloc[0]
+        
+        # 年齢依存リスク：次の閾値に近いほどスコアが高い
+        years_until = next_threshold['age_threshold'] - age
+        urgency_factor = max(0, 1 - (years_until / 15))  # 15年以内なら影響あり
+        
+        # 喪失リスク：リスク値が高いほどスコアが高い
+        risk_value = next_threshold['tooth_loss_risk']
+        
+        # 問題数による修正係数：問題が多いほどリスクが高い
+        problem_factor = min(1.5, 1 + (len(issues) - 1) * 0.1)
+        
+        # 将来リスクスコアの計算（年齢、リスク値、問題数を考慮）
+        risk_score = urgency_factor * (risk_value / 60) * problem_factor * 35
+    
+    # 合計スコア（より広い範囲）
+    total_score = timing_score + severity_score + risk_score
+    
+    # 小児・青年期の特別調整：若年層では将来的な予防が重要なため、スコアを加点
+    if age <= 18:
+        prevention_bonus = max(0, (18 - age)) * 0.5
+        total_score += prevention_bonus
+    
+    # 成人期の特別調整：問題が累積しやすい時期のためスコアを加点
+    if 35 <= age <= 55 and len(issues) >= 2:
+        adult_complexity_bonus = (len(issues) - 1) * 2
+        total_score += adult_complexity_bonus
+    
+    # スコアの上限と下限を設定
+    total_score = max(10, min(100, total_score))
+    
+    # スコアの解釈
+    if total_score >= 85:
+        interpretation = "緊急性の高い矯正必要性。早急な対応が強く推奨されます。"
+        urgency = "緊急"
+    elif total_score >= 70:
+        interpretation = "高い矯正必要性。できるだけ早い対応が望ましいです。"
+        urgency = "高"
+    elif total_score >= 50:
+        interpretation = "中程度の矯正必要性。計画的な対応を検討してください。"
+        urgency = "中"
+    elif total_score >= 30:
+        interpretation = "低〜中程度の矯正必要性。定期的な経過観察をお勧めします。"
+        urgency = "低"
+    else:
+        interpretation = "現時点での矯正必要性は低いですが、定期的な評価をお勧めします。"
+        urgency = "最小"
+    
+    return {
+        "total_score": round(total_score),
+        "timing_score": round(timing_score),
+        "severity_score": round(severity_score),
+        "risk_score": round(risk_score),
+        "interpretation": interpretation,
+        "urgency": urgency
+    }
+
+# 経済的メリット計算関数（新規追加）
+def calculate_economic_benefits(age, issues):
+    # 参照データ（プロセス内で共有）
+    tables = get_reference_tables()
+    economic_impact = tables['economic_impact']
+    
+    # 年齢グループの判定
+    age_group_idx = min(len(economic_impact) - 1, age // 13)
+    
+    # 基本データの取得
+    current_cost = economic_impact.iloc[age_group_idx]['current_cost']
+    base_future_savings = economic_impact.iloc[age_group_idx]['future_savings']
+    
+    # 問題数による将来コスト調整（問題が多いほど将来コストが高くなる）
+    problem_factor = min(2.0, 1.0 + len(issues) * 0.2)
+    adjusted_future_savings = base_future_savings * problem_factor
+    
+    # 年齢による調整（若いほど将来の医療費削減効果が高い）
+    age_factor = max(0.5, 1.0 - (age - 10) / 100)
+    final_future_savings = adjusted_future_savings * age_factor
+    
+    # ROI（投資収益率）計算
+    roi = (final_future_savings - current_cost) / current_cost * 100
+    
+    # 月当たりの経済的メリット（30年で割る）
+    monthly_benefit = final_future_savings / (30 * 12)
+    
+    return {
+        "current_cost": int(current_cost),
+        "future_savings": int(final_future_savings),
+        "net_benefit": int(final_future_savings - current_cost),
+        "roi": round(roi, 1),
+        "monthly_benefit": int(monthly_benefit)
+    }
+
+def issues_to_matrix(issue_lists):
+    """
+    患者ごとの歯列問題のリストを問題行列（multi-hot）に変換します。
+
+    Parameters:
+    -----------
+    issue_lists : list of list of str
+        患者ごとの歯列問題のリスト
+
+    Returns:
+    --------
+    numpy.ndarray
+        形状 (患者数, len(ISSUE_COLUMNS)) の bool 配列（ISSUE_COLUMNS にない問題は無視）
+    """
+    column_of = {issue: i for i, issue in enumerate(ISSUE_COLUMNS)}
+    matrix = np.zeros((len(issue_lists), len(ISSUE_COLUMNS)), dtype=bool)
+    for row, issues in enumerate(issue_lists):
+        for issue in issues:
+            if issue in column_of:
+                matrix[row, column_of[issue]] = True
+    return matrix
+
+def batch_ortho_necessity_scores(ages, issue_matrix):
+    """
+    多数の患者の矯正必要性スコアを一括で計算します。
+
+    calculate_ortho_necessity_score() と同じ式を配列演算で同じ順序に評価するため、
+    各患者の結果は1人ずつ計算した場合と完全に一致します（問題は重複なく指定された
+    ものとして扱います）。
+
+    Parameters:
+    -----------
+    ages : array-like
+        患者の年齢（形状 (患者数,)）
+    issue_matrix : array-like
+        歯列問題の行列（形状 (患者数, len(ISSUE_COLUMNS))、issues_to_matrix() を参照）
+
+    Returns:
+    --------
+    dict
+        'total_score', 'timing_score', 'severity_score', 'risk_score'（整数の配列）、
+        'interpretation', 'urgency'（文字列の配列）をキーとする辞書
+    """
+    tables = get_reference_tables()
+    ortho_benefits = tables['ortho_benefits']
+    ortho_age_risks = tables['ortho_age_risks']
+    ages = np.asarray(ages)
+    issue_matrix = np.asarray(issue_matrix, dtype=bool)
+    issue_counts = issue_matrix.sum(axis=1)
+
+    # 1. 年齢によるタイミングスコア
+    timing_score = TIMING_SCORES[np.searchsorted(TIMING_AGE_BOUNDS, ages, side='left')]
+
+    # 2. 問題の重大性によるスコア（主要な問題 + 残りの問題の半分）
+    issue_scores = np.where(issue_matrix, ortho_benefits['severity_score'].to_numpy(), 0)
+    primary_issue_score = issue_scores.max(axis=1, initial=0)
+    secondary_issues_score = (issue_scores.sum(axis=1) - primary_issue_score) * 0.5
+    severity_score = np.where(
+        issue_counts > 1,
+        np.minimum(40, (primary_issue_score + secondary_issues_score) / 100 * 40),
+        np.where(issue_counts == 1, primary_issue_score / 100 * 40, 0.0)
+    )
+
+    # 3. 将来リスクによるスコア（年齢以上で最初の閾値を使用）
+    age_thresholds = ortho_age_risks['age_threshold'].to_numpy()
+    tooth_loss_risks = ortho_age_risks['tooth_loss_risk'].to_numpy()
+    threshold_idx = np.searchsorted(age_thresholds, ages, side='left')
+    has_threshold = threshold_idx < len(age_thresholds)
+    threshold_idx = np.minimum(threshold_idx, len(age_thresholds) - 1)
+    years_until = age_thresholds[threshold_idx] - ages
+    urgency_factor = np.maximum(0, 1 - (years_until / 15))
+    risk_value = tooth_loss_risks[threshold_idx]
+    problem_factor = np.minimum(1.5, 1 + (issue_counts - 1) * 0.1)
+    risk_score = np.where(has_threshold, urgency_factor * (risk_value / 60) * problem_factor * 35, 0.0)
+
+    # 合計スコアと年齢による特別調整
+    total_score = timing_score + severity_score + risk_score
+    total_score = np.where(ages <= 18, total_score + np.maximum(0, (18 - ages)) * 0.5, total_score)
+    adult_complex = (ages >= 35) & (ages <= 55) & (issue_counts >= 2)
+    total_score = np.where(adult_complex, total_score + (issue_counts - 1) * 2, total_score)
+    total_score = np.maximum(10, np.minimum(100, total_score))
+
+    # スコアの解釈
+    urgency_idx = np.searchsorted(URGENCY_SCORE_BOUNDS, total_score, side='right')
+
+    # round() と同じく偶数丸め
+    return {
+        "total_score": np.rint(total_score).astype(int),
+        "timing_score": timing_score.astype(int),
+        "severity_score": np.rint(severity_score).astype(int),
+        "risk_score": np.rint(risk_score).astype(int),
+        "interpretation": URGENCY_INTERPRETATIONS[urgency_idx],
+        "urgency": URGENCY_LABELS[urgency_idx]
+    }
+
+def batch_economic_benefits(ages, issue_matrix):
+    """
+    多数の患者の経済的メリットを一括で計算します。
+
+    calculate_economic_benefits() と同じ式を配列演算で評価し、結果は1人ずつ
+    計算した場合と完全に一致します。1人ずつの計算でもROIは numpy の数値になり、
+    round() は numpy.round() と同じ丸めになるため、ここでも numpy.round() を使います
+    （Python の float に対する round() とは結果が異なる場合があります）。
+
+    Parameters:
+    -----------
+    ages : array-like
+        患者の年齢（形状 (患者数,)）
+    issue_matrix : array-like
+        歯列問題の行列（形状 (患者数, len(ISSUE_COLUMNS))、issues_to_matrix() を参照）
+
+    Returns:
+    --------
+    dict
+        'current_cost', 'future_savings', 'net_benefit', 'monthly_benefit'（整数の配列）、
+        'roi'（小数第1位に丸めた配列）をキーとする辞書
+    """
+    economic_impact = get_reference_tables()['economic_impact']
+    ages = np.asarray(ages)
+    issue_counts = np.asarray(issue_matrix, dtype=bool).sum(axis=1)
+
+    # 年齢グループの判定
+    age_group_idx = np.minimum(len(economic_impact) - 1, ages // 13).astype(int)
+    current_cost = economic_impact['current_cost'].to_numpy()[age_group_idx]
+    base_future_savings = economic_impact['future_savings'].to_numpy()[age_group_idx]
+
+    # 問題数・年齢による将来の医療費削減額の調整
+    problem_factor = np.minimum(2.0, 1.0 + issue_counts * 0.2)
+    adjusted_future_savings = base_future_savings * problem_factor
+    age_factor = np.maximum(0.5, 1.0 - (ages - 10) / 100)
+    final_future_savings = adjusted_future_savings * age_factor
+
+    roi = (final_future_savings - current_cost) / current_cost * 100
+    monthly_benefit = final_future_savings / (30 * 12)
+
+    # int() と同じく0方向に切り捨て
+    return {
+        "current_cost": current_cost.astype(int),
+        "future_savings": final_future_savings.astype(int),
+        "net_benefit": (final_future_savings - current_cost).astype(int),
+        "roi": np.round(roi, 1),
+        "monthly_benefit": monthly_benefit.astype(int)
+    }
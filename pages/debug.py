@@ -1,7 +1,6 @@
 import streamlit as st
 import requests
 import json
-import pandas as pd
 import sys
 import os
 import time
@@ -11,12 +10,16 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 # PubMed API関連のモジュールをインポート
 try:
-    from pubmed_api import fetch_pubmed_studies, get_pubmed_article_details, update_papers_csv
+    from pubmed_api import fetch_pubmed_studies, get_pubmed_article_details, update_papers_csv, get_pubmed_client
+    from evidence_db import get_evidence_db
     api_modules_imported = True
 except ImportError as e:
     st.error(f"pubmed_api.pyモジュールのインポートエラー: {str(e)}")
     api_modules_imported = False
 
+# レポートキャッシュ（アプリ本体と同じプロセス内のキャッシュを参照）
+from ortho_core.report_cache import get_report_cache
+
 # バッチ処理モジュールをインポート
 try:
     from batch_pubmed_fetch import ORTHO_KEYWORDS
@@ -66,17 +69,8 @@ with st.expander("1. 基本接続テスト", expanded=True):
     if st.button("基本接続テスト実行"):
         with st.spinner("PubMed APIに接続中..."):
             try:
-                # 基本的なAPIエンドポイントへの接続テスト
-                url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/einfo.fcgi?retmode=json"
-                
-                # リクエストパラメータ
-                params = {}
-                if api_key:
-                    params['api_key'] = api_key
-                
-                # リクエスト送信
-                response = requests.get(url, params=params)
-                response.raise_for_status()
+                # 基本的なAPIエンドポイントへの接続テスト（APIキーは共有クライアントが付与）
+                response = get_pubmed_client().get('einfo.fcgi', {'retmode': 'json'})
                 
                 # レスポンスが有効なJSONかチェック
                 result = response.json()
@@ -157,27 +151,25 @@ with st.expander("2. テスト検索実行", expanded=True):
 with st.expander("3. 論文データベース確認", expanded=True):
     try:
         if os.path.exists('papers.csv'):
-            papers_df = pd.read_csv('papers.csv')
+            evidence_db = get_evidence_db('papers.csv')
             st.write(f"**現在のデータベース統計**")
-            st.write(f"- 総論文数: {len(papers_df)}件")
+            st.write(f"- 総論文数: {evidence_db.count()}件")
             
             # 問題別の分布
-            if 'issue' in papers_df.columns:
-                issue_counts = papers_df['issue'].value_counts()
-                st.write("**問題別の論文数:**")
-                st.bar_chart(issue_counts)
+            issue_counts = evidence_db.value_counts('issue')
+            st.write("**問題別の論文数:**")
+            st.bar_chart(issue_counts)
             
             # エビデンスレベル分布
-            if 'evidence_level' in papers_df.columns:
-                evidence_counts = papers_df['evidence_level'].value_counts()
-                st.write("**エビデンスレベル別の論文数:**")
-                st.bar_chart(evidence_counts)
+            evidence_counts = evidence_db.value_counts('evidence_level')
+            st.write("**エビデンスレベル別の論文数:**")
+            st.bar_chart(evidence_counts)
             
             # データベースプレビュー
             st.markdown("### データベース内容プレビュー")
             show_preview = st.checkbox("データベース内容を表示", value=False)
             if show_preview:
-                st.dataframe(papers_df)
+                st.dataframe(evidence_db.query_papers())
         else:
             st.warning("papers.csvファイルが見つかりません。データベースは空です。")
     except Exception as e:
@@ -198,8 +190,8 @@ with st.expander("4. 論文データ一括取得", expanded=True):
         days_recent = st.slider("過去の日数", 30, 1095, 365, 
                                help="何日前までの論文を検索するか（1年=365日、3年=1095日）")
     with col2:
-        pause_seconds = st.slider("リクエスト間隔（秒）", 1, 10, 3, 
-                                help="APIレート制限を回避するための待機時間")
+        pause_seconds = st.slider("追加の待機時間（秒）", 0, 10, 0, 
+                                help="キーワード間に追加で挟む待機時間。リクエスト間隔はAPIキーの有無に応じて自動で調整されます")
         keyword_option = st.radio("キーワード選択", ["デフォルト", "カスタム"])
     
     # カスタムキーワード入力欄
@@ -256,24 +248,8 @@ with st.expander("4. 論文データ一括取得", expanded=True):
                                 
                                 # CSVに追加
                                 if articles:
-                                    # CSVファイルの存在確認
-                                    csv_exists = os.path.exists('papers.csv')
-                                    
-                                    # 更新前のサイズを記録
-                                    if csv_exists:
-                                        old_df = pd.read_csv('papers.csv')
-                                        old_size = len(old_df)
-                                    else:
-                                        old_size = 0
-                                    
-                                    # CSVファイルを更新
-                                    updated_df = update_papers_csv(articles)
-                                    
-                                    # 新規追加論文数
-                                    if csv_exists and len(updated_df) > 0:
-                                        new_articles = len(updated_df) - old_size
-                                    else:
-                                        new_articles = len(articles)
+                                    # CSVファイルに追記（戻り値は新規追加論文数）
+                                    new_articles = update_papers_csv(articles)
                                     
                                     total_articles += len(articles)
                                     total_new_articles += new_articles
@@ -289,12 +265,9 @@ with st.expander("4. 論文データ一括取得", expanded=True):
                     except Exception as e:
                         log_placeholder.error(f"  エラーが発生しました: {str(e)}")
                     
-                    # 次のリクエストまで待機（レート制限対策）
-                    if i < len(keywords) - 1:
-                        # APIキーがある場合は待機時間を短縮可能
-                        actual_pause = max(1, pause_seconds // 3) if api_key else pause_seconds
-                        
-                        for remaining in range(actual_pause, 0, -1):
+                    # 追加の待機が指定されている場合のみ待つ（通常の間隔はレート制限が管理）
+                    if pause_seconds > 0 and i < len(keywords) - 1:
+                        for remaining in range(pause_seconds, 0, -1):
                             log_placeholder.markdown(f"  次のキーワードまで**{remaining}秒**待機中...")
                             time.sleep(1)
                 
@@ -307,20 +280,16 @@ with st.expander("4. 論文データ一括取得", expanded=True):
                 # データベースの最新状態を表示
                 try:
                     if os.path.exists('papers.csv'):
-                        updated_df = pd.read_csv('papers.csv')
-                        st.write(f"現在のデータベース総論文数: {len(updated_df)}件")
+                        evidence_db = get_evidence_db('papers.csv')
+                        st.write(f"現在のデータベース総論文数: {evidence_db.count()}件")
                         
                         # 問題別の分布
-                        if 'issue' in updated_df.columns:
-                            issue_counts = updated_df['issue'].value_counts()
-                            st.write("**問題別の論文数:**")
-                            st.bar_chart(issue_counts)
+                        st.write("**問題別の論文数:**")
+                        st.bar_chart(evidence_db.value_counts('issue'))
                         
                         # エビデンスレベル分布
-                        if 'evidence_level' in updated_df.columns:
-                            evidence_counts = updated_df['evidence_level'].value_counts()
-                            st.write("**エビデンスレベル別の論文数:**")
-                            st.bar_chart(evidence_counts)
+                        st.write("**エビデンスレベル別の論文数:**")
+                        st.bar_chart(evidence_db.value_counts('evidence_level'))
                 except Exception as e:
                     st.error(f"データベース統計の取得中にエラーが発生しました: {str(e)}")
 
@@ -347,8 +316,26 @@ with st.expander("5. システム情報", expanded=False):
     st.write(f"- pubmed_api.py: {'✅ 正常' if api_modules_imported else '❌ エラー'}")
     st.write(f"- batch_pubmed_fetch.py: {'✅ 正常' if batch_module_imported else '❌ エラー'}")
 
-# 6. トラブルシューティング情報
-with st.expander("6. トラブルシューティング", expanded=False):
+# 6. レポートキャッシュ
+with st.expander("6. レポートキャッシュ", expanded=False):
+    report_cache = get_report_cache()
+    stats = report_cache.stats()
+    requests_total = stats['hits'] + stats['misses']
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("ヒット", f"{stats['hits']}回")
+    col2.metric("ミス", f"{stats['misses']}回")
+    col3.metric("ヒット率", f"{stats['hits'] / requests_total:.0%}" if requests_total else "-")
+    st.write(f"- 保存中のレポート: {stats['entries']}件")
+    st.write(f"- 使用量: {stats['bytes'] / 1024:.1f} KB / {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+    st.write(f"- 容量超過による削除: {stats['evictions']}件")
+    
+    if st.button("レポートキャッシュを消去"):
+        report_cache.clear()
+        st.success("レポートキャッシュを消去しました")
+
+# 7. トラブルシューティング情報
+with st.expander("7. トラブルシューティング", expanded=False):
     st.markdown("""
     ## PubMed API連携のトラブルシューティング
     
@@ -0,0 +1,708 @@
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from itertools import islice
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from dedup import NearDuplicateIndex, minhash_records, normalize_doi, RECORD_WIDTH, SIGNATURE_CHUNK_ROWS
+
+# 論文CSVの列（この順序で保存）
+PAPER_COLUMNS = [
+    'issue', 'risk_description', 'doi', 'publication_year',
+    'study_type', 'sample_size', 'confidence_interval', 'age_group',
+    'evidence_level', 'authors', 'title', 'url', 'pmid'
+]
+
+# PubMedのURLからPMIDを取り出すパターン（pmid列がない古い行用）
+_PUBMED_URL_PATTERN = re.compile(r'pubmed\.ncbi\.nlm\.nih\.gov/(\d+)')
+
+# upsert_rows() が返す上書きした行のうち、近似重複の別版を置き換えた行に付ける置き換え前のPMIDの項目
+REPLACED_PMID_KEY = 'replaced_pmid'
+
+INDEX_VERSION = 3
+
+# Windows でロックの取得を待つ間隔（秒）
+LOCK_RETRY_SECONDS = 0.05
+
+def _new_generation():
+    # CSVを書き直したことを他のプロセスに知らせる識別子（追記分だけの読み込みの可否の判定用）
+    return os.urandom(8).hex()
+
+def _row_pmid(row):
+    pmid = row.get('pmid') or ''
+    if pmid:
+        return pmid
+    match = _PUBMED_URL_PATTERN.search(row.get('url') or '')
+    return match.group(1) if match else ''
+
+def _version_rank(row):
+    # 同じ論文の別版のうち残す方の順位（DOI・PMIDを持つものほど、出版年が新しいものほど上）
+    # プレプリントやDOIのない記録より、出版版を残すために使う
+    year = str(row.get('publication_year') or '')
+    return (bool(normalize_doi(row.get('doi'))) + bool(_row_pmid(row)), int(year) if year.isdigit() else 0)
+
+def atomic_write(path, write, binary=False):
+    """
+    同じディレクトリの一時ファイルに書き込み、fsync後に rename で置き換えます。
+    途中で異常終了しても、元のファイルは壊れずに残ります。
+    binary=True の場合はバイナリモードで開いたファイルを write に渡します。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding='utf-8', newline='')) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class FileLock:
+    """
+    ロックファイルを使ったプロセス間の排他ロック（with 文で使用）。
+
+    同じインスタンスの中では入れ子にして取得できます。スレッド間の排他は行わないため、
+    呼び出し側の threading.RLock の内側で使ってください。
+
+    Parameters:
+    -----------
+    path : str
+        ロックファイルのパス（なければ作成します）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            f = open(self.path, 'a+b')
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                else:
+                    # msvcrt.locking は先頭1バイトをロックする（取得できるまで待つ）
+                    f.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                            break
+                        except OSError:
+                            time.sleep(LOCK_RETRY_SECONDS)
+            except BaseException:
+                f.close()
+                raise
+            self._file = f
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            f, self._file = self._file, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                f.close()
+
+class PaperStore:
+    """
+    論文CSV（papers.csv）への追記専用ストア。
+
+    新しい行はファイル末尾に追記するだけで、既存の行を読み直したり書き直したりは
+    しません（内容が更新された論文や、同じ論文の古い版を上書きする upsert_rows() と
+    remove_rows() を除く）。
+    重複判定用のPMIDと正規化したDOIのキーは追記専用のキーファイル（<csv>.keys、
+    新しいキーごとに1行）に保持し、メモリ上の集合で O(1) で判定します。
+    タイトルと著者がほぼ同じ論文（プレプリントと出版版など）は、行ごとの MinHash の
+    署名（<csv>.minhash、CSVの行と同じ順の固定長レコード）を LSH で照合して
+    判定します（dedup を参照）。
+
+    CSV・署名・キーファイルの確定済みの長さは小さなインデックス（<csv>.idx.json）に
+    記録し、追記のたびに一時ファイル＋rename で原子的に更新します（書き直すのは
+    この長さと行数だけで、追記の手間は登録件数によりません）。追記中に異常終了して
+    書きかけの行が残った場合は、次に開いたときに確定済みの長さまで切り詰めて元に戻します。
+    列構成の移行など、CSV全体を書き直す操作も一時ファイル＋rename で行います。
+    キーファイルは CSVからインデックスを作り直すときに全体を書き直して詰めます。
+
+    書き込みはロックファイル（<csv>.lock）で複数のプロセスの間でも排他します。
+    他のプロセスが追記した分は、次の操作のときに追記分だけを読み込みます。
+
+    Parameters:
+    -----------
+    csv_file : str
+        論文CSVのパス
+    index_file : str or None
+        インデックスのパス（省略時は csv_file + '.idx.json'）
+    signature_file : str or None
+        署名ファイルのパス（省略時は csv_file + '.minhash'）
+    key_file : str or None
+        キーファイルのパス（省略時は csv_file + '.keys'）
+    """
+
+    def __init__(self, csv_file='papers.csv', index_file=None, signature_file=None, key_file=None):
+        self.csv_file = csv_file
+        self.index_file = index_file or csv_file + '.idx.json'
+        self.signature_file = signature_file or csv_file + '.minhash'
+        self.key_file = key_file or csv_file + '.keys'
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(csv_file + '.lock')
+        self._stat = None
+        with self._lock:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # 読み込み・インデックス管理
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.csv_file)
+            return (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        with self._file_lock:
+            self._load_locked()
+
+    def _load_locked(self):
+        self.columns = list(PAPER_COLUMNS)
+        self._dois = set()
+        self._pmids = set()
+        self._rows = 0
+        self._committed_bytes = 0
+        self._keys_bytes = 0
+        self._generation = None
+        self._newline = '\r\n'
+        self._near = NearDuplicateIndex()
+
+        if self._file_stat() is None:
+            self._stat = None
+            return
+
+        index = self._read_index()
+        size = self._file_stat()[0]
+        if index is not None and index['committed_bytes'] <= size:
+            if size > index['committed_bytes'] and not self._tail_is_complete(index['committed_bytes']):
+                # 書きかけの追記を取り消す
+                with open(self.csv_file, 'r+b') as f:
+                    f.truncate(index['committed_bytes'])
+                size = index['committed_bytes']
+
+            keys = self._read_keys(0, index['keys_bytes'], truncate=True)
+            if size == index['committed_bytes'] and keys is not None:
+                self.columns = index['columns']
+                self._add_keys(keys)
+                self._rows = index['rows']
+                self._committed_bytes = index['committed_bytes']
+                self._keys_bytes = index['keys_bytes']
+                self._generation = index['generation']
+                self._newline = index.get('newline', '\r\n')
+                self._load_signatures()
+                self._stat = self._file_stat()
+                return
+
+        # インデックスがない・古い場合はCSVから作り直す
+        self._rebuild_index()
+
+    def _catch_up(self, index):
+        # 他のプロセスが追記した分（確定済みの行数・キーの差分）だけを読み込む
+        keys = self._read_keys(self._keys_bytes, index['keys_bytes'])
+        try:
+            records = np.fromfile(self.signature_file, dtype='<u2',
+                                  count=(index['rows'] - self._rows) * RECORD_WIDTH,
+                                  offset=self._rows * RECORD_WIDTH * 2)
+        except (FileNotFoundError, ValueError):
+            records = None
+        if keys is None or records is None or len(records) < (index['rows'] - self._rows) * RECORD_WIDTH:
+            self._load()
+            return
+        self._add_keys(keys)
+        self._near.add(records.reshape(-1, RECORD_WIDTH))
+        self._rows = index['rows']
+        self._committed_bytes = index['committed_bytes']
+        self._keys_bytes = index['keys_bytes']
+        self._stat = self._file_stat()
+
+    def _read_index(self):
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if index.get('version') != INDEX_VERSION:
+            return None
+        return index
+
+    def _tail_is_complete(self, offset):
+        # 確定済みの位置以降が改行で終わる完全な行であれば、外部からの追記とみなす
+        with open(self.csv_file, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+        return tail.endswith(b'\n')
+
+    def _rebuild_index(self):
+        with open(self.csv_file, encoding='utf-8', newline='') as f:
+            first_line = f.readline()
+            self._newline = '\r\n' if first_line.endswith('\r\n') else '\n'
+            f.seek(0)
+            reader = csv.DictReader(f)
+            columns = list(reader.fieldnames or [])
+            rows = list(reader) if any(c not in columns for c in PAPER_COLUMNS) else None
+            if rows is None:
+                for row in reader:
+                    self._index_row(row)
+
+        missing = [c for c in PAPER_COLUMNS if c not in columns]
+        if missing:
+            # 不足している列を追加してCSV全体を1度だけ書き直す（原子的に置き換え）
+            columns = columns + missing
+            for row in rows:
+                if 'pmid' in missing:
+                    row['pmid'] = _row_pmid(row)
+                self._index_row(row)
+
+            def write(f):
+                writer = csv.DictWriter(f, fieldnames=columns, lineterminator=self._newline)
+                writer.writeheader()
+                writer.writerows(rows)
+            atomic_write(self.csv_file, write)
+
+        self.columns = columns
+        self._committed_bytes = self._file_stat()[0]
+        self._generation = _new_generation()
+        self._rebuild_signatures()
+        self._write_keys()
+        self._write_index()
+
+    def _load_signatures(self):
+        # 確定済みの行数分の署名を読み込む（足りない・読めない場合はCSVから作り直す）
+        try:
+            records = np.fromfile(self.signature_file, dtype='<u2')
+        except FileNotFoundError:
+            records = None
+        if records is None or len(records) < self._rows * RECORD_WIDTH:
+            self._rebuild_signatures()
+            return
+        if len(records) > self._rows * RECORD_WIDTH:
+            # 確定前に異常終了した追記分を取り消す
+            records = records[:self._rows * RECORD_WIDTH]
+            with open(self.signature_file, 'r+b') as f:
+                f.truncate(records.nbytes)
+        self._near = NearDuplicateIndex(records.reshape(-1, RECORD_WIDTH))
+
+    def _rebuild_signatures(self):
+        # CSVの全行の署名を計算し直す（行は SIGNATURE_CHUNK_ROWS ずつ読む）
+        chunks = [np.zeros((0, RECORD_WIDTH), dtype=np.uint16)]
+        with open(self.csv_file, encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            while True:
+                rows = list(islice(reader, SIGNATURE_CHUNK_ROWS))
+                if not rows:
+                    break
+                chunks.append(minhash_records(rows))
+        self._write_signatures(np.concatenate(chunks))
+
+    def _write_signatures(self, records):
+        # 署名ファイル全体を置き換え、照合用の索引を作り直す
+        atomic_write(self.signature_file, lambda f: f.write(records.astype('<u2').tobytes()), binary=True)
+        self._near = NearDuplicateIndex(records)
+
+    def _index_row(self, row, new_keys=None):
+        # 行を数え、キーを登録する
+        self._rows += 1
+        self._index_keys(row, new_keys)
+
+    def _index_keys(self, row, new_keys=None):
+        # 行のキーを登録し、新しいキーを new_keys に加える
+        doi = normalize_doi(row.get('doi'))
+        if doi and doi not in self._dois:
+            self._dois.add(doi)
+            if new_keys is not None:
+                new_keys.append(doi)
+        pmid = _row_pmid(row)
+        if pmid and pmid not in self._pmids:
+            self._pmids.add(pmid)
+            if new_keys is not None:
+                new_keys.append(pmid)
+
+    def _add_keys(self, keys):
+        # 正規化したDOIは必ず '/' を含み、PMIDは含まないため、キーの種類は値で見分ける
+        self._dois.update(key for key in keys if '/' in key)
+        self._pmids.update(key for key in keys if '/' not in key)
+
+    def _read_keys(self, start, end, truncate=False):
+        # キーファイルの start〜end バイトのキーを読み込む（足りない場合は None）
+        # truncate=True の場合は、確定前に異常終了した end 以降の追記分を取り消す
+        try:
+            with open(self.key_file, 'r+b' if truncate else 'rb') as f:
+                f.seek(start)
+                data = f.read(end - start)
+                if truncate and f.read(1):
+                    f.truncate(end)
+        except FileNotFoundError:
+            return [] if start == end else None
+        if len(data) != end - start:
+            return None
+        # 1行に1つのキー（正規化したDOIとPMIDは空白や改行を含まない）
+        return data.decode('utf-8').split('\n')[:-1]
+
+    def _append_keys(self, keys, truncate=False):
+        data = ''.join(key + '\n' for key in keys).encode('utf-8')
+        with open(self.key_file, 'wb' if truncate else 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._keys_bytes = len(data) if truncate else self._keys_bytes + len(data)
+
+    def _write_keys(self):
+        # キーファイル全体を現在のキーで書き直す
+        data = ''.join(key + '\n' for key in sorted(self._dois) + sorted(self._pmids)).encode('utf-8')
+        atomic_write(self.key_file, lambda f: f.write(data), binary=True)
+        self._keys_bytes = len(data)
+
+    def _write_index(self):
+        index = {
+            'version': INDEX_VERSION,
+            'columns': self.columns,
+            'newline': self._newline,
+            'generation': self._generation,
+            'committed_bytes': self._committed_bytes,
+            'rows': self._rows,
+            'keys_bytes': self._keys_bytes,
+        }
+        atomic_write(self.index_file, lambda f: json.dump(index, f, ensure_ascii=False))
+        self._stat = self._file_stat()
+
+    def _refresh(self):
+        # 他のプロセスなどでCSVが変更されていれば読み直す
+        # （追記だけであれば追記分を、書き直された場合は全体を読み直す）
+        if self._file_stat() == self._stat:
+            return
+        with self._file_lock:
+            index = self._read_index()
+            stat = self._file_stat()
+            if (self._stat is not None and index is not None and stat is not None
+                    and index['generation'] == self._generation
+                    and self._committed_bytes <= index['committed_bytes'] == stat[0]):
+                self._catch_up(index)
+            else:
+                self._load()
+
+    # ------------------------------------------------------------------
+    # 公開API
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return self._rows
+
+    @property
+    def pmids(self):
+        """
+        登録済みPMIDの集合（コピー）
+        """
+        with self._lock:
+            self._refresh()
+            return set(self._pmids)
+
+    def contains(self, doi=None, pmid=None):
+        """
+        指定したDOI（表記の違いは正規化して比較）またはPMIDの論文が登録済みかどうかを返します。
+        """
+        with self._lock:
+            self._refresh()
+            doi = normalize_doi(doi)
+            return bool(doi and doi in self._dois) or (pmid is not None and str(pmid) in self._pmids)
+
+    def add_rows(self, rows):
+        """
+        未登録の行だけをCSVに追記します。
+
+        PMIDまたは正規化したDOI（「DOI不明」などDOIの形式でないものは比較しない）が
+        登録済みの行と、タイトルと著者がほぼ同じ論文（dedup.NearDuplicateIndex）が
+        登録済みの行は追記しません。同じ呼び出しの中の近似重複は、DOI・PMIDを持ち
+        出版年が新しい方を残します。登録済みの行をより新しい版で置き換えるには
+        upsert_rows() を使います（add_rows() は既存の行を書き直しません）。
+
+        Parameters:
+        -----------
+        rows : list of dict
+            論文CSVの行（pubmed_api.build_paper_row() の形式）
+
+        Returns:
+        --------
+        list of dict
+            実際に追記した行
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            return self._add(rows)
+
+    def _add(self, rows, superseding=None):
+        # 未登録の行を追記し、追記した行を返す
+        # superseding（辞書）を渡した場合は、登録済みの別版より新しい版かもしれない行を
+        # 登録済みの行の行番号ごとに集める（比べて置き換えるのは _replace()）
+        records = minhash_records(rows)
+        matches = self._near.find(records)
+        first_row = self._rows
+        new_rows, new_records, new_keys = [], [], []
+        for row, record, match in zip(rows, records, matches):
+            doi = normalize_doi(row.get('doi'))
+            pmid = _row_pmid(row)
+            # DOIまたはPMIDが登録済み（同じバッチ内の重複を含む）なら追加しない
+            if (doi and doi in self._dois) or (pmid and pmid in self._pmids):
+                continue
+            if match < 0 and new_rows:
+                match = self._near.find(record, recent_only=True)[0]
+            if match >= first_row:
+                # このバッチで追加する別版とは、新しい版の方を残す（置き換えた行のキーは残す）
+                position = match - first_row
+                if _version_rank(row) > _version_rank(new_rows[position]):
+                    new_rows[position] = row
+                    new_records[position] = record
+                    self._index_keys(row, new_keys)
+                    self._near.replace(match, record)
+                continue
+            if match >= 0:
+                # 登録済みの別版がある行は追記しない（superseding を渡した場合は置き換えの候補にする）
+                if superseding is not None and (
+                        match not in superseding or _version_rank(row) > _version_rank(superseding[match])):
+                    superseding[match] = row
+                continue
+            new_rows.append(row)
+            new_records.append(record)
+            self._index_row(row, new_keys)
+            self._near.add(record)
+
+        if new_rows:
+            self._append(new_rows, np.array(new_records), new_keys)
+        return new_rows
+
+    def upsert_rows(self, rows, update_existing=True):
+        """
+        PMIDが登録済みの行は内容が変わっていれば上書きし、それ以外は add_rows() と同じく追記します。
+
+        タイトルと著者がほぼ同じ論文（プレプリントと出版版など）が登録済みの行は、
+        DOI・PMIDを持ち出版年が新しい方を残します。登録済みの行の方が古い版であれば
+        その行を置き換え（上書きした行として返します）、そうでなければ追加しません。
+
+        上書きはCSV全体を1度読んで変更のある行を確認し、変更がある場合だけ
+        一時ファイル＋rename で1度に書き直します。内容が同じ行は書き直しません。
+
+        Parameters:
+        -----------
+        rows : list of dict
+            論文CSVの行（pubmed_api.build_paper_row() の形式）
+        update_existing : bool
+            False の場合、PMIDが登録済みの行は上書きしません（新しい論文の追加用。
+            登録済みの別版の置き換えは行います）
+
+        Returns:
+        --------
+        tuple
+            (追記した行のリスト, 上書きした行のリスト)
+            別版を置き換えた行には、置き換え前の行のPMIDを REPLACED_PMID_KEY の項目に付けます
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+
+            replacements = {}
+            new_rows = []
+            for row in rows:
+                pmid = _row_pmid(row)
+                if pmid and pmid in self._pmids:
+                    if update_existing:
+                        replacements[pmid] = row
+                else:
+                    new_rows.append(row)
+
+            superseding = {}
+            added_rows = self._add(new_rows, superseding)
+            updated_rows = self._replace(replacements, superseding) if replacements or superseding else []
+            return added_rows, updated_rows
+
+    def _replace(self, replacements, superseding=None):
+        # replacements はPMIDごとの新しい内容、superseding は行番号ごとの別版の候補
+        # （登録済みの行より新しい版の場合だけ置き換える）
+        superseding = superseding or {}
+
+        # 1. 変更のある行だけを確認する（書き込みは行わない）
+        changed = {}
+        by_pmid = {}
+        with open(self.csv_file, encoding='utf-8', newline='') as f:
+            for position, row in enumerate(csv.DictReader(f)):
+                pmid = _row_pmid(row)
+                new_row = superseding.get(position)
+                if new_row is not None:
+                    if _version_rank(new_row) <= _version_rank(row):
+                        continue
+                    replaced_pmid = pmid
+                else:
+                    new_row = replacements.get(pmid)
+                    if new_row is None or pmid in by_pmid:
+                        continue
+                    replaced_pmid = None
+                merged = dict(row)
+                merged.update({c: '' if new_row.get(c) is None else str(new_row[c])
+                               for c in PAPER_COLUMNS if c in new_row})
+                if replaced_pmid is None:
+                    by_pmid[pmid] = merged
+                if merged != row:
+                    changed[position] = (row, merged, replaced_pmid)
+        if not changed:
+            return []
+
+        # 2. 変更のある行を置き換えてCSV全体を書き直す（原子的に置き換え）
+        def write(f):
+            writer = csv.DictWriter(f, fieldnames=self.columns, lineterminator=self._newline,
+                                    extrasaction='ignore')
+            writer.writeheader()
+            with open(self.csv_file, encoding='utf-8', newline='') as src:
+                for position, row in enumerate(csv.DictReader(src)):
+                    entry = changed.get(position)
+                    if entry is not None:
+                        writer.writerow(entry[1])
+                    else:
+                        writer.writerow(by_pmid.get(_row_pmid(row), row))
+        atomic_write(self.csv_file, write)
+
+        # タイトル・著者が変わった行の署名をその位置で置き換える
+        moved = [(position, new_row) for position, (row, new_row, _) in changed.items()
+                 if (row.get('title'), row.get('authors')) != (new_row.get('title'), new_row.get('authors'))]
+        if moved:
+            records = minhash_records([new_row for _, new_row in moved])
+            with open(self.signature_file, 'r+b') as f:
+                for (position, _), record in zip(moved, records):
+                    f.seek(position * RECORD_WIDTH * 2)
+                    f.write(record.astype('<u2').tobytes())
+                    self._near.replace(position, record)
+                f.flush()
+                os.fsync(f.fileno())
+
+        # 変更前のDOI・PMIDは論文の別版と共有している場合や、古い版の再取得を
+        # 除くために使うため、キーには新しいDOI・PMIDを加えるだけにする
+        new_keys = []
+        for _, new_row, _ in changed.values():
+            self._index_keys(new_row, new_keys)
+        if new_keys:
+            self._append_keys(new_keys)
+        self._committed_bytes = self._file_stat()[0]
+        self._generation = _new_generation()
+        self._write_index()
+        return [new_row if replaced_pmid is None else dict(new_row, **{REPLACED_PMID_KEY: replaced_pmid})
+                for _, new_row, replaced_pmid in changed.values()]
+
+    def remove_rows(self, pmids):
+        """
+        指定したPMIDの行をCSVから取り除きます（撤回された論文など）。
+
+        CSV全体を1度読んで該当する行を確認し、ある場合だけ一時ファイル＋rename で
+        書き直します。取り除いた行のPMID・DOIは登録済みのキーとして残すため、
+        撤回前の内容で再取得されても追加し直しません（キーインデックスを
+        CSVから作り直すまで）。
+
+        Parameters:
+        -----------
+        pmids : iterable of str
+            取り除く論文のPMID
+
+        Returns:
+        --------
+        list of str
+            実際に取り除いた行のPMID
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            pmids = {str(pmid) for pmid in pmids} & self._pmids
+            if not pmids or self._stat is None:
+                return []
+
+            positions, removed = [], []
+            with open(self.csv_file, encoding='utf-8', newline='') as f:
+                for position, row in enumerate(csv.DictReader(f)):
+                    pmid = _row_pmid(row)
+                    if pmid in pmids:
+                        positions.append(position)
+                        removed.append(pmid)
+            if not positions:
+                return []
+
+            def write(f):
+                writer = csv.DictWriter(f, fieldnames=self.columns, lineterminator=self._newline,
+                                        extrasaction='ignore')
+                writer.writeheader()
+                with open(self.csv_file, encoding='utf-8', newline='') as src:
+                    for row in csv.DictReader(src):
+                        if _row_pmid(row) not in pmids:
+                            writer.writerow(row)
+            atomic_write(self.csv_file, write)
+
+            self._write_signatures(np.delete(self._near.records, positions, axis=0))
+            self._rows -= len(positions)
+            self._committed_bytes = self._file_stat()[0]
+            self._generation = _new_generation()
+            self._write_index()
+            return removed
+
+    def _append(self, rows, records, keys):
+        exists = self._stat is not None
+        with open(self.csv_file, 'a+b') as f:
+            # 末尾が改行で終わっていなければ行を区切る
+            needs_newline = False
+            if exists and f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+
+        with open(self.csv_file, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns, lineterminator=self._newline,
+                                    extrasaction='ignore')
+            if not exists:
+                writer.writeheader()
+            elif needs_newline:
+                f.write(self._newline)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 署名も同じ順に、新しいキーも追記する（新しいCSVの場合は以前の署名・キーを消す）
+        with open(self.signature_file, 'ab' if exists else 'wb') as f:
+            f.write(records.astype('<u2').tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._append_keys(keys, truncate=not exists)
+
+        # 追記が確定してからインデックスを更新
+        self._committed_bytes = self._file_stat()[0]
+        if not exists:
+            self._generation = _new_generation()
+        self._write_index()
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_paper_store(csv_file='papers.csv'):
+    """
+    CSVファイルごとに共有する PaperStore を返します。
+    """
+    key = os.path.abspath(csv_file)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = PaperStore(csv_file)
+        return _stores[key]
@@ -1,34 +1,382 @@
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
 import xml.etree.ElementTree as ET
+import io
 import re
 import time
 import os
-import streamlit as st
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pubmed_cache import get_pubmed_cache
+# 論文CSVの保存先（paper_store・evidence_db・search_index・dedup）は、検索と解析だけを
+# 行う呼び出し元で読み込まないよう、使う関数の中で読み込む
+
+# E-utilities のベースURL（ローカルの検証用サーバーに向ける場合は環境変数で上書き）
+EUTILS_BASE_URL = os.environ.get("PUBMED_EUTILS_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/")
+
+# 再試行の対象とするHTTPステータスコード
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# NCBIのリクエスト上限（1秒あたり、APIキーなし/あり）
+NCBI_RATE_LIMIT = 3
+NCBI_RATE_LIMIT_WITH_KEY = 10
+
+def render_evidence_level_badge(evidence_level, study_type="", sample_size=""):
+    """
+    エビデンスレベルを視覚的に表示するHTMLを生成します。
+    
+    ortho_core.render に移動しました（既存の呼び出し元のため残しています）。
+    """
+    from ortho_core.render import render_evidence_level_badge as render
+    return render(evidence_level, study_type, sample_size)
 
 # APIキーを取得する関数
 def get_api_key():
     """
     APIキーを環境変数またはStreamlitシークレットから取得します。
     
+    Streamlitのシークレットは、Streamlitアプリとして実行中（streamlit が読み込み済み）の
+    場合にだけ参照します。CLIやバッチ処理では streamlit を読み込みません。
+    
     Returns:
     --------
     str or None
         APIキー、見つからない場合はNone
     """
     # 1. Streamlit Cloudsのシークレットから取得を試みる
-    try:
-        return st.secrets.get("NCBI_API_KEY")
-    except:
-        pass
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            return st.secrets.get("NCBI_API_KEY")
+        except:
+            pass
     
     # 2. 環境変数から取得を試みる
     return os.environ.get("NCBI_API_KEY")
 
-def fetch_pubmed_studies(keywords, max_results=20, days_recent=90):
+class TokenBucket:
+    """
+    スレッド間で共有できるトークンバケット方式のレート制限。
+
+    acquire() は呼び出し順に送信枠を予約し、必要な時間だけロックの外で待機します。
+    そのため複数スレッドから同時に呼ばれても、全体の送信レートは rate を超えません。
+
+    Parameters:
+    -----------
+    rate : float
+        1秒あたりに補充されるトークン数（許可するリクエスト数）
+    capacity : float
+        バケットの容量（連続して送信できるリクエスト数）
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'acquired': 0, 'waits': 0, 'wait_seconds': 0.0, 'throttled': 0}
+
+    def set_rate(self, rate):
+        """
+        補充レートを変更します（APIキーの有無が変わった場合など）。
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        トークンを1つ消費し、必要であれば送信可能になるまで待機します。
+
+        Returns:
+        --------
+        float
+            待機した秒数
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self._stats['acquired'] += 1
+            if wait > 0:
+                self._stats['waits'] += 1
+                self._stats['wait_seconds'] += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record_throttle(self):
+        """
+        サーバーからレート制限（429）を受けたことを記録します。
+        """
+        with self._lock:
+            self._stats['throttled'] += 1
+
+    def stats(self):
+        """
+        取得回数・待機回数・待機秒数・429の受信回数を返します。
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['rate'] = self.rate
+        return stats
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter(api_key=None):
+    """
+    プロセス全体で共有するレート制限を返します。
+
+    APIキーがあれば毎秒10件、なければ毎秒3件に自動で調整します。
+
+    Parameters:
+    -----------
+    api_key : str or None
+        使用するAPIキー（省略時は get_api_key() で取得）
+    """
+    global _rate_limiter
+    if api_key is None:
+        api_key = get_api_key()
+    rate = NCBI_RATE_LIMIT_WITH_KEY if api_key else NCBI_RATE_LIMIT
+
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(rate)
+        elif _rate_limiter.rate != rate:
+            _rate_limiter.set_rate(rate)
+    return _rate_limiter
+
+class PubMedClient:
+    """
+    E-utilities へのHTTPリクエストを一元化するクライアント。
+
+    接続プール付きの requests.Session を共有してKeep-Aliveで接続を再利用し、
+    接続/読み取りタイムアウトと、429/5xx・通信エラーに対する
+    指数バックオフ付きの再試行（回数上限あり）を行います。
+    複数スレッドから同じインスタンスを共有できます。
+
+    Parameters:
+    -----------
+    base_url : str
+        E-utilities のベースURL
+    connect_timeout : float
+        接続タイムアウト（秒）
+    read_timeout : float
+        読み取りタイムアウト（秒）
+    max_retries : int
+        再試行の最大回数
+    backoff_factor : float
+        指数バックオフの基準秒数（backoff_factor * 2^試行回数）
+    max_backoff : float
+        1回あたりの待機秒数の上限
+    pool_maxsize : int
+        接続プールに保持する最大接続数
+    rate_limiter : TokenBucket or None
+        使用するレート制限（省略時はプロセス共有のものを使用）
+    """
+
+    def __init__(self, base_url=EUTILS_BASE_URL, connect_timeout=5.0, read_timeout=30.0,
+                 max_retries=3, backoff_factor=0.5, max_backoff=8.0, pool_maxsize=10,
+                 rate_limiter=None):
+        self.base_url = base_url.rstrip('/') + '/'
+        self.rate_limiter = rate_limiter
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        # 再試行はこのクラスで制御するため、アダプタ側の再試行は無効化
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'requests': 0, 'retries': 0, 'bytes_received': 0}
+
+    def _record(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        """
+        リクエスト数・再試行回数・受信バイト数の累計を返します。
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _backoff_seconds(self, attempt, retry_after=None):
+        # Retry-After ヘッダー（秒指定）があれば優先する
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                pass
+        return min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+
+    def get(self, endpoint, params=None, stream=False):
+        """
+        E-utilities のエンドポイントにGETリクエストを送信します。
+
+        Parameters:
+        -----------
+        endpoint : str
+            エンドポイント名 (例: "esearch.fcgi")
+        params : dict
+            クエリパラメータ（APIキーは自動で付与されます）
+        stream : bool
+            レスポンス本文を逐次読み出す場合はTrue
+
+        Returns:
+        --------
+        requests.Response
+            成功したレスポンス
+
+        Raises:
+        -------
+        requests.exceptions.RequestException
+            再試行を使い切っても成功しなかった場合
+        """
+        url = self.base_url + endpoint
+        params = dict(params or {})
+
+        # APIキーがある場合は追加
+        api_key = params.get('api_key') or get_api_key()
+        if api_key:
+            params['api_key'] = api_key
+
+        # 再試行を含むすべての送信をNCBIの上限内に収める
+        limiter = self.rate_limiter or get_rate_limiter(api_key)
+
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            self._record('requests')
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self._record('retries')
+                time.sleep(self._backoff_seconds(attempt))
+                continue
+
+            if response.status_code == 429:
+                limiter.record_throttle()
+
+            # 429/5xx は待機してから再試行
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = self._backoff_seconds(attempt, response.headers.get('Retry-After'))
+                response.close()
+                self._record('retries')
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            if not stream:
+                self._record('bytes_received', len(response.content))
+            return response
+
+    def open_stream(self, response):
+        """
+        stream=True で取得したレスポンス本文を、受信バイト数を記録しながら
+        読み出せるファイルライクオブジェクトとして返します。
+        """
+        # gzip等の転送エンコーディングは展開して読み出す
+        response.raw.decode_content = True
+        return _CountingReader(response.raw, lambda n: self._record('bytes_received', n))
+
+class _CountingReader:
+    """
+    read() で読み出したバイト数をコールバックに通知するラッパー。
+    """
+
+    def __init__(self, raw, on_read):
+        self._raw = raw
+        self._on_read = on_read
+
+    def read(self, size=-1):
+        data = self._raw.read(size)
+        self._on_read(len(data))
+        return data
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_pubmed_client():
+    """
+    プロセス全体で共有する PubMedClient を返します。
+
+    タイムアウトは環境変数 PUBMED_CONNECT_TIMEOUT / PUBMED_READ_TIMEOUT で変更できます。
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PubMedClient(
+                    connect_timeout=float(os.environ.get("PUBMED_CONNECT_TIMEOUT", 5.0)),
+                    read_timeout=float(os.environ.get("PUBMED_READ_TIMEOUT", 30.0)),
+                )
+    return _client
+
+def set_pubmed_client(client):
+    """
+    共有クライアントを差し替えます（検証用サーバーへの接続など）。
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+# 矯正歯科の論文に限定する条件（検索式と、ローカルのXMLを絞り込む is_orthodontic_article() で共通）
+ORTHO_MESH_TERM = 'orthodontics'
+ORTHO_TEXT_WORD = 'orthodontic'
+
+_ORTHO_TEXT_WORD_PATTERN = re.compile(rf'\b{ORTHO_TEXT_WORD}\b', re.IGNORECASE)
+
+def build_search_term(keywords):
+    """
+    キーワードを矯正歯科の論文に限定したPubMed検索式に変換します。
+    """
+    return f'({keywords}) AND ("{ORTHO_MESH_TERM}"[MeSH] OR "{ORTHO_TEXT_WORD}"[Text Word])'
+
+def is_orthodontic_article(fields):
+    """
+    論文が build_search_term() の矯正歯科の条件に当てはまるかどうかを返します。
+    
+    PubMedの検索と同じく、MeSH用語 orthodontics（下位の用語を含む）か、
+    タイトル・抄録・キーワード・MeSH用語のいずれかに単語 orthodontic を含む論文を対象とします。
+    ネットワークを使わずにベースラインファイルなどを絞り込む場合に使います。
+    
+    Parameters:
+    -----------
+    fields : dict
+        _article_fields() が返す書誌情報
+    """
+    mesh_terms = fields['mesh_terms']
+    # 下位の用語（Orthodontics, Corrective など）は名前が同じ語で始まる
+    if any(term.lower().startswith(ORTHO_MESH_TERM) for term in mesh_terms):
+        return True
+    title = fields['title']
+    texts = [title.text if title is not None else None] + (fields['abstract_texts'] or [])
+    texts += fields['keywords'] + mesh_terms
+    return any(text and _ORTHO_TEXT_WORD_PATTERN.search(text) for text in texts)
+
+def fetch_pubmed_studies(keywords, max_results=20, days_recent=90, mindate=None, maxdate=None):
     """
     PubMed APIを使用して、指定したキーワードに関連する最新の矯正歯科論文を検索します。
     
+    mindate を指定した場合は出版日ではなく更新日（mdat）で絞り込み、
+    その期間に追加・更新された論文を検索します（差分同期用、days_recent は使いません）。
+    
     Parameters:
     -----------
     keywords : str
@@ -37,45 +385,141 @@ def fetch_pubmed_studies(keywords, max_results=20, days_recent=90):
         取得する最大論文数
     days_recent : int
         何日前までの論文を検索するか
+    mindate, maxdate : str or None
+        更新日の範囲（"YYYY/MM/DD"、両端を含む。maxdate の省略時は mindate と同じ日）
         
     Returns:
     --------
     dict
         検索結果を含む辞書
     """
-    # PubMed検索用のベースURL
-    base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    
-    # APIキーの取得
-    api_key = get_api_key()
-    
     # リクエストパラメータ設定
     params = {
         'db': 'pubmed',
-        'term': f'({keywords}) AND ("orthodontics"[MeSH] OR "orthodontic"[Text Word])',
+        'term': build_search_term(keywords),
         'retmax': max_results,
         'sort': 'relevance',
         'reldate': days_recent,
         'datetype': 'pdat',
         'retmode': 'json',
     }
+    if mindate:
+        del params['reldate']
+        params.update({'datetype': 'mdat', 'mindate': mindate, 'maxdate': maxdate or mindate})
     
-    # APIキーがある場合は追加
-    if api_key:
-        params['api_key'] = api_key
+    # 同じ条件の検索結果が有効期間内にキャッシュされていればそれを返す
+    # （更新日の範囲は当日までの更新を含むため、オフラインモード以外ではキャッシュを使わない）
+    cache = get_pubmed_cache()
+    cached = cache.get_search(params) if not mindate or cache.offline else None
+    if cached is not None:
+        return cached
+    if cache.offline:
+        print(f"オフラインモード: '{keywords}' の検索結果はキャッシュにありません")
+        return {'esearchresult': {'idlist': []}}
     
     try:
-        # PubMed APIへリクエスト送信
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # ステータスコードの確認
+        # PubMed APIへリクエスト送信（APIキーはクライアントが付与）
+        response = get_pubmed_client().get('esearch.fcgi', params)
         
-        # JSON形式で結果を返す
-        return response.json()
+        # JSON形式で結果を返す（エラー応答はキャッシュしない）
+        result = response.json()
+        if 'esearchresult' in result and 'ERROR' not in result['esearchresult']:
+            cache.put_search(params, result)
+        return result
     except requests.exceptions.RequestException as e:
         print(f"PubMed APIリクエストエラー: {e}")
         return {'esearchresult': {'idlist': []}}
 
-def get_pubmed_article_details(pmid_list):
+def split_pubmed_articles(xml_content):
+    """
+    efetch のPubMed XMLを論文ごとのXML断片に分割するジェネレータです。
+    
+    Yields:
+    -------
+    tuple
+        (PMID, PubmedArticle 要素のXML（bytes）)
+    """
+    if isinstance(xml_content, (bytes, bytearray)):
+        xml_content = io.BytesIO(xml_content)
+    
+    root = None
+    for event, elem in ET.iterparse(xml_content, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            continue
+        if elem.tag != 'PubmedArticle':
+            continue
+        
+        pmid = elem.findtext('MedlineCitation/PMID')
+        if pmid:
+            elem.tail = None
+            yield pmid, ET.tostring(elem, encoding='unicode').encode('utf-8')
+        elem.clear()
+        root.clear()
+
+def build_pubmed_article_set(pmid_list, records):
+    """
+    論文ごとのXML断片を、PMIDリストの順に1つの PubmedArticleSet にまとめます。
+    """
+    parts = [b'<?xml version="1.0" encoding="UTF-8"?>\n<PubmedArticleSet>\n']
+    seen = set()
+    for pmid in pmid_list:
+        if pmid in records and pmid not in seen:
+            seen.add(pmid)
+            parts.append(records[pmid])
+            parts.append(b'\n')
+    parts.append(b'</PubmedArticleSet>\n')
+    return b''.join(parts)
+
+def fetch_pubmed_records(pmid_list, refresh=False):
+    """
+    PMIDごとの論文レコード（PubmedArticle のXML断片）を取得します。
+    
+    有効期間内にキャッシュされているPMIDはキャッシュから返し、残りだけを
+    1回の efetch でまとめて取得してキャッシュに保存します。
+    オフラインモードではキャッシュにあるものだけを返します。
+    
+    Parameters:
+    -----------
+    pmid_list : list of str
+        PubMed ID（PMID）のリスト
+    refresh : bool
+        キャッシュを使わずにすべて取得し直す（更新された論文用。取得結果はキャッシュに保存）
+        
+    Returns:
+    --------
+    dict
+        {PMID: PubmedArticle 要素のXML（bytes）}（取得できなかったPMIDは含まない）
+    """
+    cache = get_pubmed_cache()
+    records = cache.get_records(pmid_list) if not refresh or cache.offline else {}
+    missing = [pmid for pmid in dict.fromkeys(pmid_list) if pmid not in records]
+    if not missing:
+        return records
+    if cache.offline:
+        print(f"オフラインモード: {len(missing)}件の論文はキャッシュにありません")
+        return records
+    
+    params = {
+        'db': 'pubmed',
+        'id': ','.join(missing),
+        'retmode': 'xml',
+    }
+    
+    try:
+        # PubMed APIへリクエスト送信（APIキーはクライアントが付与）
+        content = get_pubmed_client().get('efetch.fcgi', params).content
+    except requests.exceptions.RequestException as e:
+        print(f"PubMed 詳細取得APIエラー: {e}")
+        return records
+    
+    fetched = dict(split_pubmed_articles(content))
+    cache.put_records(fetched)
+    records.update(fetched)
+    return records
+
+def get_pubmed_article_details(pmid_list, refresh=False):
     """
     PubMed IDリストから論文の詳細情報を取得します。
     
@@ -83,6 +527,8 @@ def get_pubmed_article_details(pmid_list):
     -----------
     pmid_list : list
         PubMed ID（PMID）のリスト
+    refresh : bool
+        キャッシュ済みのレコードを使わずに取得し直すかどうか
         
     Returns:
     --------
@@ -92,164 +538,612 @@ def get_pubmed_article_details(pmid_list):
     if not pmid_list:
         return []
     
-    # PubMed詳細取得用のベースURL
-    fetch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+    # 論文レコードはPMIDごとにキャッシュされ、未取得の分だけを efetch で取得
+    records = fetch_pubmed_records(pmid_list, refresh)
+    if not records:
+        return []
+    return parse_pubmed_articles(build_pubmed_article_set(pmid_list, records))
+
+def _article_fields(article):
+    """
+    PubmedArticle 要素を1回だけ走査し、書誌情報の各フィールドを取り出します。
     
-    # カンマ区切りのPMIDリスト作成
-    pmids = ','.join(pmid_list)
+    子要素を直接たどるため、フィールドごとに部分木全体を検索し直すことはありません。
+    PMIDは MedlineCitation 直下のものだけを使い、CommentsCorrections 内の
+    参照先PMIDを誤って拾うことはありません。
     
-    # APIキーの取得
-    api_key = get_api_key()
+    Returns:
+    --------
+    dict
+        pmid, title, abstract_texts, doi, year, authors, keywords, mesh_terms, journal,
+        publication_types, retraction_of（撤回告知が撤回する論文のPMID）
+        （見つからなかった項目は None、abstract_texts は AbstractText 要素がなければ None）
+    """
+    fields = {
+        'pmid': None, 'title': None, 'abstract_texts': None, 'doi': None, 'year': None,
+        'authors': [], 'keywords': [], 'mesh_terms': [], 'journal': None,
+        'publication_types': [], 'retraction_of': [],
+    }
     
-    # リクエストパラメータ設定
-    params = {
-        'db': 'pubmed',
-        'id': pmids,
-        'retmode': 'xml',
+    def add_abstract(abstract_element):
+        for abstract_text in abstract_element.iterfind('AbstractText'):
+            if fields['abstract_texts'] is None:
+                fields['abstract_texts'] = []
+            if abstract_text.text:
+                fields['abstract_texts'].append(abstract_text.text)
+    
+    for section in article:
+        if section.tag == 'MedlineCitation':
+            for child in section:
+                tag = child.tag
+                if tag == 'PMID':
+                    if fields['pmid'] is None:
+                        fields['pmid'] = child.text
+                elif tag == 'Article':
+                    for item in child:
+                        item_tag = item.tag
+                        if item_tag == 'Journal':
+                            for journal_item in item:
+                                if journal_item.tag == 'Title' and fields['journal'] is None:
+                                    fields['journal'] = journal_item.text
+                                elif journal_item.tag == 'JournalIssue':
+                                    year_element = journal_item.find('PubDate/Year')
+                                    if year_element is not None:
+                                        fields['year'] = year_element.text
+                        elif item_tag == 'ArticleTitle':
+                            if fields['title'] is None:
+                                fields['title'] = item
+                        elif item_tag == 'Abstract':
+                            add_abstract(item)
+                        elif item_tag == 'AuthorList':
+                            for author in item.iterfind('Author'):
+                                last_name = author.find('LastName')
+                                fore_name = author.find('ForeName')
+                                if last_name is not None and fore_name is not None:
+                                    fields['authors'].append(f"{last_name.text} {fore_name.text}")
+                                elif last_name is not None:
+                                    fields['authors'].append(last_name.text)
+                        elif item_tag == 'PublicationTypeList':
+                            fields['publication_types'].extend(
+                                publication_type.text for publication_type in item.iterfind('PublicationType')
+                                if publication_type.text)
+                elif tag == 'OtherAbstract':
+                    add_abstract(child)
+                elif tag == 'KeywordList':
+                    fields['keywords'].extend(keyword.text for keyword in child.iterfind('Keyword') if keyword.text)
+                elif tag == 'MeshHeadingList':
+                    for heading in child.iterfind('MeshHeading'):
+                        descriptor = heading.find('DescriptorName')
+                        if descriptor is not None and descriptor.text:
+                            fields['mesh_terms'].append(descriptor.text)
+                elif tag == 'CommentsCorrectionsList':
+                    for comment in child.iterfind('CommentsCorrections'):
+                        if comment.get('RefType') == 'RetractionOf':
+                            retracted_pmid = comment.find('PMID')
+                            if retracted_pmid is not None and retracted_pmid.text:
+                                fields['retraction_of'].append(retracted_pmid.text)
+        elif section.tag == 'PubmedData':
+            for article_id in section.iterfind('ArticleIdList/ArticleId'):
+                if article_id.get('IdType') == 'doi':
+                    fields['doi'] = article_id.text
+                    break
+    
+    return fields
+
+def _article_to_dict(article, fields=None):
+    """
+    PubmedArticle 要素1件を論文詳細の辞書に変換します。
+    
+    _article_fields() の結果を fields に渡すと、要素を走査し直しません。
+    """
+    if fields is None:
+        fields = _article_fields(article)
+    
+    # タイトル（要素があれば、その直下のテキスト）
+    title_element = fields['title']
+    title = title_element.text if title_element is not None else "タイトル不明"
+    
+    # 抄録（AbstractText が1つもなければ「抄録なし」）
+    abstract_texts = fields['abstract_texts']
+    abstract = ' '.join(abstract_texts) if abstract_texts is not None else "抄録なし"
+    
+    doi = fields['doi'] if fields['doi'] is not None else "DOI不明"
+    year = fields['year'] if fields['year'] is not None else "年不明"
+    authors_str = ', '.join(fields['authors']) if fields['authors'] else "著者不明"
+    keywords_str = ', '.join(fields['keywords']) if fields['keywords'] else "キーワードなし"
+    mesh_str = ', '.join(fields['mesh_terms']) if fields['mesh_terms'] else "MeSH用語なし"
+    pmid = fields['pmid'] if fields['pmid'] is not None else "PMID不明"
+    journal = fields['journal'] if fields['journal'] is not None else "ジャーナル不明"
+    
+    # 研究タイプ・サンプルサイズなどの派生フィールドをまとめて導出
+    mined = TEXT_MINER.mine(title, abstract, keywords_str, mesh_str)
+    
+    # 論文の詳細情報を辞書として保存
+    return {
+        'pmid': pmid,
+        'title': title,
+        'abstract': abstract,
+        'doi': doi,
+        'publication_year': year,
+        'authors': authors_str,
+        'keywords': keywords_str,
+        'mesh_terms': mesh_str,
+        'study_type': mined['study_type'],
+        'journal': journal,
+        'publication_types': fields['publication_types'],
+        'retraction_of': fields['retraction_of'],
+        'sample_size': mined['sample_size'],
+        'confidence_interval': mined['confidence_interval'],
+        'age_group': mined['age_group'],
+        'issue': mined['issue'],
+        'risk_description': mined['risk_description'],
+        'url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
     }
+
+def iter_parse_pubmed_articles(source, article_filter=None):
+    """
+    PubMed XMLを iterparse で逐次解析し、論文詳細を1件ずつ返すジェネレータです。
     
-    # APIキーがある場合は追加
-    if api_key:
-        params['api_key'] = api_key
+    木全体を構築せず、処理済みの PubmedArticle 要素はその都度破棄するため、
+    レスポンスの大きさにかかわらずメモリ使用量は論文1件分程度に収まります。
     
-    try:
-        # PubMed APIへリクエスト送信
-        response = requests.get(fetch_url, params=params)
-        response.raise_for_status()
+    Parameters:
+    -----------
+    source : file-like object or bytes
+        efetch のレスポンス本文（PubmedArticleSet）。ストリームをそのまま渡せます
+        （PubMedのベースライン・更新ファイルも同じ形式です）
+    article_filter : callable or None
+        書誌情報（_article_fields() の結果）を受け取る関数。False を返した論文は
+        分類などを行わずに読み飛ばします（is_orthodontic_article() など）
         
-        # XMLを解析
-        root = ET.fromstring(response.content)
+    Yields:
+    -------
+    dict
+        論文の詳細情報（get_pubmed_article_details と同じ形式）
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    
+    root = None
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            continue
         
-        articles = []
-        for article in root.findall('.//PubmedArticle'):
-            try:
-                # タイトル取得
-                title_element = article.find('.//ArticleTitle')
-                title = title_element.text if title_element is not None else "タイトル不明"
-                
-                # 抄録取得
-                abstract_texts = article.findall('.//AbstractText')
-                abstract = ' '.join([abstract_text.text for abstract_text in abstract_texts if abstract_text.text]) if abstract_texts else "抄録なし"
-                
-                # DOI取得
-                doi_element = article.find('.//ArticleId[@IdType="doi"]')
-                doi = doi_element.text if doi_element is not None else "DOI不明"
-                
-                # 出版年取得
-                pub_date = article.find('.//PubDate')
-                year_element = pub_date.find('./Year')
-                year = year_element.text if year_element is not None else "年不明"
-                
-                # 著者取得
-                authors_list = article.findall('.//Author')
-                authors = []
-                for author in authors_list:
-                    last_name = author.find('./LastName')
-                    fore_name = author.find('./ForeName')
-                    if last_name is not None and fore_name is not None:
-                        authors.append(f"{last_name.text} {fore_name.text}")
-                    elif last_name is not None:
-                        authors.append(last_name.text)
-                authors_str = ', '.join(authors) if authors else "著者不明"
-                
-                # キーワード取得
-                keywords = []
-                keyword_elements = article.findall('.//Keyword')
-                for keyword in keyword_elements:
-                    if keyword.text:
-                        keywords.append(keyword.text)
-                keywords_str = ', '.join(keywords) if keywords else "キーワードなし"
-                
-                # MeSH用語取得
-                mesh_terms = []
-                mesh_elements = article.findall('.//MeshHeading/DescriptorName')
-                for mesh in mesh_elements:
-                    if mesh.text:
-                        mesh_terms.append(mesh.text)
-                mesh_str = ', '.join(mesh_terms) if mesh_terms else "MeSH用語なし"
-                
-                # 研究タイプの推測（タイトルと抄録から）
-                study_type = determine_study_type(title, abstract)
-                
-                # PMIDの取得
-                pmid_element = article.find('.//PMID')
-                pmid = pmid_element.text if pmid_element is not None else "PMID不明"
-                
-                # ジャーナル名取得
-                journal_element = article.find('.//Journal/Title')
-                journal = journal_element.text if journal_element is not None else "ジャーナル不明"
-                
-                # サンプルサイズ抽出
-                sample_size = extract_sample_size(abstract)
-                
-                # 論文の詳細情報を辞書として保存
-                articles.append({
-                    'pmid': pmid,
-                    'title': title,
-                    'abstract': abstract,
-                    'doi': doi,
-                    'publication_year': year,
-                    'authors': authors_str,
-                    'keywords': keywords_str,
-                    'mesh_terms': mesh_str,
-                    'study_type': study_type,
-                    'journal': journal,
-                    'sample_size': sample_size,
-                    'confidence_interval': extract_confidence_interval(abstract),
-                    'age_group': determine_age_group(abstract),
-                    'url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-                })
-            except Exception as e:
-                print(f"論文データの解析エラー: {e}")
-                continue
+        if elem.tag != 'PubmedArticle':
+            continue
+        
+        try:
+            fields = _article_fields(elem)
+            if article_filter is None or article_filter(fields):
+                article = _article_to_dict(elem, fields)
+            else:
+                article = None
+        except Exception as e:
+            print(f"論文データの解析エラー: {e}")
+            article = None
         
-        return articles
+        # 処理済みの要素を破棄してメモリを解放
+        elem.clear()
+        root.clear()
+        
+        if article is not None:
+            yield article
+
+def parse_pubmed_articles(xml_content):
+    """
+    efetch が返したPubMed XMLから論文の詳細情報を取り出します。
+    
+    Parameters:
+    -----------
+    xml_content : bytes or file-like object
+        efetch のレスポンス本文（PubmedArticleSet）
+        
+    Returns:
+    --------
+    list of dict
+        各論文の詳細情報を含む辞書のリスト
+    """
+    return list(iter_parse_pubmed_articles(xml_content))
+
+def iter_pubmed_article_batches(keywords, days_recent=90, batch_size=200, max_records=None):
+    """
+    ESearchの履歴サーバー（WebEnv/query_key）を使い、検索結果の論文詳細を
+    ページ単位で順に取得するジェネレータです。
+    
+    IDリストをURLに並べないため、件数の多い検索結果でもURLが長くならず、
+    メモリには1ページ分の論文だけを保持します。
+    途中のページの取得・解析に失敗した場合は例外を送出するため、呼び出し側は
+    途中で打ち切られた結果を完全な結果と区別できます。
+    
+    Parameters:
+    -----------
+    keywords : str
+        検索キーワード
+    days_recent : int
+        何日前までの論文を検索するか
+    batch_size : int
+        efetch 1回あたりの取得件数
+    max_records : int or None
+        取得する最大件数（Noneの場合は検索結果すべて）
         
+    Yields:
+    -------
+    list of dict
+        1ページ分の論文詳細（get_pubmed_article_details と同じ形式）
+    
+    Raises:
+    -------
+    requests.exceptions.RequestException
+        検索またはページの取得が再試行を使い切っても成功しなかった場合
+    xml.etree.ElementTree.ParseError
+        ページの応答が途中で切れているなど、XMLとして解析できなかった場合
+    """
+    client = get_pubmed_client()
+    
+    # 検索結果を履歴サーバーに保存（IDリスト自体は受け取らない）
+    params = {
+        'db': 'pubmed',
+        'term': build_search_term(keywords),
+        'retmax': 0,
+        'usehistory': 'y',
+        'reldate': days_recent,
+        'datetype': 'pdat',
+        'retmode': 'json',
+    }
+    
+    try:
+        result = client.get('esearch.fcgi', params).json().get('esearchresult', {})
     except requests.exceptions.RequestException as e:
-        print(f"PubMed 詳細取得APIエラー: {e}")
+        print(f"PubMed APIリクエストエラー: {e}")
+        raise
+    
+    total = int(result.get('count', 0))
+    if max_records is not None:
+        total = min(total, max_records)
+    webenv = result.get('webenv')
+    query_key = result.get('querykey')
+    if not total or not webenv or not query_key:
+        return
+    
+    # 履歴サーバーからページ単位で詳細を取得
+    for retstart in range(0, total, batch_size):
+        params = {
+            'db': 'pubmed',
+            'WebEnv': webenv,
+            'query_key': query_key,
+            'retstart': retstart,
+            'retmax': min(batch_size, total - retstart),
+            'retmode': 'xml',
+        }
+        
+        try:
+            with client.get('efetch.fcgi', params, stream=True) as response:
+                articles = parse_pubmed_articles(client.open_stream(response))
+        except (requests.exceptions.RequestException, ET.ParseError) as e:
+            print(f"PubMed 詳細取得APIエラー (retstart={retstart}): {e}")
+            raise
+        
+        yield articles
+
+def fetch_pubmed_xml(pmid_list, refresh=False):
+    """
+    PMIDリストの論文レコード（PubMed XML）を解析せずにそのまま返します。
+    
+    解析・分類を enrich_xml_chunks() で別プロセスに任せる場合に使います。
+    論文レコードは fetch_pubmed_records() と同じくPMIDごとにキャッシュされます
+    （refresh=True の場合はキャッシュを使わずに取得し直します）。
+    
+    Returns:
+    --------
+    bytes or None
+        PubmedArticleSet のXML。1件も取得できなかった場合はNone
+    """
+    if not pmid_list:
+        return None
+    
+    records = fetch_pubmed_records(pmid_list, refresh)
+    if not records:
+        return None
+    return build_pubmed_article_set(pmid_list, records)
+
+def enrich_article(article):
+    """
+    論文詳細の辞書に、論文CSVへの保存に必要な派生フィールド
+    （issue, risk_description, evidence_level）を付与して返します。
+    """
+    if 'issue' not in article or 'risk_description' not in article:
+        mined = TEXT_MINER.mine(article['title'], article['abstract'], article['keywords'], article['mesh_terms'])
+        article['issue'] = mined['issue']
+        article['risk_description'] = mined['risk_description']
+    article['evidence_level'] = map_study_type_to_evidence_level(article['study_type'])
+    return article
+
+def _enrich_xml_chunk(xml_content):
+    # ワーカープロセスで実行: XMLの解析と分類をまとめて行う
+    if not xml_content:
         return []
+    return [enrich_article(article) for article in iter_parse_pubmed_articles(xml_content)]
 
-# 以下の関数は変更なし
-def determine_study_type(title, abstract):
+# これより小さい入力はプロセス起動のコストが見合わないため、同一プロセスで処理する
+PARALLEL_ENRICH_MIN_BYTES = 2 * 1024 * 1024
+
+def enrich_xml_chunks(xml_chunks, max_workers=None, executor=None, min_parallel_bytes=PARALLEL_ENRICH_MIN_BYTES):
     """
-    タイトルと抄録から研究タイプを推測します。
+    efetch のXMLチャンクを解析・分類し、保存可能な論文データを返します。
+    
+    チャンクは ProcessPoolExecutor に分配して複数コアで処理し、結果は
+    入力と同じ順序で返します。入力が小さい場合やワーカー数が1の場合は
+    同一プロセスで処理します。
+    
+    Parameters:
+    -----------
+    xml_chunks : list of bytes
+        efetch のレスポンス本文のリスト（None は空として扱う）
+    max_workers : int or None
+        ワーカープロセス数（Noneの場合はCPU数）
+    executor : concurrent.futures.ProcessPoolExecutor or None
+        再利用するプロセスプール（指定時は max_workers を無視）
+    min_parallel_bytes : int
+        並列処理に切り替える入力サイズの下限（バイト）
+        
+    Returns:
+    --------
+    list of list of dict
+        チャンクごとの論文データ（enrich_article() 適用済み）
     """
-    text = (title + " " + abstract).lower()
+    xml_chunks = list(xml_chunks)
+    total_bytes = sum(len(chunk) for chunk in xml_chunks if chunk)
     
-    # メタ分析、システマティックレビュー
-    if any(term in text for term in ["meta-analysis", "systematic review", "meta analysis"]):
-        return "meta-analysis"
+    if (len(xml_chunks) < 2 or total_bytes < min_parallel_bytes
+            or (executor is None and max_workers == 1)):
+        return [_enrich_xml_chunk(chunk) for chunk in xml_chunks]
     
-    # ランダム化比較試験
-    elif any(term in text for term in ["randomized controlled trial", "rct", "randomised"]):
-        return "randomized-controlled-trial"
+    if executor is not None:
+        return list(executor.map(_enrich_xml_chunk, xml_chunks))
     
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_enrich_xml_chunk, xml_chunks))
+
+# テキストマイニング用の語彙と正規表現（インポート時に1度だけ準備する）
+
+# 研究タイプを示す表現（判定の優先順）
+STUDY_TYPE_TERMS = (
+    # メタ分析、システマティックレビュー
+    ("meta-analysis", ("meta-analysis", "systematic review", "meta analysis")),
+    # ランダム化比較試験
+    ("randomized-controlled-trial", ("randomized controlled trial", "rct", "randomised")),
     # コホート研究
-    elif any(term in text for term in ["cohort", "prospective study", "longitudinal study", "follow-up study"]):
-        return "cohort-study"
-    
+    ("cohort-study", ("cohort", "prospective study", "longitudinal study", "follow-up study")),
     # 症例対照研究
-    elif any(term in text for term in ["case-control", "case control"]):
-        return "case-control"
-    
+    ("case-control", ("case-control", "case control")),
     # 横断研究
-    elif any(term in text for term in ["cross-sectional", "prevalence study"]):
-        return "cross-sectional"
-    
+    ("cross-sectional", ("cross-sectional", "prevalence study")),
     # 症例報告
-    elif any(term in text for term in ["case report", "case series"]):
-        return "case-report"
-    
+    ("case-report", ("case report", "case series")),
     # 臨床試験
-    elif any(term in text for term in ["clinical trial", "intervention study"]):
-        return "clinical-trial"
-    
+    ("clinical-trial", ("clinical trial", "intervention study")),
     # 実験研究
-    elif any(term in text for term in ["in vitro", "laboratory", "experimental study"]):
-        return "experimental-study"
-    
-    # デフォルト
-    return "unspecified-study"
+    ("experimental-study", ("in vitro", "laboratory", "experimental study")),
+)
+
+# 日本語の歯列問題とその英語表現のマッピング（判定の優先順）
+DENTAL_ISSUE_TERMS = (
+    ("叢生", ("crowding", "dental crowding", "malocclusion", "tooth crowding")),
+    ("開咬", ("open bite", "anterior open bite", "open occlusion")),
+    ("過蓋咬合", ("deep bite", "overbite", "deep overbite")),
+    ("交叉咬合", ("crossbite", "cross bite", "cross-bite", "posterior crossbite")),
+    ("上顎前突", ("overjet", "maxillary protrusion", "class ii malocclusion", "maxillary prognathism")),
+    ("下顎前突", ("underbite", "mandibular prognathism", "class iii malocclusion", "mandibular protrusion")),
+)
+
+# 年齢層を示す表現
+CHILDREN_TERMS = ("children", "child", "pediatric", "paediatric", "young", "deciduous dentition", "mixed dentition", "primary dentition")
+ADOLESCENT_TERMS = ("adolescent", "adolescence", "teenager", "young adult", "young people")
+ADULT_TERMS = ("adult", "middle-aged", "middle aged")
+ELDERLY_TERMS = ("elderly", "older adult", "geriatric", "older people", "senior")
+
+# 大文字小文字を区別しないパターンは、小文字化したテキストに対して
+# 区別ありで照合する。re.IGNORECASE と同じ結果にするため、小文字化で
+# 対応が崩れる文字（İ, ı, ſ）を先に置き換える
+_CASE_FOLD_TABLE = {0x130: 'i', 0x131: 'i', 0x17f: 's'}
+
+# サンプルサイズを示す一般的なパターン
+SAMPLE_SIZE_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'(?:total of|included|enrolled|analyzed|comprising|consisted of|sample of|n\s*=\s*)(\d+)(?:\s+(?:patients|subjects|participants|children|adults|individuals))',
+    r'(\d+)(?:\s+(?:patients|subjects|participants|children|adults|individuals))(?:\s+were\s+(?:included|enrolled|studied))',
+    r'sample(?:\s+size)?(?:\s+of)?(?:\s+was)?(?:\s+were)?\s*(?::|was|=)\s*(\d+)',
+    r'(?:a|the)\s+(?:total\s+)?(?:of\s+)?(\d+)\s+(?:patients|subjects|participants|children|adults|individuals)'
+))
+
+# 信頼区間を示す一般的なパターン
+CONFIDENCE_INTERVAL_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'(?:95%\s+ci|95%\s+confidence\s+interval)(?:\s+of)?(?:\s+was)?(?:\s+:)?\s*(?:\[|\()?(\d+\.?\d*)[^\d]+(\d+\.?\d*)(?:\]|\))',
+    r'(?:\[|\()(\d+\.?\d*)[^\d]+(\d+\.?\d*)(?:\]|\))(?:\s+95%\s+ci)'
+))
+
+# 年齢の範囲・平均年齢を示すパターン
+AGE_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'age(?:d|s)?\s+(?:between|from|of|range)?\s*(\d+)(?:\s*-\s*|\s+to\s+)(\d+)(?:\s+years)?',
+    r'(\d+)(?:\s*-\s*|\s+to\s+)(\d+)(?:\s+years?\s+old|\s+years?\s+of\s+age)',
+    r'mean\s+age\s+(?:of|was|=)\s+(\d+\.?\d*)'
+))
+
+# リスクの数値と関連する記述を示すパターン
+RISK_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'(\d+\.?\d*)%\s+(?:increase|higher|greater|elevated)\s+risk',
+    r'risk\s+(?:increased|higher|greater|elevated)\s+by\s+(\d+\.?\d*)%',
+    r'odds\s+ratio\s+(?:of|was|=)\s+(\d+\.?\d*)',
+    r'(?:relative|absolute)\s+risk\s+(?:of|was|=)\s+(\d+\.?\d*)',
+    r'hazard\s+ratio\s+(?:of|was|=)\s+(\d+\.?\d*)'
+))
+
+def _contains_any(text, terms):
+    return any(term in text for term in terms)
+
+def _case_fold(text, text_lower):
+    """
+    re.IGNORECASE 相当の照合に使う小文字化テキストを返します（長さは元の文字列と同じ）。
+    """
+    if 'İ' in text or 'ı' in text or 'ſ' in text:
+        return text.translate(_CASE_FOLD_TABLE).lower()
+    return text_lower
+
+class TextMiner:
+    """
+    論文のタイトル・抄録から研究タイプ、年齢層、サンプルサイズ、信頼区間、
+    リスク記述、歯列問題を導出します。
+
+    テキストの小文字化は1論文につき1回だけ行い、正規表現はインポート時に
+    コンパイルしたものを使い回します。語彙の照合は部分文字列検索のまま
+    （CPythonでは正規表現の選択やPython実装のAho-Corasickより高速）とし、
+    各 determine_* / extract_* 関数と同一の結果を返します。
+    """
+
+    def mine(self, title, abstract, keywords="", mesh_terms=""):
+        """
+        1論文分の派生フィールドをまとめて導出します。
+
+        Returns:
+        --------
+        dict
+            study_type, sample_size, confidence_interval, age_group,
+            risk_description, issue
+        """
+        title_lower = title.lower()
+        abstract_lower = abstract.lower() if abstract else ""
+        study_text = title_lower + " " + abstract_lower
+        issue_text = study_text + " " + keywords.lower() + " " + mesh_terms.lower()
+        abstract_folded = _case_fold(abstract, abstract_lower) if abstract else ""
+
+        return {
+            'study_type': self.study_type(study_text),
+            'sample_size': self.sample_size(abstract_folded),
+            'confidence_interval': self.confidence_interval(abstract_folded),
+            'age_group': self.age_group(abstract_lower),
+            'risk_description': self.risk_description(title, abstract, abstract_folded),
+            'issue': self.issue(issue_text),
+        }
+
+    def study_type(self, text_lower):
+        for study_type, terms in STUDY_TYPE_TERMS:
+            if _contains_any(text_lower, terms):
+                return study_type
+        return "unspecified-study"
+
+    def issue(self, text_lower):
+        for issue, terms in DENTAL_ISSUE_TERMS:
+            if _contains_any(text_lower, terms):
+                return issue
+        return "その他の歯列問題"
+
+    def sample_size(self, abstract_folded):
+        if not abstract_folded:
+            return None
+        for pattern in SAMPLE_SIZE_PATTERNS:
+            matches = pattern.search(abstract_folded)
+            if matches:
+                try:
+                    return int(matches.group(1))
+                except (IndexError, ValueError):
+                    continue
+        return None
+
+    def confidence_interval(self, abstract_folded):
+        if not abstract_folded:
+            return None
+        for pattern in CONFIDENCE_INTERVAL_PATTERNS:
+            matches = pattern.search(abstract_folded)
+            if matches:
+                try:
+                    return f"95% CI: {matches.group(1)}-{matches.group(2)}"
+                except (IndexError, ValueError):
+                    continue
+        return None
+
+    def age_group(self, abstract_lower):
+        if not abstract_lower:
+            return "全年齢"
+
+        min_age = 100
+        max_age = 0
+
+        for pattern in AGE_PATTERNS:
+            for match in pattern.finditer(abstract_lower):
+                try:
+                    if len(match.groups()) >= 2:
+                        # 年齢範囲の場合
+                        age1 = float(match.group(1))
+                        age2 = float(match.group(2))
+                        min_age = min(min_age, age1, age2)
+                        max_age = max(max_age, age1, age2)
+                    else:
+                        # 平均年齢の場合
+                        age = float(match.group(1))
+                        min_age = min(min_age, age - 5)  # 平均年齢の前後5年を仮定
+                        max_age = max(max_age, age + 5)
+                except (IndexError, ValueError):
+                    continue
+
+        # 年齢範囲に基づく判定
+        if min_age < 100 and max_age > 0:
+            if min_age < 13 and max_age < 18:
+                return "小児"
+            elif min_age < 18 and max_age < 25:
+                return "小児・青年"
+            elif min_age >= 18 and max_age < 60:
+                return "成人"
+            elif min_age >= 40:
+                return "成人・高齢者"
+            else:
+                return "全年齢"
+
+        # キーワードに基づく判定
+        if _contains_any(abstract_lower, CHILDREN_TERMS):
+            if _contains_any(abstract_lower, ADOLESCENT_TERMS):
+                return "小児・青年"
+            return "小児"
+        elif _contains_any(abstract_lower, ADOLESCENT_TERMS):
+            return "青年"
+        elif _contains_any(abstract_lower, ADULT_TERMS):
+            if _contains_any(abstract_lower, ELDERLY_TERMS):
+                return "成人・高齢者"
+            return "成人"
+        elif _contains_any(abstract_lower, ELDERLY_TERMS):
+            return "高齢者"
+
+        return "全年齢"
+
+    def risk_description(self, title, abstract, abstract_folded):
+        if not abstract:
+            return title
+
+        for pattern in RISK_PATTERNS:
+            matches = pattern.search(abstract_folded)
+            if matches:
+                try:
+                    risk_value = float(matches.group(1))
+                    context_start = max(0, matches.start() - 50)
+                    context_end = min(len(abstract), matches.end() + 50)
+                    risk_context = abstract[context_start:context_end].strip()
+                    return f"{risk_value:.1f}%上昇 ({risk_context}...)"
+                except (IndexError, ValueError):
+                    continue
+
+        # リスク表現が見つからない場合は、タイトルを簡易的な記述として返す
+        if len(title) > 100:
+            return title[:100] + "..."
+        return title
+
+# プロセス共有のテキストマイナー
+TEXT_MINER = TextMiner()
+
+def determine_study_type(title, abstract):
+    """
+    タイトルと抄録から研究タイプを推測します。
+    """
+    return TEXT_MINER.study_type((title + " " + abstract).lower())
 
 def map_study_type_to_evidence_level(study_type):
     """
@@ -273,25 +1167,7 @@ def classify_dental_issue(title, abstract, keywords, mesh_terms):
     """
     論文タイトル、抄録、キーワード、MeSH用語から歯列問題を分類します。
     """
-    text = (title + " " + abstract + " " + keywords + " " + mesh_terms).lower()
-    
-    # 日本語の歯列問題とその英語表現のマッピング
-    dental_issues = {
-        "叢生": ["crowding", "dental crowding", "malocclusion", "tooth crowding"],
-        "開咬": ["open bite", "anterior open bite", "open occlusion"],
-        "過蓋咬合": ["deep bite", "overbite", "deep overbite"],
-        "交叉咬合": ["crossbite", "cross bite", "cross-bite", "posterior crossbite"],
-        "上顎前突": ["overjet", "maxillary protrusion", "class ii malocclusion", "maxillary prognathism"],
-        "下顎前突": ["underbite", "mandibular prognathism", "class iii malocclusion", "mandibular protrusion"]
-    }
-    
-    # テキスト内の表現に基づいて歯列問題を分類
-    for issue, terms in dental_issues.items():
-        if any(term in text for term in terms):
-            return issue
-    
-    # デフォルト
-    return "その他の歯列問題"
+    return TEXT_MINER.issue((title + " " + abstract + " " + keywords + " " + mesh_terms).lower())
 
 def extract_sample_size(abstract):
     """
@@ -299,24 +1175,7 @@ def extract_sample_size(abstract):
     """
     if not abstract:
         return None
-    
-    # サンプルサイズを示す一般的なパターン
-    patterns = [
-        r'(?:total of|included|enrolled|analyzed|comprising|consisted of|sample of|n\s*=\s*)(\d+)(?:\s+(?:patients|subjects|participants|children|adults|individuals))',
-        r'(\d+)(?:\s+(?:patients|subjects|participants|children|adults|individuals))(?:\s+were\s+(?:included|enrolled|studied))',
-        r'sample(?:\s+size)?(?:\s+of)?(?:\s+was)?(?:\s+were)?\s*(?::|was|=)\s*(\d+)',
-        r'(?:a|the)\s+(?:total\s+)?(?:of\s+)?(\d+)\s+(?:patients|subjects|participants|children|adults|individuals)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.search(pattern, abstract, re.IGNORECASE)
-        if matches:
-            try:
-                return int(matches.group(1))
-            except (IndexError, ValueError):
-                continue
-    
-    return None
+    return TEXT_MINER.sample_size(_case_fold(abstract, abstract.lower()))
 
 def extract_confidence_interval(abstract):
     """
@@ -324,24 +1183,7 @@ def extract_confidence_interval(abstract):
     """
     if not abstract:
         return None
-    
-    # 信頼区間を示す一般的なパターン
-    patterns = [
-        r'(?:95%\s+CI|95%\s+confidence\s+interval)(?:\s+of)?(?:\s+was)?(?:\s+:)?\s*(?:\[|\()?(\d+\.?\d*)[^\d]+(\d+\.?\d*)(?:\]|\))',
-        r'(?:\[|\()(\d+\.?\d*)[^\d]+(\d+\.?\d*)(?:\]|\))(?:\s+95%\s+CI)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.search(pattern, abstract, re.IGNORECASE)
-        if matches:
-            try:
-                lower = matches.group(1)
-                upper = matches.group(2)
-                return f"95% CI: {lower}-{upper}"
-            except (IndexError, ValueError):
-                continue
-    
-    return None
+    return TEXT_MINER.confidence_interval(_case_fold(abstract, abstract.lower()))
 
 def determine_age_group(abstract):
     """
@@ -349,226 +1191,214 @@ def determine_age_group(abstract):
     """
     if not abstract:
         return "全年齢"
+    return TEXT_MINER.age_group(abstract.lower())
+
+def extract_risk_description(title, abstract):
+    """
+    タイトルと抄録からリスク記述を抽出します。
+    """
+    if not abstract:
+        return title
+    return TEXT_MINER.risk_description(title, abstract, _case_fold(abstract, abstract.lower()))
+
+def load_known_pmids(csv_file='papers.csv'):
+    """
+    論文CSVに登録済みのPMIDを集合として返します。
     
-    abstract_lower = abstract.lower()
-    
-    # 小児を示す表現
-    children_terms = ["children", "child", "pediatric", "paediatric", "young", "deciduous dentition", "mixed dentition", "primary dentition"]
-    
-    # 青年を示す表現
-    adolescent_terms = ["adolescent", "adolescence", "teenager", "young adult", "young people"]
+    pmid列がない古いCSVでは、PubMedのURLから取り出したPMIDも含みます。
+    CSV本体ではなくストアのキーインデックスから返すため、件数によらず高速です。
+    """
+    from paper_store import get_paper_store
+    try:
+        return get_paper_store(csv_file).pmids
+    except Exception as e:
+        print(f"登録済みPMIDの読み込みエラー: {e}")
+        return set()
+
+def build_paper_row(article):
+    """
+    論文詳細の辞書から論文CSVの1行分を作成します。
     
-    # 成人を示す表現
-    adult_terms = ["adult", "middle-aged", "middle aged"]
+    enrich_article() などで導出済みのフィールドはそのまま使い、
+    ないものだけをその場で導出します。
+    """
+    # サンプルサイズの整形
+    sample_size_str = str(article['sample_size']) if article['sample_size'] else "不明"
     
-    # 高齢者を示す表現
-    elderly_terms = ["elderly", "older adult", "geriatric", "older people", "senior"]
+    # 信頼区間の整形
+    ci_str = article['confidence_interval'] if article['confidence_interval'] else "不明"
     
-    # 年齢の範囲を探す
-    age_patterns = [
-        r'age(?:d|s)?\s+(?:between|from|of|range)?\s*(\d+)(?:\s*-\s*|\s+to\s+)(\d+)(?:\s+years)?',
-        r'(\d+)(?:\s*-\s*|\s+to\s+)(\d+)(?:\s+years?\s+old|\s+years?\s+of\s+age)',
-        r'mean\s+age\s+(?:of|was|=)\s+(\d+\.?\d*)'
-    ]
+    # 歯列問題の分類（解析時に導出済みであればそれを使う）
+    if 'issue' in article:
+        issue = article['issue']
+    else:
+        issue = classify_dental_issue(
+            article['title'], 
+            article['abstract'], 
+            article['keywords'], 
+            article['mesh_terms']
+        )
     
-    min_age = 100
-    max_age = 0
+    # リスク記述の抽出
+    if 'risk_description' in article:
+        risk_description = article['risk_description']
+    else:
+        risk_description = extract_risk_description(article['title'], article['abstract'])
     
-    for pattern in age_patterns:
-        matches = re.finditer(pattern, abstract_lower)
-        for match in matches:
-            try:
-                if len(match.groups()) >= 2:
-                    # 年齢範囲の場合
-                    age1 = float(match.group(1))
-                    age2 = float(match.group(2))
-                    min_age = min(min_age, age1, age2)
-                    max_age = max(max_age, age1, age2)
-                else:
-                    # 平均年齢の場合
-                    age = float(match.group(1))
-                    min_age = min(min_age, age - 5)  # 平均年齢の前後5年を仮定
-                    max_age = max(max_age, age + 5)
-            except (IndexError, ValueError):
-                continue
+    # エビデンスレベルの取得
+    if 'evidence_level' in article:
+        evidence_level = article['evidence_level']
+    else:
+        evidence_level = map_study_type_to_evidence_level(article['study_type'])
     
-    # 年齢範囲に基づく判定
-    if min_age < 100 and max_age > 0:
-        if min_age < 13 and max_age < 18:
-            return "小児"
-        elif min_age < 18 and max_age < 25:
-            return "小児・青年"
-        elif min_age >= 18 and max_age < 60:
-            return "成人"
-        elif min_age >= 40:
-            return "成人・高齢者"
-        else:
-            return "全年齢"
-    
-    # キーワードに基づく判定
-    if any(term in abstract_lower for term in children_terms):
-        if any(term in abstract_lower for term in adolescent_terms):
-            return "小児・青年"
-        return "小児"
-    elif any(term in abstract_lower for term in adolescent_terms):
-        return "青年"
-    elif any(term in abstract_lower for term in adult_terms):
-        if any(term in abstract_lower for term in elderly_terms):
-            return "成人・高齢者"
-        return "成人"
-    elif any(term in abstract_lower for term in elderly_terms):
-        return "高齢者"
-    
-    # デフォルト
-    return "全年齢"
+    return {
+        'issue': issue,
+        'risk_description': risk_description,
+        'doi': article['doi'],
+        'publication_year': article['publication_year'],
+        'study_type': article['study_type'],
+        'sample_size': sample_size_str,
+        'confidence_interval': ci_str,
+        'age_group': article['age_group'],
+        'evidence_level': evidence_level,
+        'authors': article['authors'],
+        'title': article['title'],
+        'url': article['url'],
+        'pmid': article['pmid']
+    }
 
-def extract_risk_description(title, abstract):
+def index_articles(articles, rows, csv_file='papers.csv'):
     """
-    タイトルと抄録からリスク記述を抽出します。
+    CSVに保存した論文（rows）を、抄録・MeSH用語を含む論文詳細（articles）で全文検索索引に追加します。
+    
+    索引の更新に失敗した場合は例外を送出します（CSVへの保存は取り消しません。
+    索引にない論文は、次の検索時にCSVの項目だけで索引されます）。
+    別版で置き換えた行（upsert_rows() を参照）の元の論文は索引から取り除きます。
     """
-    if not abstract:
-        return title
+    from paper_store import REPLACED_PMID_KEY
+    from search_index import get_search_index
+    saved = {str(row['pmid']) for row in rows if row.get('pmid')}
+    replaced = [row[REPLACED_PMID_KEY] for row in rows if row.get(REPLACED_PMID_KEY)]
+    index = get_search_index(csv_file)
+    if replaced:
+        index.remove_documents(replaced)
+    index.add_documents([article for article in articles if str(article['pmid']) in saved])
+
+def remove_retracted_papers(pmids, csv_file='papers.csv'):
+    """
+    撤回された論文を論文CSVから取り除き、検索用のデータベースと全文検索索引にも反映します。
     
-    # 抄録から数値と関連する記述を探す
-    risk_patterns = [
-        r'(\d+\.?\d*)%\s+(?:increase|higher|greater|elevated)\s+risk',
-        r'risk\s+(?:increased|higher|greater|elevated)\s+by\s+(\d+\.?\d*)%',
-        r'odds\s+ratio\s+(?:of|was|=)\s+(\d+\.?\d*)',
-        r'(?:relative|absolute)\s+risk\s+(?:of|was|=)\s+(\d+\.?\d*)',
-        r'hazard\s+ratio\s+(?:of|was|=)\s+(\d+\.?\d*)'
-    ]
-    
-    for pattern in risk_patterns:
-        matches = re.search(pattern, abstract, re.IGNORECASE)
-        if matches:
-            try:
-                risk_value = float(matches.group(1))
-                context_start = max(0, matches.start() - 50)
-                context_end = min(len(abstract), matches.end() + 50)
-                risk_context = abstract[context_start:context_end].strip()
-                return f"{risk_value:.1f}%上昇 ({risk_context}...)"
-            except (IndexError, ValueError):
-                continue
+    Parameters:
+    -----------
+    pmids : iterable of str
+        撤回された論文のPMID（登録されていないものは無視します）
+    csv_file : str
+        論文CSVのパス
     
-    # リスク表現が見つからない場合は、タイトルを簡易的な記述として返す
-    if len(title) > 100:
-        return title[:100] + "..."
-    return title
+    Returns:
+    --------
+    int
+        取り除いた論文数
+    """
+    from paper_store import get_paper_store
+    from evidence_db import get_evidence_db, data_version
+    from search_index import get_search_index
+    version_before = data_version(csv_file)
+    removed = get_paper_store(csv_file).remove_rows(pmids)
+    if removed:
+        get_evidence_db(csv_file).record_remove(removed, version_before, data_version(csv_file))
+        get_search_index(csv_file).remove_documents(removed)
+        print(f"撤回された論文 {len(removed)}件を論文CSVから取り除きました")
+    return len(removed)
 
 def update_papers_csv(new_articles, csv_file='papers.csv'):
     """
-    新しい論文データをCSVファイルに追加または更新します。
+    新しい論文データをCSVファイルに追加します。
+    
+    PMIDまたはDOI（表記を正規化したもの）が登録済みの論文は追加しません。
+    タイトルと著者がほぼ同じ論文（プレプリントと出版版など。dedup を参照）が
+    登録済みの場合は、DOI・PMIDを持ち出版年が新しい方を残します（登録済みの行が
+    古い版であればその行を置き換え、そうでなければ追加しません）。
+    新しい行はCSVの末尾に追記するだけで、古い版の置き換えがない限り既存の行の
+    書き直しは行いません（paper_store の upsert_rows() を参照）。
+    変更した行は検索用のデータベース（evidence_db）と、抄録・MeSH用語を含めて
+    全文検索索引（search_index）にも反映します。
+    撤回された論文と撤回告知は追加せず、撤回された論文が登録済みであれば
+    取り除きます（remove_retracted_papers()）。
+    
+    Parameters:
+    -----------
+    new_articles : list of dict
+        get_pubmed_article_details() などが返す論文詳細のリスト
+    csv_file : str
+        論文CSVのパス
+    
+    Returns:
+    --------
+    int
+        新たに追加した論文数（古い版を置き換えた論文を含む）
+    
+    Raises:
+    -------
+    Exception
+        CSV・データベース・全文検索索引のいずれかの書き込みに失敗した場合
+        （呼び出し側で保存できなかったことを判断できるよう、例外はそのまま送出します）
     """
-    try:
-        # 既存のCSVを読み込むか、新しいデータフレームを作成
-        try:
-            existing_df = pd.read_csv(csv_file)
-            # DOIの列が存在するか確認
-            if 'doi' not in existing_df.columns:
-                existing_df['doi'] = "不明"
-        except (FileNotFoundError, pd.errors.EmptyDataError):
-            # 新しいデータフレームを作成
-            existing_df = pd.DataFrame(columns=[
-                'issue', 'risk_description', 'doi', 'publication_year', 
-                'study_type', 'sample_size', 'confidence_interval', 'age_group',
-                'evidence_level', 'authors', 'title'
-            ])
-        
-        # 新しい論文をデータフレームに変換
-        new_rows = []
-        for article in new_articles:
-            # サンプルサイズの整形
-            sample_size_str = str(article['sample_size']) if article['sample_size'] else "不明"
-            
-            # 信頼区間の整形
-            ci_str = article['confidence_interval'] if article['confidence_interval'] else "不明"
-            
-            # 歯列問題の分類
-            issue = classify_dental_issue(
-                article['title'], 
-                article['abstract'], 
-                article['keywords'], 
-                article['mesh_terms']
-            )
-            
-            # リスク記述の抽出
-            risk_description = extract_risk_description(article['title'], article['abstract'])
-            
-            # エビデンスレベルの取得
-            evidence_level = map_study_type_to_evidence_level(article['study_type'])
-            
-            # 既存データにDOIがある場合は重複を避ける
-            if 'doi' in existing_df.columns and article['doi'] in existing_df['doi'].values:
-                continue
-            
-            # 新しい行を追加
-            new_rows.append({
-                'issue': issue,
-                'risk_description': risk_description,
-                'doi': article['doi'],
-                'publication_year': article['publication_year'],
-                'study_type': article['study_type'],
-                'sample_size': sample_size_str,
-                'confidence_interval': ci_str,
-                'age_group': article['age_group'],
-                'evidence_level': evidence_level,
-                'authors': article['authors'],
-                'title': article['title'],
-                'url': article['url']
-            })
-        
-        # 新しいデータがある場合のみ処理
-        if new_rows:
-            new_df = pd.DataFrame(new_rows)
-            # 既存のデータと新しいデータを連結
-            updated_df = pd.concat([existing_df, new_df], ignore_index=True)
-            # CSVに保存
-            updated_df.to_csv(csv_file, index=False)
-            return updated_df
-        
-        return existing_df
-        
-    except Exception as e:
-        print(f"CSVファイル更新エラー: {e}")
-        return pd.DataFrame()
+    from paper_store import get_paper_store
+    from evidence_db import get_evidence_db, data_version
+    from dedup import split_retractions
+    articles, retracted = split_retractions(new_articles)
+    store = get_paper_store(csv_file)
+    db = get_evidence_db(csv_file)
+    version_before = data_version(csv_file)
+    added, replaced = store.upsert_rows([build_paper_row(article) for article in articles],
+                                        update_existing=False)
+    if added or replaced:
+        db.record_upsert(added, replaced, version_before, data_version(csv_file))
+        index_articles(articles, added + replaced, csv_file)
+    if retracted:
+        remove_retracted_papers(retracted, csv_file)
+    return len(added) + len(replaced)
 
-def render_evidence_level_badge(evidence_level, study_type="", sample_size=""):
+def upsert_papers_csv(articles, csv_file='papers.csv'):
     """
-    エビデンスレベルを視覚的に表示するHTMLを生成します。
-    """
-    # エビデンスレベルによる色と説明のマッピング
-    level_colors = {
-        "1a": {"color": "#4CAF50", "bg": "#E8F5E9", "text": "メタ分析/システマティックレビュー"},
-        "1b": {"color": "#8BC34A", "bg": "#F1F8E9", "text": "ランダム化比較試験"},
-        "2a": {"color": "#FFC107", "bg": "#FFF8E1", "text": "コホート研究"},
-        "2b": {"color": "#FF9800", "bg": "#FFF3E0", "text": "症例対照研究/臨床試験"},
-        "3": {"color": "#FF5722", "bg": "#FBE9E7", "text": "横断研究/実験研究"},
-        "4": {"color": "#F44336", "bg": "#FFEBEE", "text": "症例報告/症例シリーズ"},
-        "5": {"color": "#9E9E9E", "bg": "#F5F5F5", "text": "専門家意見/不明"}
-    }
+    論文データをCSVファイルに追加し、登録済みの論文は最新の内容で上書きします。
     
-    level_info = level_colors.get(evidence_level, level_colors["5"])
+    差分同期で更新（mdat）が検出された論文の反映に使います。PMIDが登録済みで
+    内容が変わった行だけを書き直し（paper_store の upsert_rows() を参照）、
+    未登録の論文は update_papers_csv() と同じく末尾に追記します（重複の判定、
+    古い版の置き換えと撤回された論文の扱いも同じです）。
+    検索用のデータベース（evidence_db）と全文検索索引（search_index）にも同じ変更を反映します。
     
-    # サンプルサイズの表示形式
-    sample_display = f"n={sample_size}" if sample_size and sample_size != "不明" else ""
+    Parameters:
+    -----------
+    articles : list of dict
+        get_pubmed_article_details() などが返す論文詳細のリスト
+    csv_file : str
+        論文CSVのパス
     
-    # 研究タイプの表示形式
-    study_display = study_type.replace('-', ' ').title() if study_type else ""
+    Returns:
+    --------
+    tuple
+        (新たに追加した論文数, 上書きした論文数)
     
-    # HTMLコード生成
-    html = f"""
-    <div style="border-left: 4px solid {level_info['color']};
-                padding: 8px;
-                margin: 5px 0;
-                background-color: {level_info['bg']};
-                border-radius: 4px;">
-        <div style="font-weight: bold; color: {level_info['color']};">
-            エビデンスレベル {evidence_level}: {level_info['text']}
-        </div>
-        <div style="font-size: 0.85em; color: #555;">
-            {study_display} {sample_display}
-        </div>
-    </div>
+    Raises:
+    -------
+    Exception
+        CSV・データベース・全文検索索引のいずれかの書き込みに失敗した場合
+        （差分同期が同期日を進めないよう、例外はそのまま送出します）
     """
-    
-    return html
\ No newline at end of file
+    from paper_store import get_paper_store
+    from evidence_db import get_evidence_db, data_version
+    from dedup import split_retractions
+    articles, retracted = split_retractions(articles)
+    store = get_paper_store(csv_file)
+    db = get_evidence_db(csv_file)
+    version_before = data_version(csv_file)
+    added, updated = store.upsert_rows([build_paper_row(article) for article in articles])
+    if added or updated:
+        db.record_upsert(added, updated, version_before, data_version(csv_file))
+        index_articles(articles, added + updated, csv_file)
+    if retracted:
+        remove_retracted_papers(retracted, csv_file)
+    return len(added), len(updated)
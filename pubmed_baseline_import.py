@@ -0,0 +1,204 @@
+import argparse
+import gzip
+import os
+import re
+import sys
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 親ディレクトリへのパスを追加
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pubmed_api import (
+    iter_parse_pubmed_articles,
+    is_orthodontic_article,
+    enrich_article,
+    upsert_papers_csv,
+    ORTHO_MESH_TERM,
+    ORTHO_TEXT_WORD
+)
+from evidence_db import EvidenceDB
+
+# PubMedのベースライン・更新ファイルの拡張子
+PUBMED_FILE_SUFFIXES = ('.xml.gz', '.xml')
+
+# 展開後のXMLを読み込む単位（バイト）
+READ_BLOCK_BYTES = 1024 * 1024
+
+# 論文1件（PubmedArticle 要素）の開始・終了タグ（開始タグは PubmedArticleSet と区別する）
+_ARTICLE_START_PATTERN = re.compile(rb'<PubmedArticle[\s>]')
+_ARTICLE_END_TAG = b'</PubmedArticle>'
+
+# 更新ファイルの削除指示（DeleteCitation）とその中のPMID
+_DELETE_CITATION_PATTERN = re.compile(rb'<DeleteCitation>(.*?)</DeleteCitation>', re.DOTALL)
+_PMID_TAG_PATTERN = re.compile(rb'<PMID[\s>]')
+
+# 矯正歯科の条件に当てはまる論文が必ず含む語（小文字）。含まない論文はXMLとして解析しない
+_PREFILTER_NEEDLES = (ORTHO_MESH_TERM.encode('ascii'), ORTHO_TEXT_WORD.encode('ascii'))
+
+def find_pubmed_files(paths):
+    """
+    指定したファイルと、ディレクトリ内のPubMed XMLファイル（.xml.gz / .xml）をファイル名の順に返します。
+
+    ベースライン（pubmed25n0001.xml.gz …）と更新ファイルは通し番号の順に
+    適用する必要があるため、ディレクトリをまたいでもファイル名の順に並べます。
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path)
+                         if name.endswith(PUBMED_FILE_SUFFIXES))
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.basename)
+
+def screen_pubmed_file(path):
+    """
+    PubMed XMLファイル1つから矯正歯科の論文だけを取り出し、分類して返します（ワーカープロセスで実行）。
+
+    gzip を展開しながら READ_BLOCK_BYTES ずつ読み、論文（PubmedArticle 要素）ごとの
+    バイト列に区切ります。条件の語を含まない論文（ほぼすべて）はXMLとして解析せずに
+    読み飛ばし、残りだけを iter_parse_pubmed_articles() で解析して is_orthodontic_article()
+    （fetch_pubmed_studies() の検索式と同じ条件）で判定・分類します。
+    ファイル全体を展開・保持しないため、メモリ使用量は該当論文の分に収まります。
+
+    Returns:
+    --------
+    tuple
+        (ファイルパス, 該当論文のリスト, 件数の辞書, エラーメッセージ（成功時は None）)
+    """
+    counts = {'articles': 0, 'matched': 0, 'deleted': 0}
+    try:
+        candidates = []
+        buffer = b''
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            while True:
+                block = f.read(READ_BLOCK_BYTES)
+                buffer += block
+                position = 0
+                while True:
+                    end = buffer.find(_ARTICLE_END_TAG, position)
+                    if end < 0:
+                        break
+                    end += len(_ARTICLE_END_TAG)
+                    start = _ARTICLE_START_PATTERN.search(buffer, position, end)
+                    if start is not None:
+                        record = buffer[start.start():end]
+                        counts['articles'] += 1
+                        lowered = record.lower()
+                        if any(needle in lowered for needle in _PREFILTER_NEEDLES):
+                            candidates.append(record)
+                    position = end
+                # 区切れなかった残り（書きかけの論文や削除指示）は次のブロックに持ち越す
+                buffer = buffer[position:]
+                if not block:
+                    break
+
+        for deleted in _DELETE_CITATION_PATTERN.findall(buffer):
+            counts['deleted'] += len(_PMID_TAG_PATTERN.findall(deleted))
+
+        document = b'<PubmedArticleSet>' + b'\n'.join(candidates) + b'</PubmedArticleSet>'
+        articles = [enrich_article(article)
+                    for article in iter_parse_pubmed_articles(document, is_orthodontic_article)]
+        counts['matched'] = len(articles)
+        return path, articles, counts, None
+    except Exception as e:
+        return path, [], counts, str(e)
+
+def import_pubmed_files(paths, csv_file='papers.csv', processes=None):
+    """
+    PubMedのベースライン・更新ファイルから矯正歯科の論文を論文CSVに取り込みます。
+
+    ネットワークは使いません。ファイルの解析・絞り込み・分類は複数プロセスで
+    並行して行い、論文CSVへの書き込みはメインプロセスだけがファイル名の順に行います。
+    同時に処理するファイルはプロセス数の2倍までに抑えます。
+
+    登録済みのPMIDは内容が変わっていれば上書きするため（upsert_papers_csv()）、
+    更新ファイルに含まれる改訂版もそのまま反映できます。更新ファイルの削除指示
+    （DeleteCitation）は論文CSVには反映せず、件数だけを表示します。
+
+    Parameters:
+    -----------
+    paths : list of str
+        PubMed XMLファイル（.xml.gz / .xml）またはそれを含むディレクトリ
+    csv_file : str
+        論文CSVのパス
+    processes : int or None
+        使用するプロセス数（None の場合はCPU数）
+
+    Returns:
+    --------
+    int
+        新たに追加した論文数
+    """
+    files = find_pubmed_files(paths)
+    if not files:
+        print("取り込むファイルが見つかりません（.xml.gz / .xml）")
+        return 0
+
+    # 検索用データベースの取り込みは事前に1度だけ行う
+    EvidenceDB(csv_file).close()
+
+    print(f"開始: {len(files)}個のファイルから矯正歯科の論文を取り込みます")
+    start_time = time.time()
+    totals = {'articles': 0, 'matched': 0, 'deleted': 0, 'added': 0, 'updated': 0}
+    failures = []
+
+    window = (processes or os.cpu_count() or 1) * 2
+    remaining = iter(files)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = deque(executor.submit(screen_pubmed_file, path) for path in islice(remaining, window))
+        done = 0
+        while futures:
+            path, articles, counts, error = futures.popleft().result()
+            # 1つ受け取るごとに次のファイルを投入する（結果はファイル名の順に受け取る）
+            next_path = next(remaining, None)
+            if next_path is not None:
+                futures.append(executor.submit(screen_pubmed_file, next_path))
+
+            done += 1
+            if error:
+                failures.append((path, error))
+                print(f"  [{done}/{len(files)}] {os.path.basename(path)}: エラーが発生しました: {error}")
+                continue
+
+            try:
+                added, updated = upsert_papers_csv(articles, csv_file) if articles else (0, 0)
+            except Exception as e:
+                failures.append((path, str(e)))
+                print(f"  [{done}/{len(files)}] {os.path.basename(path)}: 保存中にエラーが発生しました: {e}")
+                continue
+            for key in ('articles', 'matched', 'deleted'):
+                totals[key] += counts[key]
+            totals['added'] += added
+            totals['updated'] += updated
+
+            elapsed = time.time() - start_time
+            print(f"  [{done}/{len(files)}] {os.path.basename(path)}: {counts['articles']}件中"
+                  f"{counts['matched']}件が該当, 追加{added}件, 更新{updated}件 "
+                  f"({totals['articles'] / elapsed:.0f}件/秒)")
+
+    for path, error in failures:
+        print(f"  {path}: エラーが発生しました: {error}")
+    print(f"\n完了: 解析 {totals['articles']}件, 該当 {totals['matched']}件, "
+          f"追加 {totals['added']}件, 更新 {totals['updated']}件, エラー {len(failures)}ファイル "
+          f"({time.time() - start_time:.1f}秒)")
+    if totals['deleted']:
+        print(f"削除指示 {totals['deleted']}件は論文CSVに反映していません")
+    return totals['added']
+
+if __name__ == "__main__":
+    # コマンドライン引数の解析
+    parser = argparse.ArgumentParser(
+        description='PubMedのベースライン・更新ファイル（.xml.gz）から矯正歯科の論文を取り込みます（ネットワーク不要）')
+    parser.add_argument('paths', nargs='+', help='PubMed XMLファイル（.xml.gz / .xml）またはディレクトリ')
+    parser.add_argument('--papers', type=str, default='papers.csv', help='論文CSVのパス')
+    parser.add_argument('--processes', type=int, default=None, help='使用するプロセス数（省略時はCPU数）')
+
+    args = parser.parse_args()
+
+    import_pubmed_files(args.paths, csv_file=args.papers, processes=args.processes)
@@ -0,0 +1,245 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# 検索結果（esearch）の有効期間（秒）。新しい論文が反映されるよう短めにする
+SEARCH_TTL_SECONDS = 6 * 60 * 60
+
+# 論文レコード（efetch、PMIDごと）の有効期間（秒）。公開後の変更はまれなため長めにする
+RECORD_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# キャッシュファイル全体の既定の上限（圧縮後のバイト数）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# 上限を超えたときは、この割合まで古いものから削除する（削除の頻度を抑える）
+EVICT_TARGET_RATIO = 0.9
+
+# キーの種類
+SEARCH_KIND = 'esearch'
+RECORD_KIND = 'efetch'
+
+class PubMedCache:
+    """
+    E-utilities の応答をディスクに保存するキャッシュ（SQLite、値はzlib圧縮）。
+
+    検索結果（esearch）は検索条件ごとに短い有効期間で、論文レコード（efetch）は
+    PMIDごとに長い有効期間で保持します。アプリの再起動後やバッチ処理の
+    再実行でも同じ検索・同じPMIDはNCBIに問い合わせずに返せます。
+
+    圧縮後の合計サイズが上限を超えると、最後に使われた時刻が古いものから削除します。
+    合計サイズは保存・削除のたびに同じトランザクションで更新する集計行（cache_size）に
+    保持するため、保存のたびに全件を集計し直すことはありません。
+    オフラインモードではネットワークを使わず、有効期間を過ぎたものも含めて
+    キャッシュにある応答だけを返します（呼び出し側が offline を参照して判断します）。
+
+    複数のプロセス（アプリとバッチ処理など）から同じファイルを共有できます。
+    接続はスレッド間で共有し、操作はロックで直列化します。
+
+    Parameters:
+    -----------
+    db_file : str
+        キャッシュファイル（SQLite）のパス
+    max_bytes : int
+        圧縮後の合計サイズの上限（バイト）
+    search_ttl, record_ttl : float
+        検索結果・論文レコードの有効期間（秒）
+    offline : bool
+        オフラインモード（キャッシュにある応答だけを使う）
+    """
+
+    def __init__(self, db_file='pubmed_cache.db', max_bytes=DEFAULT_MAX_BYTES,
+                 search_ttl=SEARCH_TTL_SECONDS, record_ttl=RECORD_TTL_SECONDS, offline=False):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self.ttl = {SEARCH_KIND: search_ttl, RECORD_KIND: record_ttl}
+        self.offline = offline
+        self._lock = threading.RLock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            # 他のプロセスの書き込み中も読み出せるようにする
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, kind TEXT, value BLOB, size INTEGER, created REAL, accessed REAL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed)')
+            # 圧縮後の合計サイズ（集計行がない古いファイルでは、ここで1度だけ集計する）
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER)')
+            self._conn.execute(
+                'INSERT OR IGNORE INTO cache_size SELECT 0, COALESCE(SUM(size), 0) FROM responses'
+            )
+
+    @staticmethod
+    def search_key(params):
+        """
+        esearch のパラメータからキーを作成します（APIキーは含めない）。
+        """
+        params = {name: str(value) for name, value in params.items() if name != 'api_key'}
+        return SEARCH_KIND + ':' + json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+    # ------------------------------------------------------------------
+    # 読み書き
+
+    def _get_many(self, kind, keys):
+        # 有効な値を {key: bytes} で返し、最終使用時刻を更新する
+        if not keys:
+            return {}
+        now = time.time()
+        min_created = 0 if self.offline else now - self.ttl[kind]
+        found = {}
+        with self._lock:
+            # SQLiteの変数の上限を超えないよう分割して問い合わせる
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value, created FROM responses WHERE key IN ({', '.join('?' for _ in chunk)})",
+                    chunk
+                ).fetchall()
+                for key, value, created in rows:
+                    if created >= min_created:
+                        found[key] = zlib.decompress(value)
+                    else:
+                        self._stats['expired'] += 1
+            if found:
+                with self._conn:
+                    self._conn.executemany('UPDATE responses SET accessed = ? WHERE key = ?',
+                                           [(now, key) for key in found])
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(keys) - len(found)
+        return found
+
+    def _put_many(self, kind, items):
+        # {key: bytes} を圧縮して保存し、上限を超えていれば古いものから削除する
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, data in items.items():
+            value = zlib.compress(data, 6)
+            rows.append((key, kind, value, len(value), now, now))
+        keys = list(items)
+        with self._lock, self._conn:
+            # 置き換える行のサイズを読んでから書き込むまでを、他のプロセスの書き込みと排他する
+            self._conn.execute('BEGIN IMMEDIATE')
+            replaced = 0
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM responses WHERE key IN ({', '.join('?' for _ in chunk)})",
+                    chunk
+                ).fetchone()[0]
+            self._conn.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._conn.execute('UPDATE cache_size SET bytes = bytes + ? WHERE id = 0',
+                               (sum(row[3] for row in rows) - replaced,))
+            self._evict()
+
+    def _total_bytes(self):
+        return self._conn.execute('SELECT bytes FROM cache_size WHERE id = 0').fetchone()[0]
+
+    def _evict(self):
+        # 書き込みのトランザクションの中で呼ぶ
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            if total - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', victims)
+        self._conn.execute('UPDATE cache_size SET bytes = bytes - ? WHERE id = 0', (freed,))
+        self._stats['evictions'] += len(victims)
+
+    # ------------------------------------------------------------------
+    # 公開API
+
+    def get_search(self, params):
+        """
+        キャッシュ済みの esearch 結果（JSONの辞書）を返します（ない場合は None）。
+        """
+        key = self.search_key(params)
+        data = self._get_many(SEARCH_KIND, [key]).get(key)
+        return json.loads(data) if data is not None else None
+
+    def put_search(self, params, result):
+        """
+        esearch 結果（JSONの辞書）を保存します。
+        """
+        self._put_many(SEARCH_KIND, {self.search_key(params): json.dumps(result).encode('utf-8')})
+
+    def get_records(self, pmids):
+        """
+        キャッシュ済みの論文レコード（PubmedArticle 要素のXML）を {PMID: bytes} で返します。
+        """
+        found = self._get_many(RECORD_KIND, [f'{RECORD_KIND}:{pmid}' for pmid in pmids])
+        return {key.split(':', 1)[1]: data for key, data in found.items()}
+
+    def put_records(self, records):
+        """
+        論文レコードを保存します。
+
+        Parameters:
+        -----------
+        records : dict
+            {PMID: PubmedArticle 要素のXML（bytes）}
+        """
+        self._put_many(RECORD_KIND, {f'{RECORD_KIND}:{pmid}': data for pmid, data in records.items()})
+
+    def stats(self):
+        """
+        ヒット・ミス・期限切れ・削除の回数と、件数・圧縮後の合計サイズを返します。
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            entries = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            size = self._total_bytes()
+        stats.update({'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes, 'offline': self.offline})
+        return stats
+
+    def clear(self):
+        """
+        保存している応答をすべて削除します。
+        """
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.execute('UPDATE cache_size SET bytes = 0 WHERE id = 0')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_pubmed_cache():
+    """
+    プロセス全体で共有する PubMedCache を返します。
+
+    環境変数で設定を変更できます:
+    PUBMED_CACHE_FILE（キャッシュファイル、既定は pubmed_cache.db）、
+    PUBMED_CACHE_MAX_MB（上限サイズ）、PUBMED_OFFLINE（1 でオフラインモード）
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PubMedCache(
+                os.environ.get("PUBMED_CACHE_FILE", "pubmed_cache.db"),
+                max_bytes=int(float(os.environ.get("PUBMED_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+                offline=os.environ.get("PUBMED_OFFLINE", "") not in ("", "0")
+            )
+        return _cache
+
+def set_pubmed_cache(cache):
+    """
+    共有キャッシュを差し替えます（検証用の一時ファイルを使う場合など）。
+    """
+    global _cache
+    with _cache_lock:
+        _cache = cache
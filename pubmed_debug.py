@@ -1,8 +1,8 @@
 import requests
 import json
-import pandas as pd
 import streamlit as st
-from pubmed_api import fetch_pubmed_studies, get_pubmed_article_details, update_papers_csv
+from pubmed_api import fetch_pubmed_studies, get_pubmed_article_details, update_papers_csv, get_pubmed_client
+from evidence_db import get_evidence_db
 
 def test_pubmed_connection():
     """
@@ -10,9 +10,7 @@ def test_pubmed_connection():
     """
     try:
         # 基本的なAPIエンドポイントへの接続テスト
-        url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/einfo.fcgi?retmode=json"
-        response = requests.get(url)
-        response.raise_for_status()
+        response = get_pubmed_client().get('einfo.fcgi', {'retmode': 'json'})
         
         # レスポンスが有効なJSONかチェック
         result = response.json()
@@ -163,25 +161,23 @@ def display_debug_ui():
     
     with st.expander("3. 論文データベース確認", expanded=True):
         try:
-            papers_df = pd.read_csv('papers.csv')
+            evidence_db = get_evidence_db('papers.csv')
             st.write(f"**現在のデータベース統計**")
-            st.write(f"- 総論文数: {len(papers_df)}")
+            st.write(f"- 総論文数: {evidence_db.count()}")
             
             # 問題別の分布
-            if 'issue' in papers_df.columns:
-                issue_counts = papers_df['issue'].value_counts()
-                st.write("**問題別の論文数:**")
-                st.bar_chart(issue_counts)
+            issue_counts = evidence_db.value_counts('issue')
+            st.write("**問題別の論文数:**")
+            st.bar_chart(issue_counts)
             
             # エビデンスレベル分布
-            if 'evidence_level' in papers_df.columns:
-                evidence_counts = papers_df['evidence_level'].value_counts()
-                st.write("**エビデンスレベル分布:**")
-                st.bar_chart(evidence_counts)
+            evidence_counts = evidence_db.value_counts('evidence_level')
+            st.write("**エビデンスレベル分布:**")
+            st.bar_chart(evidence_counts)
             
             # データベースプレビュー
             with st.expander("データベース内容プレビュー"):
-                st.dataframe(papers_df)
+                st.dataframe(evidence_db.query_papers())
         except Exception as e:
             st.error(f"論文データベース読み込みエラー: {str(e)}")
 
@@ -0,0 +1,93 @@
+import json
+import threading
+from datetime import date
+from paper_store import atomic_write
+
+STATE_VERSION = 1
+
+# PubMedの日付の形式（esearch の mindate / maxdate）
+PUBMED_DATE_FORMAT = '%Y/%m/%d'
+
+def format_pubmed_date(day):
+    """
+    date を PubMed の日付文字列（YYYY/MM/DD）に変換します。
+    """
+    return day.strftime(PUBMED_DATE_FORMAT)
+
+class SyncState:
+    """
+    差分同期の状態（キーワードごとの最終同期日と、その日に取得したPMID）。
+
+    次回の同期では最終同期日から当日までに追加・更新（mdat）された論文だけを検索します。
+    PubMedの更新日は日単位のため、最終同期日も含めて検索します（境界の日の論文は
+    もう一度取得しますが、内容が同じであれば保存時に書き直されません）。
+    同じ日に再実行した場合は、その日に取得済みのPMIDは取得し直しません。
+
+    状態はJSONファイルに保存し、一時ファイル＋rename で原子的に更新します。
+    ファイルがない・壊れている場合は、すべてのキーワードを未同期として扱います。
+
+    Parameters:
+    -----------
+    state_file : str
+        状態ファイル（JSON）のパス
+    """
+
+    def __init__(self, state_file='pubmed_sync.json'):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._keywords = {}
+        try:
+            with open(state_file, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == STATE_VERSION:
+                self._keywords = state.get('keywords', {})
+        except (FileNotFoundError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"同期状態の読み込みエラー（全件を取得し直します）: {e}")
+
+    def get(self, keyword):
+        """
+        キーワードの同期状態（'last_sync', 'last_pmids'）を返します（未同期の場合は None）。
+        """
+        with self._lock:
+            entry = self._keywords.get(keyword)
+            return dict(entry) if entry is not None else None
+
+    def fetched_today(self, keyword, today=None):
+        """
+        同じ日の前回までの実行で取得済みのPMIDの集合を返します（別の日の場合は空）。
+        """
+        entry = self.get(keyword)
+        if entry is None or entry['last_sync'] != format_pubmed_date(today or date.today()):
+            return set()
+        return set(entry['last_pmids'])
+
+    def search_window(self, keyword, today=None):
+        """
+        差分検索に使う更新日の範囲 (mindate, maxdate) を返します（未同期の場合は None）。
+        """
+        entry = self.get(keyword)
+        if entry is None:
+            return None
+        today = today or date.today()
+        return entry['last_sync'], format_pubmed_date(today)
+
+    def update(self, keyword, pmids, today=None):
+        """
+        キーワードの最終同期日を today（省略時は当日）にし、取得したPMIDを記録します
+        （同じ日の再実行では前回までの分に加えます）。保存は save() で行います。
+        """
+        pmids = set(pmids) | self.fetched_today(keyword, today)
+        with self._lock:
+            self._keywords[keyword] = {
+                'last_sync': format_pubmed_date(today or date.today()),
+                'last_pmids': sorted(pmids)
+            }
+
+    def save(self):
+        """
+        状態をファイルに保存します。
+        """
+        with self._lock:
+            state = {'version': STATE_VERSION, 'keywords': self._keywords}
+            atomic_write(self.state_file, lambda f: json.dump(state, f, ensure_ascii=False, indent=1))
@@ -0,0 +1,477 @@
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+import numpy as np
+import pandas as pd
+from paper_store import FileLock, atomic_write, get_paper_store
+from evidence_db import get_evidence_db, data_version
+
+INDEX_VERSION = 1
+
+# BM25のパラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 索引する項目と重み（タイトルの語は本文の2語分として数える）
+FIELD_WEIGHTS = {'title': 2, 'abstract': 1, 'mesh_terms': 1, 'keywords': 1, 'issue': 1, 'risk_description': 1}
+
+# 値がないことを表す文字列（pubmed_api が設定するもの）は索引しない
+MISSING_VALUES = frozenset(['タイトル不明', '抄録なし', 'MeSH用語なし', 'キーワードなし', '不明'])
+
+# 日本語の文字列を分割する文字数（None の場合は連続する日本語の文字列全体を1語とする）
+DEFAULT_NGRAM = 2
+
+# 差分（ログ）の論文数が本体のこの割合（最低 COMPACT_MIN_DOCS 件）を超えたら本体に統合する
+COMPACT_RATIO = 0.25
+COMPACT_MIN_DOCS = 5000
+
+# 出現頻度が高く検索の役に立たない英単語
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the these this those to was were which
+with we our than not no between after before during
+""".split())
+
+# 英数字の単語と、日本語（ひらがな・カタカナ・漢字）の連続
+_TOKEN_PATTERN = re.compile(r'[0-9a-z]+|[\u3041-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+def tokenize(text, ngram=DEFAULT_NGRAM):
+    """
+    検索用に文字列を語に分割します。
+
+    NFKC正規化と小文字化のあと、英数字は単語ごと（STOPWORDS を除く）、日本語は
+    ngram 文字ずつずらした部分文字列（「叢生のリスク」→「叢生」「生の」「のリ」「リス」「スク」）を1語とします。
+    日本語は単語の区切りがないため、文書と検索語を同じ方法で分割して一致させます。
+    """
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(unicodedata.normalize('NFKC', text).lower()):
+        if word.isascii():
+            if word not in STOPWORDS:
+                tokens.append(word)
+        elif ngram is None or len(word) <= ngram:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + ngram] for i in range(len(word) - ngram + 1))
+    return tokens
+
+def _encode_strings(strings):
+    # 文字列のリストを npz に保存できる uint8 配列にする（改行区切り）
+    return np.frombuffer('\n'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+def _decode_strings(data):
+    text = data.tobytes().decode('utf-8')
+    return text.split('\n') if text else []
+
+class SearchIndex:
+    """
+    論文のタイトル・抄録・MeSH用語・キーワード・歯列問題・リスク記述の全文検索索引（BM25）。
+
+    語ごとの出現リスト（転置索引）を numpy 配列で保持し、検索語の出現リストだけを
+    ベクトル演算でスコア計算するため、10万件以上の論文でも検索はミリ秒単位で終わります。
+
+    索引は2つのファイルに保存します。
+    - 本体（<csv>.search.npz）: 統合済みの転置索引（CSR形式）
+    - 差分（<csv>.search.log）: その後に追加した論文の語と出現回数（1行1件のJSON、追記のみ）
+
+    論文の追加は差分への追記だけで行い、差分が大きくなったら本体に統合して書き直します
+    （一時ファイル＋rename で原子的に置き換え）。同じPMIDの論文を追加すると、
+    古い方は削除済みとして扱い、統合時に取り除きます。
+
+    差分への追記と統合はロックファイル（<csv>.search.lock）で複数のプロセスの間でも
+    排他し、書き込む前に他のプロセスが追記した差分を反映します（アプリとバッチ処理が
+    同時に論文を追加しても、統合で他方の差分が失われないようにするため）。
+
+    論文CSVには抄録やMeSH用語を保存しないため、これらは update_papers_csv() などで
+    論文を追加したときに索引へ渡します。索引にない論文がCSVにある場合
+    （索引の作成前からある論文など）は、CSVの項目（タイトル・歯列問題・リスク記述）だけで索引します。
+
+    Parameters:
+    -----------
+    csv_file : str
+        論文CSVのパス
+    index_file : str or None
+        索引ファイルのパス（拡張子なし。省略時は CSVと同じ場所の <csv>.search）
+    ngram : int or None
+        日本語の文字列を分割する文字数（tokenize() を参照）
+    """
+
+    def __init__(self, csv_file='papers.csv', index_file=None, ngram=DEFAULT_NGRAM):
+        self.csv_file = csv_file
+        base = index_file or os.path.splitext(csv_file)[0] + '.search'
+        self.base_file = base + '.npz'
+        self.log_file = base + '.log'
+        self.ngram = ngram
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(base + '.lock')
+        self._base_stat = None
+        self._log_offset = 0
+        self._csv_version = None
+        with self._lock:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # 読み込み
+
+    def _file_stat(self, path):
+        try:
+            st = os.stat(path)
+            return (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _reset(self):
+        self._keys = []
+        self._doc_ids = {}
+        self._lengths = array('f')
+        self._live = bytearray()
+        self._live_count = 0
+        self._total_length = 0.0
+        self._terms = {}
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.uint32)
+        self._frequencies = np.zeros(0, dtype=np.uint16)
+        self._delta = {}
+        self._delta_docs = 0
+        self._log_offset = 0
+
+    def _load(self):
+        self._reset()
+        self._base_stat = self._file_stat(self.base_file)
+        if self._base_stat is not None:
+            try:
+                with np.load(self.base_file) as data:
+                    if int(data['version']) != INDEX_VERSION or _decode_strings(data['ngram']) != [str(self.ngram)]:
+                        raise ValueError("索引の形式が異なります")
+                    terms = _decode_strings(data['terms'])
+                    self._terms = dict(zip(terms, range(len(terms))))
+                    self._keys = _decode_strings(data['keys'])
+                    self._indptr = data['indptr']
+                    self._postings = data['postings']
+                    self._frequencies = data['frequencies']
+                    self._lengths = array('f', data['lengths'].tobytes())
+            except Exception as e:
+                # 読めない索引は作り直す（論文は CSVから取り込み直される）
+                print(f"検索索引の読み込みエラー（作り直します）: {e}")
+                self._reset()
+                self._base_stat = None
+            self._live = bytearray(b'\x01') * len(self._keys)
+            self._doc_ids = dict(zip(self._keys, range(len(self._keys))))
+            self._live_count = len(self._keys)
+            self._total_length = float(sum(self._lengths))
+        self._replay_log()
+
+    def _replay_log(self):
+        # 差分のうち、まだ反映していない行を反映する（書きかけの最終行は読まない）
+        try:
+            with open(self.log_file, 'rb') as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                if entry['terms'] is None:
+                    self._remove(entry['pmid'])
+                else:
+                    self._add(entry['pmid'], entry['terms'])
+        self._log_offset += end
+
+    def _refresh(self, sync_csv=True):
+        # 他のプロセスが索引を更新していれば読み直し、CSVにだけある論文を取り込む
+        if self._file_stat(self.base_file) != self._base_stat:
+            self._load()
+        else:
+            log_stat = self._file_stat(self.log_file)
+            log_size = log_stat[0] if log_stat else 0
+            if log_size < self._log_offset:
+                self._load()
+            elif log_size > self._log_offset:
+                self._replay_log()
+        if sync_csv:
+            version = data_version(self.csv_file)
+            if version != self._csv_version:
+                self._sync_from_csv()
+                self._csv_version = version
+
+    def _sync_from_csv(self):
+        with self._file_lock:
+            # 他のプロセスが抄録などを含めて索引した論文を、CSVの項目だけで上書きしない
+            self._refresh(sync_csv=False)
+            missing = get_paper_store(self.csv_file).pmids.difference(self._doc_ids)
+            if missing:
+                papers = get_evidence_db(self.csv_file).papers_by_pmid(missing)
+                self._write_documents(papers.to_dict('records'))
+
+    # ------------------------------------------------------------------
+    # 追加・統合
+
+    def _document_terms(self, document):
+        counts = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = document.get(field)
+            if not isinstance(value, str) or not value or value in MISSING_VALUES:
+                continue
+            for token in tokenize(value, self.ngram):
+                counts[token] += weight
+        return counts
+
+    def _remove(self, key):
+        old = self._doc_ids.get(key)
+        if old is not None and self._live[old]:
+            self._live[old] = 0
+            self._live_count -= 1
+            self._total_length -= self._lengths[old]
+
+    def _add(self, key, counts):
+        self._remove(key)
+        doc_id = len(self._keys)
+        length = float(sum(counts.values()))
+        self._keys.append(key)
+        self._doc_ids[key] = doc_id
+        self._lengths.append(length)
+        self._live.append(1)
+        self._live_count += 1
+        self._total_length += length
+        for term, frequency in counts.items():
+            entry = self._delta.get(term)
+            if entry is None:
+                entry = self._delta[term] = (array('I'), array('H'))
+            entry[0].append(doc_id)
+            entry[1].append(min(frequency, 65535))
+        self._delta_docs += 1
+
+    def _write_documents(self, documents):
+        with self._file_lock:
+            # 他のプロセスが追記した差分を先に反映してから追記する
+            self._refresh(sync_csv=False)
+            lines = []
+            for document in documents:
+                key = str(document.get('pmid') or '')
+                if not key:
+                    continue
+                counts = self._document_terms(document)
+                self._add(key, counts)
+                lines.append(json.dumps({'pmid': key, 'terms': counts}, ensure_ascii=False))
+            if not lines:
+                return
+            self._append_log(lines)
+            if self._delta_docs > max(COMPACT_MIN_DOCS, COMPACT_RATIO * (len(self._keys) - self._delta_docs)):
+                self.compact()
+
+    def _append_log(self, lines):
+        # ロックファイルを取得した状態で呼ぶ（書き込み後の長さまでを反映済みとする）
+        with open(self.log_file, 'ab') as f:
+            f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_offset = self._file_stat(self.log_file)[0]
+
+    def add_documents(self, documents):
+        """
+        論文を索引に追加します（同じPMIDの論文は置き換えます）。
+
+        Parameters:
+        -----------
+        documents : list of dict
+            'pmid' と、FIELD_WEIGHTS の項目（title, abstract, mesh_terms など）を持つ辞書
+            （get_pubmed_article_details() の論文詳細、または論文CSVの行）
+        """
+        with self._lock:
+            self._write_documents(documents)
+            # 追加した論文はCSVより先に索引済みなので、次の検索時の確認は差分だけになる
+            self._csv_version = None
+
+    def remove_documents(self, pmids):
+        """
+        論文を索引から取り除きます（論文CSVから取り除いた撤回論文など）。
+        """
+        with self._lock, self._file_lock:
+            self._refresh(sync_csv=False)
+            lines = []
+            for pmid in pmids:
+                self._remove(str(pmid))
+                lines.append(json.dumps({'pmid': str(pmid), 'terms': None}))
+            if lines:
+                self._append_log(lines)
+
+    def compact(self):
+        """
+        差分を本体に統合し、削除済みの論文を取り除いて本体を書き直します。
+
+        他のプロセスが追記した差分も反映してから統合します。
+        """
+        with self._lock, self._file_lock:
+            self._refresh(sync_csv=False)
+            live = np.frombuffer(bytes(self._live), dtype=np.uint8).astype(bool)
+            remap = np.full(len(self._keys), -1, dtype=np.int64)
+            remap[live] = np.arange(int(live.sum()))
+
+            # 本体と差分の (語ID, 論文ID, 出現回数) をまとめ、削除済みを除いて並べ直す
+            terms = dict(self._terms)
+            term_ids = [np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))]
+            postings = [self._postings.astype(np.int64)]
+            frequencies = [self._frequencies]
+            for term, (docs, freqs) in self._delta.items():
+                term_id = terms.setdefault(term, len(terms))
+                term_ids.append(np.full(len(docs), term_id, dtype=np.int64))
+                postings.append(np.frombuffer(docs, dtype=np.uint32).astype(np.int64))
+                frequencies.append(np.frombuffer(freqs, dtype=np.uint16))
+            term_ids = np.concatenate(term_ids)
+            postings = remap[np.concatenate(postings)]
+            frequencies = np.concatenate(frequencies)
+            keep = postings >= 0
+            term_ids, postings, frequencies = term_ids[keep], postings[keep], frequencies[keep]
+
+            # 出現する論文がなくなった語は取り除き、語IDを詰め直す
+            counts = np.bincount(term_ids, minlength=len(terms))
+            used = counts > 0
+            term_ids = (np.cumsum(used) - 1)[term_ids]
+            term_list = [term for term, is_used in zip(sorted(terms, key=terms.get), used) if is_used]
+            order = np.lexsort((postings, term_ids))
+
+            keys = [key for key, alive in zip(self._keys, self._live) if alive]
+            lengths = np.frombuffer(self._lengths, dtype=np.float32)[live]
+            indptr = np.zeros(len(term_list) + 1, dtype=np.int64)
+            np.cumsum(counts[used], out=indptr[1:])
+            arrays = {
+                'version': np.array(INDEX_VERSION),
+                'ngram': _encode_strings([str(self.ngram)]),
+                'terms': _encode_strings(term_list),
+                'keys': _encode_strings(keys),
+                'indptr': indptr,
+                'postings': postings[order].astype(np.uint32),
+                'frequencies': frequencies[order],
+                'lengths': lengths,
+            }
+            atomic_write(self.base_file, lambda f: np.savez(f, **arrays), binary=True)
+            # 本体に統合した差分は消す（本体の書き直しが確定してから）
+            with open(self.log_file, 'wb'):
+                pass
+            self._load()
+
+    # ------------------------------------------------------------------
+    # 検索
+
+    def _term_postings(self, term):
+        docs, freqs = [], []
+        term_id = self._terms.get(term)
+        if term_id is not None:
+            start, end = self._indptr[term_id], self._indptr[term_id + 1]
+            docs.append(self._postings[start:end])
+            freqs.append(self._frequencies[start:end])
+        entry = self._delta.get(term)
+        if entry is not None:
+            docs.append(np.frombuffer(entry[0], dtype=np.uint32))
+            freqs.append(np.frombuffer(entry[1], dtype=np.uint16))
+        if len(docs) == 1:
+            return docs[0], freqs[0]
+        if not docs:
+            return None, None
+        return np.concatenate(docs), np.concatenate(freqs)
+
+    def search(self, query, limit=20):
+        """
+        検索語に合う論文を、BM25のスコアが高い順に返します。
+
+        検索語は tokenize() で分割し、いずれかの語を含む論文を対象に、
+        含む語が多く、その語が少数の論文にしか現れないものほど高く評価します。
+
+        Parameters:
+        -----------
+        query : str
+            検索語（英語・日本語。スペース区切りで複数指定可）
+        limit : int
+            返す最大件数
+
+        Returns:
+        --------
+        list of tuple
+            (PMID, スコア) のリスト
+        """
+        with self._lock:
+            self._refresh()
+            terms = set(tokenize(query, self.ngram))
+            if not terms or not self._live_count:
+                return []
+
+            lengths = np.frombuffer(self._lengths, dtype=np.float32)
+            average_length = self._total_length / self._live_count
+            scores = np.zeros(len(self._keys), dtype=np.float32)
+            for term in terms:
+                docs, freqs = self._term_postings(term)
+                if docs is None:
+                    continue
+                idf = math.log(1 + (self._live_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                freqs = freqs.astype(np.float32)
+                norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / average_length)
+                scores[docs] += idf * freqs * (BM25_K1 + 1) / (freqs + norms)
+            scores *= np.frombuffer(bytes(self._live), dtype=np.uint8)
+
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            # スコアの高い順（同点は先に追加した論文から）
+            candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+            return [(self._keys[i], float(scores[i])) for i in candidates]
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return self._live_count
+
+    def stats(self):
+        """
+        索引の状態（論文数・語数・差分の論文数）を返します。
+        """
+        with self._lock:
+            self._refresh()
+            return {
+                'documents': self._live_count,
+                'terms': len(set(self._terms).union(self._delta)),
+                'postings': int(len(self._postings) + sum(len(docs) for docs, _ in self._delta.values())),
+                'pending_documents': self._delta_docs,
+            }
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_search_index(csv_file='papers.csv'):
+    """
+    論文CSVごとに共有する SearchIndex を返します。
+    """
+    key = os.path.abspath(csv_file)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = SearchIndex(csv_file)
+        return _indexes[key]
+
+def search_papers(query, csv_file='papers.csv', limit=20):
+    """
+    登録済みの論文を全文検索し、論文CSVの行をスコアの高い順に返します。
+
+    Parameters:
+    -----------
+    query : str
+        検索語
+    csv_file : str
+        論文CSVのパス
+    limit : int
+        返す最大件数
+
+    Returns:
+    --------
+    pandas.DataFrame
+        論文CSVと同じ列に、スコア（'score'）を加えたデータフレーム
+    """
+    results = get_search_index(csv_file).search(query, limit)
+    papers = get_evidence_db(csv_file).papers_by_pmid([pmid for pmid, _ in results])
+    scores = pd.Series(dict(results), name='score')
+    papers = papers[papers['pmid'].isin(scores.index)]
+    papers = papers.assign(score=papers['pmid'].map(scores).values)
+    return papers.sort_values('score', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,430 @@
+"""
+変更前（ベースライン）の app.py の HTMLレポート作成とダウンロードリンクの実装の写し。
+
+ortho_core.render のテストとベンチマーク（描画時間・ページの転送量）の比較対象に使います。
+関数の本体は変更前のコードのままです。変更前はモジュールの先頭で読み込んでいた
+論文データ（papers）と参照データは、set_papers() と参照データ（reference_data）から設定します。
+"""
+import base64
+from datetime import date
+
+from ortho_core.reference_data import get_reference_tables
+
+_tables = get_reference_tables()
+ortho_age_risks = _tables['ortho_age_risks']
+ortho_benefits = _tables['ortho_benefits']
+timing_benefits = _tables['timing_benefits']
+
+# 論文データ（変更前は papers.csv を pandas で読み込んだもの）
+papers = None
+
+
+def set_papers(frame):
+    global papers
+    papers = frame
+
+
+def generate_html_report(age, gender, issues, report_items, high_risks, necessity_score, economic_benefits, scenarios, show_recommendations=True, additional_notes=""):
+    today = date.today().strftime("%Y年%m月%d日")
+    
+    # リスクレベルに応じたスタイル
+    risk_styles = {
+        '🔴 高': 'color: #ff4444; font-weight: bold;',
+        '🟡 中': 'color: #ffbb33; font-weight: bold;',
+        '🟢 低': 'color: #00C851; font-weight: bold;'
+    }
+    
+    # 矯正必要性スコアの色を設定
+    if necessity_score["total_score"] >= 80:
+        score_color = "#ff4444"  # 赤（緊急）
+    elif necessity_score["total_score"] >= 60:
+        score_color = "#ff8800"  # オレンジ（高）
+    elif necessity_score["total_score"] >= 40:
+        score_color = "#ffbb33"  # 黄色（中）
+    else:
+        score_color = "#00C851"  # 緑（低）
+    
+    # HTMLヘッダー
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>歯科矯正評価レポート</title>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                line-height: 1.6;
+                color: #333;
+                max-width: 800px;
+                margin: 0 auto;
+                padding: 20px;
+            }}
+            h1, h2, h3 {{
+                color: #0066cc;
+                border-bottom: 1px solid #ddd;
+                padding-bottom: 5px;
+            }}
+            h1 {{
+                text-align: center;
+                border-bottom: 2px solid #0066cc;
+            }}
+            .header-info {{
+                text-align: center;
+                margin-bottom: 20px;
+            }}
+            .section {{
+                margin: 25px 0;
+                padding: 0 15px;
+            }}
+            .risk-item {{
+                margin: 10px 0;
+                padding: 10px;
+                border-left: 3px solid #ddd;
+            }}
+            .high-risk {{
+                background-color: #ffeeee;
+                border-left: 3px solid #ff4444;
+            }}
+            .warning {{
+                background-color: #fff3cd;
+                padding: 10px;
+                border-left: 4px solid #ffc107;
+                margin: 15px 0;
+            }}
+            .benefit {{
+                background-color: #e8f4f8;
+                padding: 10px;
+                border-left: 4px solid #0099cc;
+            }}
+            .necessity-score {{
+                text-align: center;
+                margin: 30px auto;
+                max-width: 400px;
+            }}
+            .score-display {{
+                font-size: 36px;
+                font-weight: bold;
+                color: white;
+                background-color: {score_color};
+                border-radius: 50%;
+                width: 120px;
+                height: 120px;
+                line-height: 120px;
+                margin: 0 auto;
+                text-align: center;
+            }}
+            .score-interpretation {{
+                margin-top: 15px;
+                font-weight: bold;
+                font-size: 18px;
+            }}
+            .score-details {{
+                display: flex;
+                justify-content: space-between;
+                margin-top: 20px;
+                text-align: center;
+            }}
+            .score-component {{
+                flex: 1;
+                padding: 10px;
+                border: 1px solid #ddd;
+                border-radius: 5px;
+                margin: 0 5px;
+            }}
+            .component-value {{
+                font-weight: bold;
+                font-size: 24px;
+                color: #0066cc;
+            }}
+            table {{
+                width: 100%;
+                border-collapse: collapse;
+                margin: 20px 0;
+            }}
+            th, td {{
+                padding: 8px;
+                text-align: left;
+                border-bottom: 1px solid #ddd;
+            }}
+            th {{
+                background-color: #f2f2f2;
+            }}
+            .comparison-table td {{
+                vertical-align: top;
+            }}
+            .comparison-table td:first-child {{
+                font-weight: bold;
+                width: 20%;
+            }}
+            .comparison-good {{
+                background-color: #e8f5e9;
+                border-left: 4px solid #4caf50;
+            }}
+            .comparison-bad {{
+                background-color: #ffebee;
+                border-left: 4px solid #f44336;
+            }}
+            .economic-benefit {{
+                display: flex;
+                flex-direction: column;
+                align-items: center;
+                margin: 30px 0;
+                padding: 20px;
+                background-color: #e8f5e9;
+                border-radius: 10px;
+            }}
+            .economic-numbers {{
+                display: flex;
+                justify-content: space-around;
+                width: 100%;
+                margin: 20px 0;
+            }}
+            .economic-item {{
+                text-align: center;
+                padding: 10px;
+            }}
+            .economic-value {{
+                font-size: 24px;
+                font-weight: bold;
+                color: #2e7d32;
+            }}
+            .economic-label {{
+                font-size: 14px;
+                color: #555;
+            }}
+            .footer {{
+                margin-top: 40px;
+                border-top: 1px solid #ddd;
+                padding-top: 10px;
+                font-size: 0.8em;
+                text-align: center;
+                color: #666;
+            }}
+            .evidence-badge {{
+                margin: 10px 0;
+                padding: 10px;
+                border-radius: 4px;
+                background-color: #f9f9f9;
+                border-left: 4px solid #0066cc;
+            }}
+            .evidence-level {{
+                font-weight: bold;
+                font-size: 14px;
+            }}
+            .evidence-type {{
+                font-size: 12px;
+                color: #666;
+            }}
+            @media print {{
+                body {{
+                    font-size: 12pt;
+                }}
+                .no-print {{
+                    display: none;
+                }}
+                h1, h2, h3 {{
+                    page-break-after: avoid;
+                }}
+                .section {{
+                    page-break-inside: avoid;
+                }}
+            }}
+        </style>
+    </head>
+    <body>
+        <h1>歯科矯正評価レポート</h1>
+        <div class="header-info">
+            <p><strong>生成日:</strong> {today}</p>
+            <p><strong>患者情報:</strong> {age}歳, {gender}</p>
+    """
+    
+    # 追加メモがあれば追加
+    if additional_notes:
+        html += f'<p><strong>特記事項:</strong> {additional_notes}</p>'
+    
+    html += '</div>'
+    
+    # 矯正必要性スコア（新規追加）
+    html += f'''
+    <div class="section">
+        <h2>矯正必要性スコア</h2>
+        <div class="necessity-score">
+            <div class="score-display">{necessity_score["total_score"]}</div>
+            <div class="score-interpretation">{necessity_score["interpretation"]}</div>
+            <div class="score-details">
+                <div class="score-component">
+                    <div class="component-value">{necessity_score["timing_score"]}</div>
+                    <div>タイミング<br>スコア</div>
+                </div>
+                <div class="score-component">
+                    <div class="component-value">{necessity_score["severity_score"]}</div>
+                    <div>問題重大度<br>スコア</div>
+                </div>
+                <div class="score-component">
+                    <div class="component-value">{necessity_score["risk_score"]}</div>
+                    <div>将来リスク<br>スコア</div>
+                </div>
+            </div>
+        </div>
+    </div>
+    '''
+    
+    # 高リスク項目のサマリー
+    if high_risks:
+        html += '''
+        <div class="section">
+            <h2>注意すべき高リスク項目</h2>
+        '''
+        for risk in high_risks:
+            html += f'<div class="risk-item high-risk">{risk}</div>'
+        html += '</div>'
+    
+    # 矯正タイミング評価
+    age_group_idx = min(len(timing_benefits) - 1, age // 13)
+    benefit_info = timing_benefits.iloc[age_group_idx]
+    
+    html += f'''
+    <div class="section">
+        <h2>矯正タイミング評価</h2>
+        <p><strong>現在の年齢グループ:</strong> {benefit_info['age_group']}</p>
+        <p><strong>推奨レベル:</strong> {benefit_info['recommendation_level']}</p>
+        <p><strong>メリット:</strong> {benefit_info['benefit']}</p>
+    '''
+    
+    # 患者の年齢に基づいたリスク評価
+    applicable_thresholds = ortho_age_risks[ortho_age_risks['age_threshold'] >= age]
+    if not applicable_thresholds.empty:
+        next_threshold = applicable_thresholds.iloc[0]
+        html += f'<div class="warning"><strong>⚠️ 矯正タイミング警告:</strong> {next_threshold["description"]}</div>'
+    
+    html += '</div>'
+    
+    # 経済的メリット（新規追加）
+    html += f'''
+    <div class="section">
+        <h2>歯列矯正の経済的メリット</h2>
+        <div class="economic-benefit">
+            <p>歯列矯正は健康への投資です。今矯正することで、生涯にわたって以下の経済的メリットが期待できます：</p>
+            <div class="economic-numbers">
+                <div class="economic-item">
+                    <div class="economic-value">¥{economic_benefits["current_cost"]:,}</div>
+                    <div class="economic-label">現在の矯正コスト</div>
+                </div>
+                <div class="economic-item">
+                    <div class="economic-value">¥{economic_benefits["future_savings"]:,}</div>
+                    <div class="economic-label">将来の医療費削減額</div>
+                </div>
+                <div class="economic-item">
+                    <div class="economic-value">¥{economic_benefits["net_benefit"]:,}</div>
+                    <div class="economic-label">生涯の純節約額</div>
+                </div>
+            </div>
+            <p><strong>投資収益率: {economic_benefits["roi"]}%</strong>（矯正費用に対する長期的リターン）</p>
+            <p>月あたり約 <strong>¥{economic_benefits["monthly_benefit"]:,}</strong> の医療費削減効果に相当します。</p>
+        </div>
+    </div>
+    '''
+    
+    # 将来シナリオ比較（新規追加）
+    html += '''
+    <div class="section">
+        <h2>将来シナリオ比較</h2>
+        <p>矯正治療を受けた場合と受けなかった場合の将来予測：</p>
+        <table class="comparison-table">
+            <tr>
+                <th>期間</th>
+                <th>矯正した場合</th>
+                <th>矯正しなかった場合</th>
+            </tr>
+    '''
+    
+    for _, row in scenarios.iterrows():
+        html += f'''
+        <tr>
+            <td>{row['timeframe']}</td>
+            <td class="comparison-good">{row['with_ortho']}</td>
+            <td class="comparison-bad">{row['without_ortho']}</td>
+        </tr>
+        '''
+    
+    html += '</table></div>'
+    
+    # 各歯列問題の詳細
+    for issue in issues:
+        filtered = papers[papers['issue'] == issue]
+        if not filtered.empty:
+            html += f'<div class="section"><h2>{issue}のリスク評価</h2>'
+            
+            # 矯正による改善効果
+            if show_recommendations:
+                benefit_df = ortho_benefits[ortho_benefits['issue'] == issue]
+                if not benefit_df.empty:
+                    benefit_info = benefit_df.iloc[0]['effect']
+                    html += f'<div class="benefit"><strong>矯正による改善効果:</strong> {benefit_info}</div>'
+                else:
+                    # 「その他の歯列問題」などのデフォルトメッセージ
+                    html += '<div class="benefit"><strong>矯正による改善効果:</strong> この歯列問題には個別の研究に基づいた具体的なデータが利用できません。専門医との詳細な相談をお勧めします。</div>'
+            
+            # リスク項目（エビデンスレベル付き）
+            for _, row in filtered.iterrows():
+                risk_text = row['risk_description']
+                risk_level = "🔴 高"  # シンプル化のため一律「高」リスクとして表示
+                
+                html += f'<div class="risk-item high-risk"><span style="{risk_styles[risk_level]}">{risk_level}</span> {risk_text}</div>'
+                
+                # エビデンスレベル表示
+                if 'evidence_level' in row:
+                    evidence_level = row['evidence_level']
+                    evidence_color = "#4CAF50" if evidence_level in ["1a", "1b"] else "#FFC107" if evidence_level in ["2a", "2b"] else "#F44336"
+                    study_type = row.get('study_type', '').replace('-', ' ').title()
+                    sample_size = f"(n={row.get('sample_size', '不明')})" if row.get('sample_size', '不明') != '不明' else ""
+                    
+                    html += f'''
+                    <div class="evidence-badge" style="border-left-color: {evidence_color};">
+                        <div class="evidence-level" style="color: {evidence_color};">
+                            エビデンスレベル {evidence_level}: 
+                            {{"1a": "メタ分析/システマティックレビュー", 
+                              "1b": "ランダム化比較試験", 
+                              "2a": "コホート研究", 
+                              "2b": "症例対照研究/臨床試験",
+                              "3": "横断研究/実験研究", 
+                              "4": "症例報告/症例シリーズ", 
+                              "5": "専門家意見/不明"
+                            }}.get(evidence_level, "不明")
+                        </div>
+                        <div class="evidence-type">
+                            {study_type} {sample_size}
+                        </div>
+                    </div>
+                    '''
+                
+                # 論文引用
+                if 'doi' in row:
+                    doi = row['doi']
+                    html += f'<p style="margin-left: 20px; font-size: 0.9em; color: #666;">参考文献: DOI: <a href="https://doi.org/{doi}" target="_blank">{doi}</a></p>'
+            
+            html += '</div>'
+    
+    # フッター
+    html += f'''
+        <div class="footer">
+            歯科エビデンス生成システム - レポート生成日: {today}
+        </div>
+        <div class="no-print" style="text-align: center; margin-top: 30px;">
+            <button onclick="window.print();" style="padding: 10px 20px; background-color: #0066cc; color: white; border: none; border-radius: 4px; cursor: pointer;">
+                印刷する / PDFとして保存
+            </button>
+        </div>
+    </body>
+    </html>
+    '''
+    
+    return html
+
+# HTMLをダウンロード可能にする関数
+def get_html_download_link(html, filename):
+    b64 = base64.b64encode(html.encode()).decode()
+    href = f'<a href="data:text/html;base64,{b64}" download="{filename}" style="display: inline-block; padding: 10px 15px; background-color: #4CAF50; color: white; text-decoration: none; border-radius: 4px; margin: 10px 0;">HTMLレポートをダウンロード</a>'
+    return href
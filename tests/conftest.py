@@ -0,0 +1,41 @@
+import os
+import sys
+
+# リポジトリ直下のモジュール（pubmed_api, paper_store など）を import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from paper_store import PAPER_COLUMNS
+
+EVIDENCE_LEVELS = ['1a', '1b', '2a', '2b', '3', '4', '5']
+
+
+def make_paper_row(pmid, **fields):
+    """
+    論文CSVの1行（PAPER_COLUMNS をキーとする辞書）を作成します。
+
+    タイトルにPMIDを含めるため、既定の値のままでは近似重複とは判定されません。
+    fields に指定した列は、その値で置き換えます。
+    """
+    row = {'issue': '叢生', 'risk_description': 'x', 'doi': 'DOI不明', 'publication_year': '2024',
+           'study_type': 'rct', 'sample_size': '10', 'confidence_interval': '不明', 'age_group': '成人',
+           'evidence_level': '1b', 'authors': 'Kim A', 'title': f'Effect of appliance {pmid} on crowding outcomes',
+           'url': f'https://pubmed.ncbi.nlm.nih.gov/{pmid}/', 'pmid': str(pmid)}
+    unknown = set(fields).difference(row)
+    if unknown:
+        raise KeyError(f"論文CSVにない列です: {sorted(unknown)}")
+    row.update(fields)
+    return row
+
+
+def make_papers(count, issue='叢生', title='Crowding and caries {i}'):
+    """
+    レポート用の論文（論文CSVと同じ列のデータフレーム）を作成します。
+    """
+    return pd.DataFrame([make_paper_row(
+        i + 1, issue=issue, risk_description=f'齲蝕リスクが{10 + i % 50}%上昇します（研究{i}）',
+        doi=f'10.1000/ortho.{i}', publication_year='2020', study_type='randomized-controlled-trial',
+        sample_size=str(20 + i) if i % 3 else '不明', age_group='全年齢',
+        evidence_level=EVIDENCE_LEVELS[i % len(EVIDENCE_LEVELS)], title=title.format(i=i), url='',
+    ) for i in range(count)], columns=PAPER_COLUMNS)
@@ -0,0 +1,237 @@
+"""
+テストとベンチマーク用のローカルな E-utilities サーバー（http.server）。
+
+esearch.fcgi は検索語から決まるPMIDのリストを、efetch.fcgi は指定したPMIDの
+PubmedArticle を合成したXMLを返します。usehistory=y の検索は履歴サーバーに保存し、
+efetch.fcgi に WebEnv/query_key/retstart/retmax を指定するとその範囲を返します。
+接続数・リクエストの時刻を記録し、応答するステータスコードを順に指定して
+429/5xx を、本文を途中で切った応答で通信の切断を再現できます。
+"""
+import json
+import socket
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+STUDY_TYPES = (
+    ('Randomized Controlled Trial', 'randomized controlled trial'),
+    ('Systematic Review', 'systematic review and meta-analysis'),
+    ('Journal Article', 'retrospective cohort study'),
+    ('Journal Article', 'cross-sectional study'),
+    ('Case Reports', 'case report'),
+)
+ISSUES = ('crowding', 'open bite', 'deep bite', 'crossbite', 'overjet', 'spacing', 'class II malocclusion')
+AGES = ('children aged 8-12 years', 'adolescents', 'adult patients', 'elderly patients', 'patients')
+MESH = ('Orthodontics', 'Malocclusion', 'Tooth Movement Techniques', 'Cephalometry', 'Orthodontic Appliances')
+
+
+def article_xml(pmid):
+    """
+    PMIDから決まる内容の PubmedArticle 要素（str）を返します。
+
+    書誌情報のほか、抄録（構造化抄録を含む）・MeSH・キーワード・出版種別・
+    CommentsCorrections（別のPMIDを含む）を持ちます。
+    """
+    seed = zlib.crc32(str(pmid).encode())
+    publication_type, design = STUDY_TYPES[seed % len(STUDY_TYPES)]
+    issue = ISSUES[(seed >> 3) % len(ISSUES)]
+    age = AGES[(seed >> 6) % len(AGES)]
+    n = 20 + seed % 400
+    year = 2000 + seed % 25
+    ci = f'(95% CI {1 + seed % 7}.{seed % 10}-{9 + seed % 5}.{seed % 9})' if seed % 3 else ''
+    authors = ''.join(
+        f'<Author ValidYN="Y"><LastName>Author{(seed >> i) % 997}</LastName><ForeName>A</ForeName>'
+        f'<Initials>A</Initials></Author>' for i in range(1 + seed % 5))
+    keywords = ''.join(f'<Keyword MajorTopicYN="N">{escape(k)}</Keyword>' for k in (issue, 'orthodontics'))
+    mesh = ''.join(
+        f'<MeshHeading><DescriptorName UI="D{i:06d}" MajorTopicYN="N">{m}</DescriptorName></MeshHeading>'
+        for i, m in enumerate(MESH[:2 + seed % 4]))
+    if seed % 2:
+        abstract = (
+            f'<AbstractText Label="OBJECTIVE" NlmCategory="OBJECTIVE">To evaluate orthodontic treatment of {issue} '
+            f'in {age}.</AbstractText>'
+            f'<AbstractText Label="METHODS" NlmCategory="METHODS">This {design} included {n} patients '
+            f'with {issue}.</AbstractText>'
+            f'<AbstractText Label="RESULTS" NlmCategory="RESULTS">Untreated {issue} increased the risk of '
+            f'caries by {10 + seed % 40}% {escape(ci)}.</AbstractText>')
+    else:
+        abstract = (
+            f'<AbstractText>This {design} of {n} {age} examined {issue}. Malocclusion was associated with a '
+            f'{1 + seed % 3}.{seed % 10}-fold risk of periodontal disease {escape(ci)}.</AbstractText>')
+    doi = f'<ArticleId IdType="doi">10.{1000 + seed % 9000}/ortho.{pmid}</ArticleId>' if seed % 4 else ''
+    return (
+        f'<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM"><PMID Version="1">{pmid}</PMID>'
+        f'<Article PubModel="Print"><Journal><ISSN IssnType="Electronic">1097-6752</ISSN>'
+        f'<JournalIssue CitedMedium="Internet"><Volume>{seed % 160}</Volume>'
+        f'<PubDate><Year>{year}</Year><Month>Mar</Month></PubDate></JournalIssue>'
+        f'<Title>American Journal of Orthodontics and Dentofacial Orthopedics</Title></Journal>'
+        f'<ArticleTitle>Orthodontic treatment of {issue} in {age}: a {design} ({pmid})</ArticleTitle>'
+        f'<Abstract>{abstract}</Abstract><AuthorList CompleteYN="Y">{authors}</AuthorList>'
+        f'<Language>eng</Language><PublicationTypeList><PublicationType UI="D016428">{publication_type}'
+        f'</PublicationType></PublicationTypeList></Article>'
+        f'<MeshHeadingList>{mesh}</MeshHeadingList>'
+        f'<CommentsCorrectionsList><CommentsCorrections RefType="Cites"><RefSource>Ref</RefSource>'
+        f'<PMID Version="1">{int(pmid) + 7}</PMID></CommentsCorrections></CommentsCorrectionsList>'
+        f'<KeywordList Owner="NOTNLM">{keywords}</KeywordList></MedlineCitation>'
+        f'<PubmedData><ArticleIdList><ArticleId IdType="pubmed">{pmid}</ArticleId>{doi}</ArticleIdList>'
+        f'</PubmedData></PubmedArticle>')
+
+
+def article_set_xml(pmids):
+    """
+    PMIDのリストの PubmedArticleSet（bytes）を返します。
+    """
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<PubmedArticleSet>\n']
+    parts.extend(article_xml(pmid) + '\n' for pmid in pmids)
+    parts.append('</PubmedArticleSet>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def search_pmids(term, count):
+    """
+    検索語から決まる count 件のPMIDを返します（検索語が同じなら同じPMID）。
+    """
+    base = 10000000 + zlib.crc32(term.encode()) % 20000000
+    return [str(base + i * 13) for i in range(count)]
+
+
+class FakeEutilsServer:
+    """
+    バックグラウンドのスレッドで動くローカルの E-utilities サーバー（with 文で起動・停止）。
+
+    Parameters:
+    -----------
+    connect_delay : float
+        新しい接続ごとに待つ秒数（TLSハンドシェイクの往復の代わり）
+    response_delay : float
+        リクエストごとに待つ秒数（サーバーまでの往復の代わり）
+    results_per_search : int
+        esearch が返すPMIDの件数（retmax が小さければ retmax 件）
+    """
+
+    def __init__(self, connect_delay=0.0, response_delay=0.0, results_per_search=20):
+        self.connect_delay = connect_delay
+        self.response_delay = response_delay
+        self.results_per_search = results_per_search
+        self.connections = 0
+        self.requests = []
+        self._statuses = []
+        self._truncate = 0
+        self._history = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/'
+
+    def fail_next(self, *statuses, retry_after=None):
+        """
+        次のリクエストから順に、指定したステータスコードで応答させます。
+        """
+        with self._lock:
+            self._statuses.extend((status, retry_after) for status in statuses)
+
+    def truncate_next(self, count=1):
+        """
+        次の count 件の efetch の応答本文を途中で切って返します（ステータスは200）。
+        """
+        with self._lock:
+            self._truncate += count
+
+    def reset_counters(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = []
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # ヘッダーと本文を別々に送るため、Nagle の遅延で Keep-Alive の応答が遅れないようにする
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server._lock:
+                    server.connections += 1
+                if server.connect_delay:
+                    time.sleep(server.connect_delay)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+                endpoint = parsed.path.rsplit('/', 1)[-1]
+                with server._lock:
+                    server.requests.append((time.monotonic(), endpoint, params))
+                    status, retry_after = server._statuses.pop(0) if server._statuses else (200, None)
+                    truncate = status == 200 and endpoint == 'efetch.fcgi' and server._truncate > 0
+                    if truncate:
+                        server._truncate -= 1
+                if server.response_delay:
+                    time.sleep(server.response_delay)
+
+                if status != 200:
+                    body, content_type = b'{"error": "retry"}', 'application/json'
+                elif endpoint == 'esearch.fcgi' and params.get('usehistory') == 'y':
+                    # 検索結果の全件数を返し、PMIDは履歴サーバーに保存する
+                    term = params.get('term', '')
+                    with server._lock:
+                        webenv = f'WEBENV_{len(server._history) + 1}'
+                        server._history[webenv] = term
+                    retmax = min(int(params.get('retmax', 20)), server.results_per_search)
+                    result = {'esearchresult': {
+                        'count': str(server.results_per_search), 'retmax': str(retmax),
+                        'idlist': search_pmids(term, retmax), 'webenv': webenv, 'querykey': '1'}}
+                    body, content_type = json.dumps(result).encode(), 'application/json'
+                elif endpoint == 'esearch.fcgi':
+                    count = min(int(params.get('retmax', 20)), server.results_per_search)
+                    idlist = search_pmids(params.get('term', ''), count)
+                    result = {'esearchresult': {'count': str(count), 'retmax': str(count), 'idlist': idlist}}
+                    body, content_type = json.dumps(result).encode(), 'application/json'
+                elif endpoint == 'efetch.fcgi' and 'WebEnv' in params:
+                    term = server._history.get(params['WebEnv'])
+                    if term is None or params.get('query_key') != '1':
+                        status, body, content_type = 400, b'invalid WebEnv', 'text/plain'
+                    else:
+                        retstart = int(params.get('retstart', 0))
+                        end = min(retstart + int(params.get('retmax', 20)), server.results_per_search)
+                        ids = search_pmids(term, end)[retstart:]
+                        body, content_type = article_set_xml(ids), 'text/xml'
+                elif endpoint == 'efetch.fcgi':
+                    ids = [pmid for pmid in params.get('id', '').split(',') if pmid]
+                    body, content_type = article_set_xml(ids), 'text/xml'
+                else:
+                    status, body, content_type = 404, b'not found', 'text/plain'
+                if truncate and status == 200:
+                    body = body[:len(body) // 2]
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if retry_after is not None and status != 200:
+                    self.send_header('Retry-After', str(retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,46 @@
+import csv
+import json
+
+import bulk_reports
+from conftest import make_papers
+
+
+def write_roster(path, ids):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['id', 'age', 'gender', 'issues', 'notes'])
+        writer.writeheader()
+        writer.writerows({'id': patient_id, 'age': 10 + i, 'gender': '女性', 'issues': '叢生;開咬', 'notes': ''}
+                         for i, patient_id in enumerate(ids))
+
+
+def test_colliding_ids_get_distinct_filenames(tmp_path):
+    roster_file = str(tmp_path / 'roster.csv')
+    write_roster(roster_file, ['a b', 'a_b', 'A_B', 'x', 'x', 'a_b_2', '', 'p/1'])
+
+    patients = bulk_reports.load_roster(roster_file)
+    assert [patient['id'] for patient in patients] == ['a b', 'a_b', 'A_B', 'x', 'x', 'a_b_2', 'patient_00007', 'p/1']
+    assert [patient['filename'] for patient in patients] == [
+        'a_b', 'a_b_2', 'A_B_3', 'x', 'x_2', 'a_b_2_2', 'patient_00007', 'p_1']
+
+
+def test_jsonl_roster_uses_same_filenames(tmp_path):
+    roster_file = tmp_path / 'roster.jsonl'
+    roster_file.write_text('\n'.join(json.dumps({'id': patient_id, 'age': 12, 'issues': ['叢生']})
+                                     for patient_id in ['1', '1', 1]), encoding='utf-8')
+    patients = bulk_reports.load_roster(str(roster_file))
+    assert [patient['filename'] for patient in patients] == ['1', '1_2', '1_3']
+
+
+def test_bulk_reports_do_not_overwrite_each_other(tmp_path):
+    papers_file = str(tmp_path / 'papers.csv')
+    make_papers(20).to_csv(papers_file, index=False)
+    roster_file = str(tmp_path / 'roster.csv')
+    write_roster(roster_file, ['a b', 'a_b', 'a b'])
+    out_dir = tmp_path / 'reports'
+
+    assert bulk_reports.generate_bulk_reports(roster_file, str(out_dir), papers_file, processes=1) == 3
+    assert sorted(path.name for path in out_dir.iterdir()) == [
+        'a_b.html', 'a_b.md', 'a_b_2.html', 'a_b_2.md', 'a_b_3.html', 'a_b_3.md']
+    # 患者ごとに年齢が異なるため、それぞれの内容が残っている
+    for name, age in (('a_b', 10), ('a_b_2', 11), ('a_b_3', 12)):
+        assert f'{age}歳' in (out_dir / f'{name}.md').read_text(encoding='utf-8')
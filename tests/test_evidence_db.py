@@ -0,0 +1,129 @@
+import csv
+import itertools
+import random
+
+import pandas as pd
+
+from conftest import make_paper_row
+from evidence_db import EvidenceDB, data_version
+from paper_store import PAPER_COLUMNS, PaperStore
+
+ISSUES = ['叢生', '開咬', '過蓋咬合', '交叉咬合', '上顎前突', '下顎前突', 'その他の歯列問題']
+LEVELS = ['1a', '1b', '2a', '2b', '3', '4', '5']
+AGE_GROUPS = ['小児', '小児・青年', '青年', '成人', '成人・高齢者', '高齢者', '全年齢']
+
+
+def make_rows(count, seed=0, first_pmid=1):
+    rng = random.Random(seed)
+    return [make_paper_row(
+        i, issue=rng.choice(ISSUES), risk_description=f'risk {i}', doi=rng.choice(['DOI不明', f'10.1000/{i}']),
+        publication_year=str(rng.randint(2000, 2024)), sample_size=rng.choice(['不明', str(rng.randint(10, 500))]),
+        age_group=rng.choice(AGE_GROUPS), evidence_level=rng.choice(LEVELS),
+        # 空欄の列も含める
+        authors=rng.choice(['', 'Kim A']), title=f'Study {i}', url='',
+    ) for i in range(first_pmid, first_pmid + count)]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=PAPER_COLUMNS, lineterminator='\r\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def read_csv(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def records(frame):
+    # SQLiteの NULL と CSVの空欄を同じものとして比べる
+    return frame[PAPER_COLUMNS].fillna('').astype(str).to_dict('records')
+
+
+def assert_queries_match_csv(db, path):
+    papers = read_csv(path)
+    filters = itertools.product([None] + ISSUES, [None, ['1a'], ['1b', '2a', '3']], [None, ['成人'], ['小児', '青年']])
+    for issue, levels, ages in filters:
+        expected = papers
+        if issue is not None:
+            expected = expected[expected['issue'] == issue]
+        if levels:
+            expected = expected[expected['evidence_level'].isin(levels)]
+        if ages:
+            expected = expected[expected['age_group'].isin(ages)]
+        assert records(db.query_papers(issue, levels, ages)) == records(expected)
+
+
+def test_query_papers_matches_dataframe_filters(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    write_csv(path, make_rows(600))
+    db = EvidenceDB(path)
+
+    assert db.count() == 600
+    assert_queries_match_csv(db, path)
+    papers = read_csv(path)
+    assert db.issues() == list(dict.fromkeys(papers['issue']))
+    assert db.value_counts('evidence_level').to_dict() == papers['evidence_level'].value_counts().to_dict()
+    assert records(db.papers_by_pmid(['30', '7', '999999', '12'])) == records(
+        papers[papers['pmid'].isin(['7', '12', '30'])])
+
+
+def test_store_changes_are_reflected_without_reimport(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    write_csv(path, make_rows(200))
+    store = PaperStore(path)
+    db = EvidenceDB(path)
+
+    # 追記・上書き・削除は差分だけを反映し、取り込み済みの版も進める
+    before = data_version(path)
+    added = store.add_rows(make_rows(50, seed=1, first_pmid=1001))
+    db.record_append(added, before, data_version(path))
+
+    before = data_version(path)
+    added, updated = store.upsert_rows([dict(make_rows(1, first_pmid=5)[0], issue='開咬', evidence_level='1a')])
+    assert len(updated) == 1
+    db.record_upsert(added, updated, before, data_version(path))
+
+    before = data_version(path)
+    removed = store.remove_rows(['9', '1010'])
+    db.record_remove(removed, before, data_version(path))
+
+    assert db.sync_from_csv() is False
+    assert db.count() == 248
+    assert_queries_match_csv(db, path)
+
+
+def test_external_csv_change_triggers_reimport(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    write_csv(path, make_rows(100))
+    db = EvidenceDB(path)
+    write_csv(path, make_rows(40, seed=3))
+
+    assert db.count() == 40
+    assert_queries_match_csv(db, path)
+
+    # 別のデータベースファイルを開き直しても同じ内容になる
+    reopened = EvidenceDB(path)
+    assert reopened.sync_from_csv() is False
+    assert records(reopened.query_papers()) == records(db.query_papers())
+
+
+def test_replacing_row_without_pmid_reimports(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    title = 'Long-term stability of crowding correction with fixed retainers'
+    rows = make_rows(5)
+    rows[2].update(title=title, pmid='', url='', doi='DOI不明', publication_year='2019')
+    write_csv(path, rows)
+    db = EvidenceDB(path)
+    store = PaperStore(path)
+
+    before = data_version(path)
+    published = dict(make_rows(1, first_pmid=100)[0], title=title, authors=rows[2]['authors'],
+                     doi='10.1000/published', publication_year='2021')
+    added, updated = store.upsert_rows([published], update_existing=False)
+    assert added == [] and [(row['pmid'], row['replaced_pmid']) for row in updated] == [('100', '')]
+    db.record_upsert(added, updated, before, data_version(path))
+
+    assert db.sync_from_csv() is False
+    assert db.query_papers()['pmid'].tolist() == ['1', '2', '100', '4', '5']
+    assert_queries_match_csv(db, path)
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CORE_MODULES = [
+    'ortho_core.reference_data', 'ortho_core.scoring', 'ortho_core.evidence_index', 'ortho_core.report',
+    'ortho_core.render', 'ortho_core.report_cache',
+]
+
+
+def loaded_modules(module, candidates):
+    # すでに読み込まれたモジュールの影響を受けないよう、新しいプロセスで読み込む
+    code = (f'import sys, {module}\n'
+            f'print(",".join(name for name in {candidates!r} if name in sys.modules))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [name for name in output.stdout.strip().split(',') if name]
+
+
+@pytest.mark.parametrize('module', CORE_MODULES + ['pubmed_api'])
+def test_import_does_not_load_streamlit_or_pandas(module):
+    assert loaded_modules(module, ['streamlit', 'pandas']) == []
+
+
+def test_pubmed_api_does_not_load_storage_modules():
+    assert loaded_modules('pubmed_api', ['paper_store', 'evidence_db', 'search_index', 'dedup']) == []
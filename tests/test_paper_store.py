@@ -0,0 +1,167 @@
+import csv
+import json
+import multiprocessing
+
+import numpy as np
+
+import dedup
+from conftest import make_paper_row
+from paper_store import PaperStore
+
+
+def read_csv_pmids(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return [row['pmid'] for row in csv.DictReader(f)]
+
+
+def test_append_writes_only_new_keys(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    store = PaperStore(path)
+    assert len(store.add_rows([make_paper_row(i, doi=f'10.1000/{i}') for i in range(1, 6)])) == 5
+    keys_size = (tmp_path / 'papers.csv.keys').stat().st_size
+
+    # インデックスにはキーを持たず、キーファイルには新しいキーの行だけが追記される
+    assert len(store.add_rows([make_paper_row(1), make_paper_row(6)])) == 1
+    index = json.loads((tmp_path / 'papers.csv.idx.json').read_text(encoding='utf-8'))
+    assert 'pmids' not in index and 'dois' not in index
+    assert index['rows'] == 6
+    appended = (tmp_path / 'papers.csv.keys').read_bytes()[keys_size:].decode('utf-8')
+    assert appended.splitlines() == ['6']
+
+    reopened = PaperStore(path)
+    assert len(reopened) == 6
+    assert reopened.contains(doi='https://doi.org/10.1000/3') and reopened.contains(pmid='6')
+
+
+def test_uncommitted_tail_is_rolled_back(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    PaperStore(path).add_rows([make_paper_row(i) for i in range(1, 4)])
+    csv_size = (tmp_path / 'papers.csv').stat().st_size
+
+    # インデックスを更新する前に異常終了した追記（書きかけの行とキー）を再現する
+    with open(path, 'ab') as f:
+        f.write(b'\xe5\x8f\xa2\xe7\x94\x9f,partial')
+    with open(tmp_path / 'papers.csv.keys', 'ab') as f:
+        f.write(b'99\n')
+
+    store = PaperStore(path)
+    assert (tmp_path / 'papers.csv').stat().st_size == csv_size
+    assert len(store) == 3 and not store.contains(pmid='99')
+    assert len(store.add_rows([make_paper_row(99)])) == 1
+    assert read_csv_pmids(path) == ['1', '2', '3', '99']
+
+
+def test_other_instance_reads_only_appended_rows(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    first = PaperStore(path)
+    first.add_rows([make_paper_row(1)])
+    second = PaperStore(path)
+    near = second._near
+    first.add_rows([make_paper_row(2), make_paper_row(3)])
+
+    # 追記だけであれば、もう一方のインスタンスは追記分だけを読み込む
+    assert second.contains(pmid='3') and len(second) == 3
+    assert second._near is near
+    assert second.add_rows([make_paper_row(3), make_paper_row(4)]) == [make_paper_row(4)]
+
+    # 書き直し（remove_rows）の後は全体を読み直す
+    assert first.remove_rows(['4']) == ['4']
+    assert len(second) == 3
+    assert second._near is not near
+
+
+def _add_batches(path, worker, batches, batch_size):
+    store = PaperStore(path)
+    for batch in range(batches):
+        base = (worker * batches + batch) * batch_size + 1
+        store.add_rows([make_paper_row(pmid) for pmid in range(base, base + batch_size)])
+
+
+def test_concurrent_processes_do_not_interleave(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    workers, batches, batch_size = 3, 8, 25
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_add_batches, args=(path, worker, batches, batch_size))
+                 for worker in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    total = workers * batches * batch_size
+    pmids = read_csv_pmids(path)
+    assert sorted(pmids, key=int) == [str(pmid) for pmid in range(1, total + 1)]
+
+    store = PaperStore(path)
+    assert len(store) == total and len(store.pmids) == total
+    with open(path, encoding='utf-8', newline='') as f:
+        records = dedup.minhash_records(list(csv.DictReader(f)))
+    assert np.array_equal(store._near.records, records)
+
+
+def make_version(pmid, doi='DOI不明', year='2024'):
+    # 同じ論文の別版（プレプリントと出版版など。タイトルと著者が同じ）
+    return make_paper_row(pmid, doi=doi, title='Effect of clear aligners on crowding outcomes in adolescents',
+                          publication_year=year)
+
+
+def test_newer_version_replaces_stored_preprint(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    store = PaperStore(path)
+    store.add_rows([make_paper_row(1), make_version(2, year='2022'), make_paper_row(3)])
+
+    added, updated = store.upsert_rows([make_version(4, doi='10.1000/published', year='2023'), make_paper_row(5)],
+                                       update_existing=False)
+    assert [row['pmid'] for row in added] == ['5']
+    assert [(row['pmid'], row['replaced_pmid']) for row in updated] == [('4', '2')]
+    # 置き換えた行は元の位置に残る
+    assert read_csv_pmids(path) == ['1', '4', '3', '5']
+
+    for current in (store, PaperStore(path)):
+        assert current.contains(doi='10.1000/published') and current.contains(pmid='4')
+        # 古い版を再取得しても、近似重複・登録済みのPMIDとして追加しない
+        assert current.upsert_rows([make_version(2, year='2022'), make_version(6, year='2021')]) == ([], [])
+    assert read_csv_pmids(path) == ['1', '4', '3', '5']
+
+
+def test_older_version_does_not_replace_published_row(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    store = PaperStore(path)
+    store.add_rows([make_version(1, doi='10.1000/published', year='2023')])
+    size = (tmp_path / 'papers.csv').stat().st_size
+
+    # DOIのないプレプリントも、DOIがあっても出版年の古い版も置き換えない
+    assert store.upsert_rows([make_version(2, year='2024')]) == ([], [])
+    assert store.upsert_rows([make_version(3, doi='10.1101/preprint', year='2022')]) == ([], [])
+    assert (tmp_path / 'papers.csv').stat().st_size == size
+    assert read_csv_pmids(path) == ['1']
+
+
+def test_batch_keeps_newest_version(tmp_path):
+    path = str(tmp_path / 'papers.csv')
+    store = PaperStore(path)
+    rows = [make_version(1, year='2021'), make_paper_row(2), make_version(3, doi='10.1000/published', year='2023'),
+            make_version(4, year='2022')]
+    assert [row['pmid'] for row in store.add_rows(rows)] == ['3', '2']
+    assert read_csv_pmids(path) == ['3', '2']
+    assert len(PaperStore(path)) == 2
+
+
+def test_update_papers_csv_replaces_preprint_in_database_and_search_index(tmp_path):
+    from evidence_db import get_evidence_db
+    from pubmed_api import update_papers_csv
+    from search_index import get_search_index
+
+    def article(row):
+        return dict(row, abstract='Therapy for crowding.', keywords=[], mesh_terms=[], publication_types=[])
+
+    path = str(tmp_path / 'papers.csv')
+    assert update_papers_csv([article(make_paper_row(1)), article(make_version(2, year='2022'))], path) == 2
+    assert [pmid for pmid, _ in get_search_index(path).search('aligners')] == ['2']
+
+    assert update_papers_csv([article(make_version(3, doi='10.1000/published', year='2023'))], path) == 1
+    papers = get_evidence_db(path).query_papers()
+    assert papers['pmid'].tolist() == ['1', '3']
+    assert papers['doi'].tolist() == ['DOI不明', '10.1000/published']
+    assert [pmid for pmid, _ in get_search_index(path).search('aligners')] == ['3']
@@ -0,0 +1,70 @@
+import csv
+import importlib.util
+import os
+from datetime import date
+
+import pytest
+
+import bulk_reports
+from conftest import make_papers
+from ortho_core.evidence_index import EvidenceIndex
+from ortho_core.report import build_report
+
+REPORT_DATE = date(2024, 4, 1)
+
+
+def write_inputs(directory, patients):
+    papers_file = os.path.join(directory, 'papers.csv')
+    make_papers(40).to_csv(papers_file, index=False)
+    roster_file = os.path.join(directory, 'roster.csv')
+    with open(roster_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['id', 'age', 'gender', 'issues', 'notes'])
+        writer.writeheader()
+        writer.writerows(patients)
+    return papers_file, roster_file
+
+
+def test_pdf_report_is_stable():
+    pytest.importorskip('reportlab')
+    from ortho_core.pdf import generate_pdf_report
+
+    index = EvidenceIndex.from_papers(make_papers(200))
+    report = build_report(15, '女性', ['叢生', '開咬'], index, evidence_filter=[],
+                          additional_notes='<経過観察> & 再評価', report_date=REPORT_DATE)
+    pdf = generate_pdf_report(report)
+    assert pdf.startswith(b'%PDF-')
+    assert pdf.rstrip().endswith(b'%%EOF')
+    # 200件の引用は複数ページになる
+    assert pdf.count(b'/Type /Page\n') > 1
+    # 作成日時などを固定しているため、同じレポートからは同じバイト列になる
+    assert generate_pdf_report(report) == pdf
+
+
+def test_bulk_reports_write_pdf(tmp_path):
+    pytest.importorskip('reportlab')
+    patients = [
+        {'id': 'A 001', 'age': 9, 'gender': '男性', 'issues': '叢生;開咬', 'notes': ''},
+        {'id': 'A002', 'age': 34, 'gender': '女性', 'issues': '叢生', 'notes': '経過観察'},
+    ]
+    papers_file, roster_file = write_inputs(str(tmp_path), patients)
+    out_dir = str(tmp_path / 'reports')
+
+    assert bulk_reports.generate_bulk_reports(roster_file, out_dir, papers_file, processes=1, write_pdf=True) == 2
+    assert sorted(os.listdir(out_dir)) == [
+        'A002.html', 'A002.md', 'A002.pdf', 'A_001.html', 'A_001.md', 'A_001.pdf',
+    ]
+    with open(os.path.join(out_dir, 'A_001.pdf'), 'rb') as f:
+        assert f.read(5) == b'%PDF-'
+
+
+def test_bulk_reports_require_reportlab_for_pdf(tmp_path, monkeypatch):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec',
+                        lambda name, *args: None if name == 'reportlab' else find_spec(name, *args))
+    papers_file, roster_file = write_inputs(
+        str(tmp_path), [{'id': 'A', 'age': 10, 'gender': '男性', 'issues': '叢生', 'notes': ''}])
+
+    with pytest.raises(ImportError, match='reportlab'):
+        bulk_reports.generate_bulk_reports(roster_file, str(tmp_path / 'reports'), papers_file, write_pdf=True)
+    # ワーカーの起動や出力先の作成より前に失敗する
+    assert not os.path.exists(tmp_path / 'reports')
@@ -0,0 +1,71 @@
+import gzip
+
+import pubmed_baseline_import
+from fake_eutils import article_xml
+from pubmed_api import enrich_article, is_orthodontic_article, iter_parse_pubmed_articles
+from pubmed_baseline_import import screen_pubmed_file
+
+
+def other_article_xml(pmid, title, abstract, journal='Journal of Cardiology'):
+    # 矯正歯科ではない論文（MeSH用語も持たない）
+    return (
+        f'<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM"><PMID Version="1">{pmid}</PMID>'
+        f'<Article PubModel="Print"><Journal><JournalIssue CitedMedium="Internet"><Volume>3</Volume>'
+        f'<PubDate><Year>2021</Year></PubDate></JournalIssue><Title>{journal}</Title></Journal>'
+        f'<ArticleTitle>{title}</ArticleTitle><Abstract><AbstractText>{abstract}</AbstractText></Abstract>'
+        f'<Language>eng</Language><PublicationTypeList><PublicationType UI="D016428">Journal Article'
+        f'</PublicationType></PublicationTypeList></Article></MedlineCitation>'
+        f'<PubmedData><ArticleIdList><ArticleId IdType="pubmed">{pmid}</ArticleId></ArticleIdList>'
+        f'</PubmedData></PubmedArticle>')
+
+
+def build_update_file(articles, deleted_pmids):
+    # PubMedの更新ファイルと同じ形（論文の後に削除指示）
+    deleted = ''.join(f'<PMID Version="1">{pmid}</PMID>' for pmid in deleted_pmids)
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2025//EN" '
+        '"https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">\n'
+        '<PubmedArticleSet>\n' + '\n'.join(articles) + '\n'
+        f'<DeleteCitation>{deleted}</DeleteCitation>\n</PubmedArticleSet>\n'
+    ).encode('utf-8')
+
+
+def test_screen_matches_full_parse(tmp_path, monkeypatch):
+    articles = [
+        article_xml(30000001),
+        other_article_xml(30000002, 'Statins after myocardial infarction', 'Mortality fell by 12%.'),
+        article_xml(30000003),
+        # 前段の絞り込みは通るが、単語 orthodontic を含まないため該当しない
+        other_article_xml(30000004, 'Teeth moved orthodontically in rats', 'Bone remodelling was measured.',
+                          journal='American Journal of Orthodontics'),
+        article_xml(30000005),
+        other_article_xml(30000006, 'Caries in adolescents', 'An orthodontic appliance was worn by 5 patients.'),
+    ]
+    data = build_update_file(articles, ['29000001', '29000002', '29000003'])
+
+    # 読み込みの区切りが2件目と5件目の論文の途中に来るようにする
+    second = data.index(articles[1].encode())
+    monkeypatch.setattr(pubmed_baseline_import, 'READ_BLOCK_BYTES', second + 40)
+    fifth = data.index(articles[4].encode())
+    boundaries = range(second + 40, len(data), second + 40)
+    assert any(fifth < boundary < fifth + len(articles[4]) for boundary in boundaries)
+
+    path = str(tmp_path / 'pubmed25n0001.xml.gz')
+    with gzip.open(path, 'wb') as f:
+        f.write(data)
+    screened_path, matched, counts, error = screen_pubmed_file(path)
+
+    assert error is None and screened_path == path
+    assert counts == {'articles': 6, 'matched': 4, 'deleted': 3}
+    expected = [enrich_article(article) for article in iter_parse_pubmed_articles(data, is_orthodontic_article)]
+    assert [article['pmid'] for article in expected] == ['30000001', '30000003', '30000005', '30000006']
+    assert matched == expected
+
+
+def test_screen_reports_errors_instead_of_raising(tmp_path):
+    path = str(tmp_path / 'broken.xml.gz')
+    with open(path, 'wb') as f:
+        f.write(b'not gzip')
+    screened_path, matched, counts, error = screen_pubmed_file(path)
+    assert screened_path == path and matched == [] and error
@@ -0,0 +1,151 @@
+import os
+
+import pytest
+
+import pubmed_api
+import pubmed_cache
+from fake_eutils import FakeEutilsServer, search_pmids
+from pubmed_api import PubMedClient, TokenBucket, build_search_term, fetch_pubmed_records, fetch_pubmed_studies
+from pubmed_cache import PubMedCache
+
+
+class FakeClock:
+    # pubmed_cache の time.time() の代わりに使う時計
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pubmed_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / 'pubmed_cache.db')
+
+
+def record(pmid, size=2000):
+    # 圧縮してもほぼ同じ大きさのまま（サイズの予測がしやすい）
+    return f'<PubmedArticle>{pmid}</PubmedArticle>'.encode() + os.urandom(size)
+
+
+def stored_bytes(cache):
+    return cache._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+
+def test_entries_expire_after_ttl(cache_file, clock):
+    cache = PubMedCache(cache_file, search_ttl=60, record_ttl=3600)
+    cache.put_records({'1': b'<PubmedArticle>1</PubmedArticle>'})
+    cache.put_search({'term': 'crowding'}, {'esearchresult': {'idlist': ['1']}})
+
+    clock.now += 59
+    assert cache.get_search({'term': 'crowding'}) == {'esearchresult': {'idlist': ['1']}}
+    clock.now += 2
+    assert cache.get_search({'term': 'crowding'}) is None
+    assert cache.get_records(['1']) == {'1': b'<PubmedArticle>1</PubmedArticle>'}
+    clock.now += 3600
+    assert cache.get_records(['1']) == {}
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expired']) == (2, 2, 2)
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes(cache_file, clock):
+    cache = PubMedCache(cache_file, max_bytes=10_000)
+    for pmid in range(1, 5):
+        clock.now += 1
+        cache.put_records({str(pmid): record(pmid)})
+    # 1 を使い直すと、最後に使われた時刻が最も古いのは 2 になる
+    clock.now += 1
+    assert set(cache.get_records(['1'])) == {'1'}
+
+    clock.now += 1
+    cache.put_records({'5': record(5)})
+    stats = cache.stats()
+    # 上限（1万バイト）を超えたので、9割以下になるまで 2 だけを削除する（1 は最初に保存したが残る）
+    assert stats['evictions'] == 1
+    assert set(cache.get_records([str(pmid) for pmid in range(1, 6)])) == {'1', '3', '4', '5'}
+    assert stats['bytes'] == stored_bytes(cache) <= 10_000 * pubmed_cache.EVICT_TARGET_RATIO
+
+
+def test_running_total_tracks_replacements_and_clear(cache_file, clock):
+    cache = PubMedCache(cache_file, max_bytes=1_000_000)
+    cache.put_records({str(pmid): record(pmid, 500) for pmid in range(20)})
+    cache.put_records({str(pmid): record(pmid, 1500) for pmid in range(10)})
+    assert cache.stats()['bytes'] == stored_bytes(cache)
+
+    # 別のプロセスが同じファイルに書き込んでも、合計はファイルの中で共有される
+    other = PubMedCache(cache_file, max_bytes=1_000_000)
+    other.put_records({str(pmid): record(pmid) for pmid in range(15, 30)})
+    assert cache.stats()['bytes'] == other.stats()['bytes'] == stored_bytes(cache)
+
+    # 集計行のない古いファイルは、開いたときに1度だけ集計する
+    with other._conn:
+        other._conn.execute('DROP TABLE cache_size')
+    assert PubMedCache(cache_file).stats()['bytes'] == stored_bytes(other) > 0
+
+    cache.clear()
+    assert other.stats()['bytes'] == stored_bytes(other) == 0
+
+
+def test_offline_mode_serves_expired_entries(cache_file, clock):
+    cache = PubMedCache(cache_file, search_ttl=60, record_ttl=60)
+    cache.put_records({'1': b'<PubmedArticle>1</PubmedArticle>'})
+    clock.now += 3600
+    assert cache.get_records(['1']) == {}
+
+    offline = PubMedCache(cache_file, search_ttl=60, record_ttl=60, offline=True)
+    assert offline.get_records(['1', '2']) == {'1': b'<PubmedArticle>1</PubmedArticle>'}
+
+
+@pytest.fixture
+def server(cache_file, monkeypatch):
+    monkeypatch.delenv('NCBI_API_KEY', raising=False)
+    with FakeEutilsServer() as server:
+        monkeypatch.setattr(pubmed_api, '_client', PubMedClient(
+            base_url=server.url, backoff_factor=0.01, rate_limiter=TokenBucket(1000, capacity=1000)))
+        yield server
+
+
+def use_cache(monkeypatch, cache):
+    monkeypatch.setattr(pubmed_cache, '_cache', cache)
+    return cache
+
+
+def test_responses_survive_restart(server, cache_file, monkeypatch):
+    cache = use_cache(monkeypatch, PubMedCache(cache_file))
+    pmids = search_pmids(build_search_term('crowding'), 20)
+    assert fetch_pubmed_studies('crowding')['esearchresult']['idlist'] == pmids
+    records = fetch_pubmed_records(pmids)
+    assert len(records) == 20 and len(server.requests) == 2
+    cache.close()
+
+    # 再起動後（新しい接続）も、同じ検索と同じPMIDはサーバーに問い合わせずに返す
+    use_cache(monkeypatch, PubMedCache(cache_file))
+    assert fetch_pubmed_studies('crowding')['esearchresult']['idlist'] == pmids
+    assert fetch_pubmed_records(pmids[:5]) == {pmid: records[pmid] for pmid in pmids[:5]}
+    assert len(server.requests) == 2
+
+    # キャッシュにないPMIDだけを取得する
+    assert set(fetch_pubmed_records(pmids[:5] + ['99999999'])) == set(pmids[:5]) | {'99999999'}
+    assert server.requests[-1][1:] == ('efetch.fcgi', {'db': 'pubmed', 'id': '99999999', 'retmode': 'xml'})
+
+
+def test_offline_mode_does_not_use_network(server, cache_file, monkeypatch, clock):
+    use_cache(monkeypatch, PubMedCache(cache_file, search_ttl=60, record_ttl=60))
+    pmids = fetch_pubmed_studies('crowding')['esearchresult']['idlist']
+    records = fetch_pubmed_records(pmids)
+    clock.now += 3600
+    server.reset_counters()
+
+    use_cache(monkeypatch, PubMedCache(cache_file, search_ttl=60, record_ttl=60, offline=True))
+    assert fetch_pubmed_studies('crowding')['esearchresult']['idlist'] == pmids
+    assert fetch_pubmed_records(pmids + ['99999999']) == records
+    assert fetch_pubmed_studies('open bite') == {'esearchresult': {'idlist': []}}
+    assert server.requests == []
@@ -0,0 +1,148 @@
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import pubmed_api
+from fake_eutils import FakeEutilsServer, search_pmids
+from pubmed_api import PubMedClient, TokenBucket, build_search_term, get_rate_limiter, iter_pubmed_article_batches
+
+
+@pytest.fixture
+def server():
+    with FakeEutilsServer() as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def no_api_key(monkeypatch):
+    monkeypatch.delenv('NCBI_API_KEY', raising=False)
+    monkeypatch.setattr(pubmed_api, '_rate_limiter', None)
+
+
+def fast_client(server, **kwargs):
+    # 待機をほぼなくしたクライアント（再試行とレート制限以外の検証用）
+    return PubMedClient(base_url=server.url, backoff_factor=0.01,
+                        rate_limiter=TokenBucket(1000, capacity=1000), **kwargs)
+
+
+def test_session_reuses_pooled_connection(server):
+    client = fast_client(server)
+    for keyword in ('crowding', 'open bite', 'deep bite'):
+        result = client.get('esearch.fcgi', {'db': 'pubmed', 'term': keyword, 'retmode': 'json'}).json()
+        content = client.get('efetch.fcgi', {'db': 'pubmed', 'id': ','.join(result['esearchresult']['idlist'])}).content
+        assert content.count(b'<PubmedArticle>') == 20
+
+    assert len(server.requests) == 6
+    assert server.connections == 1
+    assert client.stats()['requests'] == 6
+
+
+def test_retries_429_and_5xx(server):
+    client = fast_client(server)
+    server.fail_next(429, 503, 500, retry_after=0)
+    response = client.get('esearch.fcgi', {'term': 'crowding', 'retmode': 'json'})
+
+    assert response.status_code == 200
+    assert response.json()['esearchresult']['idlist']
+    assert len(server.requests) == 4
+    assert client.stats()['retries'] == 3
+    assert client.rate_limiter.stats()['throttled'] == 1
+
+
+def test_backoff_honours_retry_after(server):
+    client = fast_client(server)
+    server.fail_next(429, retry_after=0.3)
+    start = time.monotonic()
+    client.get('esearch.fcgi', {'term': 'crowding', 'retmode': 'json'})
+    assert time.monotonic() - start >= 0.3
+
+
+def test_gives_up_after_max_retries(server):
+    client = fast_client(server, max_retries=2)
+    server.fail_next(502, 502, 502, 502)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.get('efetch.fcgi', {'id': '1'})
+    assert len(server.requests) == 3
+
+
+def test_connection_errors_are_retried():
+    # 何も待ち受けていないポートへの接続は再試行してから例外になる
+    with FakeEutilsServer() as server:
+        url = server.url
+    client = PubMedClient(base_url=url, max_retries=2, backoff_factor=0.01,
+                          rate_limiter=TokenBucket(1000, capacity=1000))
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get('esearch.fcgi', {'term': 'crowding'})
+    assert client.stats() == {'requests': 3, 'retries': 2, 'bytes_received': 0}
+
+
+@pytest.mark.parametrize('api_key, rate', [(None, 3), ('test-key', 10)])
+def test_rate_limit_follows_api_key(server, monkeypatch, api_key, rate):
+    if api_key:
+        monkeypatch.setenv('NCBI_API_KEY', api_key)
+    client = PubMedClient(base_url=server.url)
+
+    # 複数のスレッドから送っても、プロセス共有のレート制限で全体が上限内に収まる
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda i: client.get('esearch.fcgi', {'term': f'q{i}', 'retmode': 'json'}),
+                          range(rate + 4)))
+
+    assert get_rate_limiter().rate == rate
+    times = sorted(t for t, _, _ in server.requests)
+    # バケットの容量は1なので、連続する rate+1 件のリクエストは1秒以上に分散する
+    for first, last in zip(times, times[rate:]):
+        assert last - first >= 0.95
+    assert all(params.get('api_key') == api_key for _, _, params in server.requests)
+
+
+@pytest.fixture
+def history_server(monkeypatch):
+    # 履歴サーバーからのページ取得用（検索結果は450件）
+    with FakeEutilsServer(results_per_search=450) as server:
+        monkeypatch.setattr(pubmed_api, '_client', fast_client(server, max_retries=1))
+        yield server
+
+
+def efetch_pages(server):
+    return [(int(params['retstart']), int(params['retmax']))
+            for _, endpoint, params in server.requests if endpoint == 'efetch.fcgi']
+
+
+def test_article_batches_page_through_history(history_server):
+    pages = list(iter_pubmed_article_batches('crowding', batch_size=200))
+
+    assert [len(page) for page in pages] == [200, 200, 50]
+    expected = search_pmids(build_search_term('crowding'), 450)
+    assert [article['pmid'] for page in pages for article in page] == expected
+    assert efetch_pages(history_server) == [(0, 200), (200, 200), (400, 50)]
+    # PMIDはURLに並べず、履歴サーバーの WebEnv/query_key で取得する
+    assert all('id' not in params for _, _, params in history_server.requests)
+
+
+def test_article_batches_stop_at_max_records(history_server):
+    pages = list(iter_pubmed_article_batches('crowding', batch_size=200, max_records=250))
+
+    assert [len(page) for page in pages] == [200, 50]
+    assert efetch_pages(history_server) == [(0, 200), (200, 50)]
+
+
+def test_article_batches_raise_on_failed_page(history_server):
+    batches = iter_pubmed_article_batches('crowding', batch_size=200)
+    assert len(next(batches)) == 200
+
+    # 再試行を使い切ったページは、打ち切りではなく例外として呼び出し側に伝わる
+    history_server.fail_next(503, 503)
+    with pytest.raises(requests.exceptions.HTTPError):
+        next(batches)
+
+
+def test_article_batches_raise_on_truncated_page(history_server):
+    batches = iter_pubmed_article_batches('crowding', batch_size=200)
+    assert len(next(batches)) == 200
+
+    history_server.truncate_next()
+    with pytest.raises(ET.ParseError):
+        next(batches)
@@ -0,0 +1,128 @@
+import xml.etree.ElementTree as ET
+
+import baseline_pubmed
+import pubmed_api
+from fake_eutils import article_set_xml, article_xml
+
+PMIDS = [str(30000000 + i * 17) for i in range(300)]
+
+
+class ChunkedStream:
+    """
+    少しずつしか読み出せない（seek できない）レスポンス本文の代わり。
+    """
+
+    def __init__(self, data, chunk_size=997):
+        self._data = data
+        self._position = 0
+        self._chunk_size = chunk_size
+
+    def read(self, size=-1):
+        size = self._chunk_size if size < 0 else min(size, self._chunk_size)
+        chunk = self._data[self._position:self._position + size]
+        self._position += len(chunk)
+        return chunk
+
+
+def assert_same_as_baseline(expected, actual):
+    assert len(actual) == len(expected)
+    for old, new in zip(expected, actual):
+        # 変更前の項目はすべてあり、値も同じ（追加された項目は比べない）
+        assert {name: new[name] for name in old} == old
+
+
+def test_streaming_parser_matches_baseline():
+    xml = article_set_xml(PMIDS)
+    expected = baseline_pubmed.parse_articles(xml)
+    assert len(expected) == len(PMIDS)
+    assert_same_as_baseline(expected, list(pubmed_api.iter_parse_pubmed_articles(ChunkedStream(xml))))
+    assert_same_as_baseline(expected, pubmed_api.parse_pubmed_articles(xml))
+
+
+def test_streaming_parser_yields_before_reading_whole_body():
+    xml = article_set_xml(PMIDS)
+    stream = ChunkedStream(xml)
+    articles = pubmed_api.iter_parse_pubmed_articles(stream)
+
+    # 最初の論文は本文の先頭部分を読んだだけで返る
+    assert next(articles)['pmid'] == PMIDS[0]
+    assert stream._position < len(xml) // 10
+    assert [article['pmid'] for article in articles] == PMIDS[1:]
+    assert stream._position == len(xml)
+
+
+def edited_article(pmid, edit):
+    # 合成した論文の要素を edit で書き換えたXML（str）を返す
+    article = ET.fromstring(article_xml(pmid))
+    edit(article)
+    return ET.tostring(article, encoding='unicode')
+
+
+def remove(path):
+    # path は 'タグ' または '親のタグ/タグ'
+    parent_tag, _, tag = path.rpartition('/')
+    def edit(article):
+        for parent in list(article.iter(parent_tag or None)):
+            for child in parent.findall(tag):
+                parent.remove(child)
+    return edit
+
+
+def add_other_abstract(article):
+    other = ET.SubElement(article.find('MedlineCitation'), 'OtherAbstract', Type='Publisher')
+    ET.SubElement(other, 'AbstractText').text = 'Other abstract with 45 patients were included.'
+    ET.SubElement(other, 'AbstractText')
+
+
+def add_collective_author(article):
+    author = ET.SubElement(article.find('MedlineCitation/Article/AuthorList'), 'Author')
+    ET.SubElement(author, 'CollectiveName').text = 'Orthodontic Study Group'
+    author = ET.SubElement(article.find('MedlineCitation/Article/AuthorList'), 'Author')
+    ET.SubElement(author, 'LastName').text = 'Tanaka'
+
+
+EDGE_CASES = [
+    remove('Abstract'),
+    remove('AuthorList'),
+    remove('ArticleIdList'),
+    remove('KeywordList'),
+    remove('MeshHeadingList'),
+    remove('ArticleTitle'),
+    remove('Journal/Title'),
+    remove('PubDate/Year'),
+    add_other_abstract,
+    add_collective_author,
+]
+
+
+def test_article_fields_match_baseline():
+    parts = [article_xml(pmid) for pmid in PMIDS]
+    parts += [edited_article(str(40000000 + i), edit) for i, edit in enumerate(EDGE_CASES)]
+    xml = ('<PubmedArticleSet>' + ''.join(parts) + '</PubmedArticleSet>').encode('utf-8')
+
+    expected = baseline_pubmed.parse_articles(xml)
+    actual = [pubmed_api._article_to_dict(article, pubmed_api._article_fields(article))
+              for article in ET.fromstring(xml).iter('PubmedArticle')]
+    assert len(expected) == len(PMIDS) + len(EDGE_CASES)
+    assert_same_as_baseline(expected, actual)
+
+
+def test_article_fields_ignore_referenced_pmids_and_dois():
+    def edit(article):
+        citation = article.find('MedlineCitation')
+        # 参照先のPMIDを論文自身のPMIDより前に置き、DOIは参考文献にだけ持たせる
+        comments = citation.find('CommentsCorrectionsList')
+        citation.remove(comments)
+        citation.insert(0, comments)
+        data = article.find('PubmedData')
+        data.remove(data.find('ArticleIdList'))
+        reference = ET.SubElement(ET.SubElement(data, 'ReferenceList'), 'Reference')
+        ET.SubElement(ET.SubElement(reference, 'ArticleIdList'), 'ArticleId', IdType='doi').text = '10.1000/cited'
+
+    xml = ('<PubmedArticleSet>' + edited_article('50000001', edit) + '</PubmedArticleSet>').encode('utf-8')
+    fields = pubmed_api._article_fields(ET.fromstring(xml).find('PubmedArticle'))
+    assert fields['pmid'] == '50000001' and fields['doi'] is None
+
+    # 変更前の .// 検索は参照先のPMIDとDOIを拾っていた
+    baseline = baseline_pubmed.parse_articles(xml)[0]
+    assert baseline['pmid'] == '50000008' and baseline['doi'] == '10.1000/cited'
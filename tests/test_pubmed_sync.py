@@ -0,0 +1,67 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import paper_store
+import pubmed_api
+import pubmed_cache
+from batch_pubmed_fetch import batch_fetch_articles
+from fake_eutils import FakeEutilsServer
+from pubmed_api import PubMedClient, TokenBucket
+from pubmed_sync import STATE_VERSION, format_pubmed_date
+
+KEYWORD = 'dental crowding evidence'
+
+
+@pytest.fixture
+def harvest_dir(tmp_path, monkeypatch):
+    # 論文CSV・同期状態・キャッシュを一時ディレクトリに置き、偽の E-utilities サーバーに接続する
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('NCBI_API_KEY', raising=False)
+    monkeypatch.setattr(pubmed_api, '_rate_limiter', TokenBucket(1000, capacity=1000))
+    cache = pubmed_cache.PubMedCache(str(tmp_path / 'pubmed_cache.db'))
+    monkeypatch.setattr(pubmed_cache, '_cache', cache)
+    with FakeEutilsServer() as server:
+        monkeypatch.setattr(pubmed_api, '_client', PubMedClient(
+            base_url=server.url, backoff_factor=0.01, rate_limiter=TokenBucket(1000, capacity=1000)))
+        # 前回の同期から1週間たった状態（更新分として未登録の論文が返される）
+        state = {'version': STATE_VERSION,
+                 'keywords': {KEYWORD: {'last_sync': format_pubmed_date(date.today() - timedelta(days=7)),
+                                        'last_pmids': []}}}
+        (tmp_path / 'pubmed_sync.json').write_text(json.dumps(state), encoding='utf-8')
+        yield tmp_path
+    cache.close()
+
+
+def test_sync_date_advances_after_successful_store(harvest_dir):
+    assert batch_fetch_articles([KEYWORD], incremental=True) == 20
+
+    state = json.loads((harvest_dir / 'pubmed_sync.json').read_text(encoding='utf-8'))
+    assert state['keywords'][KEYWORD]['last_sync'] == format_pubmed_date(date.today())
+    assert len(state['keywords'][KEYWORD]['last_pmids']) == 20
+
+
+def test_failed_store_keeps_sync_state(harvest_dir, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(paper_store.PaperStore, 'upsert_rows', fail)
+    before = (harvest_dir / 'pubmed_sync.json').read_bytes()
+
+    assert batch_fetch_articles([KEYWORD], incremental=True) == 0
+    # 保存できなかった論文を次回も取得し直せるよう、同期日は進めない
+    assert (harvest_dir / 'pubmed_sync.json').read_bytes() == before
+
+
+def test_failed_index_write_keeps_sync_state(harvest_dir, monkeypatch):
+    import search_index
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(search_index.SearchIndex, '_append_log', fail)
+    before = (harvest_dir / 'pubmed_sync.json').read_bytes()
+
+    batch_fetch_articles([KEYWORD], incremental=True)
+    assert (harvest_dir / 'pubmed_sync.json').read_bytes() == before
@@ -0,0 +1,73 @@
+import gzip
+import re
+from datetime import date
+
+import baseline_report
+from conftest import EVIDENCE_LEVELS, make_papers
+from ortho_core.evidence_index import EvidenceIndex
+from ortho_core.reference_data import get_reference_tables
+from ortho_core.render import (
+    EVIDENCE_LEVEL_STYLES, _reference_rows, _render_evidence_record, encode_report_files, generate_html_report,
+)
+from ortho_core.report import build_report
+
+REPORT_DATE = date(2024, 4, 1)
+
+
+def render(papers, issues=('叢生',), notes='', age=15, gender='女性'):
+    index = EvidenceIndex.from_papers(papers)
+    report = build_report(age, gender, list(issues), index, additional_notes=notes, report_date=REPORT_DATE)
+    return generate_html_report(
+        age, gender, list(issues), report['markdown_lines'], report['high_risks'], report['necessity_score'],
+        report['economic_benefits'], get_reference_tables()['future_scenarios'], additional_notes=notes,
+        evidence_index=index, report_date=REPORT_DATE
+    )
+
+
+def test_output_is_byte_stable():
+    papers = make_papers(50)
+    first = render(papers, notes='経過観察中')
+    # プロセス内のキャッシュがない状態から作り直しても同じバイト列になる
+    _render_evidence_record.cache_clear()
+    _reference_rows.cache_clear()
+    second = render(papers, notes='経過観察中')
+    assert first.encode('utf-8') == second.encode('utf-8')
+
+    files = encode_report_files(['# レポート'], first, compress_html=True)
+    assert files == encode_report_files(['# レポート'], second, compress_html=True)
+    assert gzip.decompress(files['html.gz']) == first.encode('utf-8')
+
+
+def test_notes_and_titles_are_escaped():
+    papers = make_papers(3, title='Crowding & caries <b>{i}</b>')
+    html = render(papers, notes='<script>alert("x")</script> & 注意')
+    assert '<script>' not in html
+    assert '&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt; &amp; 注意' in html
+    assert '<b>0</b>' not in html
+    assert '<em>Crowding &amp; caries &lt;b&gt;0&lt;/b&gt;</em>' in html
+
+
+def test_evidence_level_label_is_evaluated():
+    html = render(make_papers(len(EVIDENCE_LEVELS)))
+    for level in EVIDENCE_LEVELS:
+        assert f'エビデンスレベル {level}: {EVIDENCE_LEVEL_STYLES[level]["text"]}' in html
+    assert '.get(evidence_level' not in html
+
+
+def test_risk_items_match_baseline():
+    papers = make_papers(30)
+    issues = ['叢生', '開咬']
+    index = EvidenceIndex.from_papers(papers)
+    report = build_report(15, '女性', issues, index, report_date=REPORT_DATE)
+    args = (15, '女性', issues, report['markdown_lines'], report['high_risks'], report['necessity_score'],
+            report['economic_benefits'], get_reference_tables()['future_scenarios'])
+    baseline_report.set_papers(papers)
+    baseline = baseline_report.generate_html_report(*args)
+    html = generate_html_report(*args, evidence_index=index, report_date=REPORT_DATE)
+
+    # 高リスク項目と論文ごとのリスク記述・DOIが変更前と同じ順序で並ぶ
+    def items(text):
+        return (re.findall(r'<div class="risk-item high-risk">(.*?)</div>', text),
+                re.findall(r'href="https://doi.org/([^"]+)"', text))
+    assert items(html) == items(baseline)
+    assert len(items(html)[1]) == len(papers)
@@ -0,0 +1,75 @@
+from datetime import date
+
+from ortho_core.report_cache import ReportCache
+
+
+def files(size):
+    return {'md': b'#' * (size // 2), 'html': b'<' * (size - size // 2)}
+
+
+def test_least_recently_used_reports_are_evicted_by_bytes():
+    cache = ReportCache(max_bytes=1000)
+    for key in 'abc':
+        cache.put(key, {'key': key}, files(300))
+    # a を使い直すと、最も長く使われていないのは b になる
+    assert cache.get('a') == ({'key': 'a'}, files(300))
+
+    cache.put('d', {'key': 'd'}, files(300))
+    assert cache.get('b') is None
+    assert [key for key in 'acd' if cache.get(key) is not None] == ['a', 'c', 'd']
+    assert cache.stats() == {'entries': 3, 'bytes': 900, 'max_bytes': 1000, 'hits': 4, 'misses': 1, 'evictions': 1}
+
+    # 大きなレポートは、上限に収まるまで古いものから削除する
+    cache.put('e', {'key': 'e'}, files(800))
+    assert cache.get('e') is not None and cache.get('d') is None
+    assert cache.stats()['bytes'] == 800 and cache.stats()['evictions'] == 4
+
+
+def test_oversize_report_is_not_stored():
+    cache = ReportCache(max_bytes=1000)
+    cache.put('a', {'key': 'a'}, files(400))
+    cache.put('big', {'key': 'big'}, files(1001))
+
+    assert cache.get('big') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['bytes'] == 400 and cache.stats()['evictions'] == 0
+
+    # 同じキーで上限を超えるレポートを保存し直すと、古い内容も残さない
+    cache.put('a', {'key': 'a'}, files(2000))
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+
+
+def test_replacing_a_key_updates_size():
+    cache = ReportCache(max_bytes=1000)
+    cache.put('a', {'version': 1}, files(600))
+    cache.put('a', {'version': 2}, files(200))
+    assert cache.get('a') == ({'version': 2}, files(200))
+    assert cache.stats()['entries'] == 1 and cache.stats()['bytes'] == 200
+
+
+def test_get_or_create_counts_hits_and_misses():
+    cache = ReportCache()
+    calls = []
+
+    def create():
+        calls.append(1)
+        return {'n': len(calls)}, files(10)
+
+    key = ReportCache.make_key(age=15, issues=['叢生'])
+    assert cache.get_or_create(key, create) == ({'n': 1}, files(10))
+    assert cache.get_or_create(key, create) == ({'n': 1}, files(10))
+    assert len(calls) == 1
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+    cache.clear()
+    assert cache.get_or_create(key, create) == ({'n': 2}, files(10))
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 2)
+
+
+def test_make_key_depends_on_every_input():
+    key = ReportCache.make_key(age=15, issues=['叢生', '開咬'], report_date=date(2024, 4, 1))
+    assert key == ReportCache.make_key(report_date=date(2024, 4, 1), issues=['叢生', '開咬'], age=15)
+    assert key != ReportCache.make_key(age=15, issues=['開咬', '叢生'], report_date=date(2024, 4, 1))
+    assert key != ReportCache.make_key(age=16, issues=['叢生', '開咬'], report_date=date(2024, 4, 1))
+    assert key != ReportCache.make_key(age=15, issues=['叢生', '開咬'], report_date=date(2024, 4, 2))
@@ -0,0 +1,53 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from ortho_core.scoring import (
+    ISSUE_COLUMNS, batch_economic_benefits, batch_ortho_necessity_scores, calculate_economic_benefits,
+    calculate_ortho_necessity_score, issues_to_matrix,
+)
+
+# 年齢・スコアの区分の境界の前後
+BOUNDARY_AGES = [0, 5, 11, 12, 13, 17, 18, 19, 24, 25, 26, 34, 35, 39, 40, 41, 55, 56, 59, 60, 61, 75, 100]
+ALL_SUBSETS = [list(subset) for size in range(len(ISSUE_COLUMNS) + 1)
+               for subset in itertools.combinations(ISSUE_COLUMNS, size)]
+
+
+def cohort():
+    # スカラー版は1件に数msかかるため、年齢ごとにずらした一部の組み合わせを比べる
+    # （境界の年齢では問題の組み合わせの1/4、それ以外の年齢では1/25。全体ですべての組み合わせを含む）
+    cases = [(age, issues) for age in BOUNDARY_AGES for issues in ALL_SUBSETS[age % 4::4]]
+    cases += [(age, issues) for age in range(101) if age not in BOUNDARY_AGES
+              for issues in ALL_SUBSETS[age % 25::25]]
+    return cases
+
+
+@pytest.fixture(scope='module')
+def cases():
+    return cohort()
+
+
+def test_necessity_scores_match_scalar(cases):
+    ages = np.array([age for age, _ in cases])
+    batch = batch_ortho_necessity_scores(ages, issues_to_matrix([issues for _, issues in cases]))
+    for i, (age, issues) in enumerate(cases):
+        expected = calculate_ortho_necessity_score(age, issues)
+        assert {name: batch[name][i].item() for name in expected} == expected, (age, issues)
+
+
+def test_economic_benefits_match_scalar(cases):
+    ages = np.array([age for age, _ in cases])
+    batch = batch_economic_benefits(ages, issues_to_matrix([issues for _, issues in cases]))
+    for i, (age, issues) in enumerate(cases):
+        expected = calculate_economic_benefits(age, issues)
+        assert {name: batch[name][i].item() for name in expected} == expected, (age, issues)
+
+
+def test_issues_to_matrix_ignores_unknown_issues():
+    matrix = issues_to_matrix([['開咬', '不明な問題'], [], ISSUE_COLUMNS])
+    assert matrix.tolist() == [
+        [column == '開咬' for column in ISSUE_COLUMNS],
+        [False] * len(ISSUE_COLUMNS),
+        [True] * len(ISSUE_COLUMNS),
+    ]
@@ -0,0 +1,197 @@
+import math
+import multiprocessing
+import random
+from collections import Counter
+
+import pytest
+
+from conftest import make_paper_row
+from paper_store import get_paper_store
+from search_index import FIELD_WEIGHTS, MISSING_VALUES, SearchIndex, search_papers, tokenize
+
+WORDS = ['crowding', 'caries', 'periodontal', 'open', 'bite', 'crossbite', 'adolescent', 'aligner', 'retention',
+         'relapse', 'cephalometric', 'extraction', 'expansion', 'maxillary', 'mandibular', 'trauma']
+RISKS = ['叢生により齲蝕リスクが上昇', '開咬で発音障害が増加', '過蓋咬合で顎関節症リスク', '交叉咬合と顎発育異常']
+QUERIES = ['crowding caries', 'open bite', 'relapse after retention', 'maxillary expansion trauma', '齲蝕リスク',
+           '顎関節症', 'CROWDING', 'unknownword']
+
+
+def make_documents(count, seed=0, first_pmid=1):
+    rng = random.Random(seed)
+    return [{
+        'pmid': str(pmid),
+        'title': ' '.join(rng.choices(WORDS, k=rng.randint(3, 8))),
+        'abstract': rng.choice([' '.join(rng.choices(WORDS, k=rng.randint(10, 60))), '抄録なし']),
+        'mesh_terms': ', '.join(rng.sample(WORDS, 2)),
+        'keywords': rng.choice(['キーワードなし', 'orthodontics']),
+        'issue': rng.choice(['叢生', '開咬']),
+        'risk_description': rng.choice(RISKS),
+    } for pmid in range(first_pmid, first_pmid + count)]
+
+
+def reference_scores(documents, query, k1=1.2, b=0.75):
+    # 索引を使わずに全論文を走査して求めた BM25 のスコア（同じPMIDは後の論文で置き換える）
+    terms = {}
+    for document in documents:
+        counts = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = document.get(field)
+            if value and value not in MISSING_VALUES:
+                for token in tokenize(value):
+                    counts[token] += weight
+        terms[document['pmid']] = counts
+    average_length = sum(sum(counts.values()) for counts in terms.values()) / len(terms)
+    scores = Counter()
+    for term in set(tokenize(query)):
+        matching = [pmid for pmid, counts in terms.items() if term in counts]
+        idf = math.log(1 + (len(terms) - len(matching) + 0.5) / (len(matching) + 0.5))
+        for pmid in matching:
+            frequency = terms[pmid][term]
+            norm = k1 * (1 - b + b * sum(terms[pmid].values()) / average_length)
+            scores[pmid] += idf * frequency * (k1 + 1) / (frequency + norm)
+    return dict(scores)
+
+
+def assert_matches_reference(index, documents):
+    for query in QUERIES:
+        results = index.search(query, limit=len(documents))
+        assert dict(results) == pytest.approx(reference_scores(documents, query), rel=1e-4), query
+        assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    return str(tmp_path / 'papers.csv')
+
+
+def test_tokenize_splits_japanese_into_ngrams():
+    assert tokenize('叢生のリスク') == ['叢生', '生の', 'のリ', 'リス', 'スク']
+    assert tokenize('The Crowding and ＣＡＲＩＥＳ') == ['crowding', 'caries']
+
+
+def test_search_matches_brute_force_bm25(csv_file):
+    documents = make_documents(300)
+    index = SearchIndex(csv_file)
+    index.add_documents(documents[:200])
+    index.add_documents(documents[200:])
+    assert len(index) == 300
+    assert_matches_reference(index, documents)
+
+    results = index.search('crowding caries', limit=5)
+    assert len(results) == 5
+    assert results == index.search('crowding caries', limit=300)[:5]
+
+
+def test_reopen_replays_log_and_compaction_keeps_results(csv_file):
+    documents = make_documents(150)
+    index = SearchIndex(csv_file)
+    index.add_documents(documents)
+    expected = {query: index.search(query, limit=150) for query in QUERIES}
+
+    reopened = SearchIndex(csv_file)
+    assert reopened.stats()['pending_documents'] == 150
+    assert {query: reopened.search(query, limit=150) for query in QUERIES} == expected
+
+    reopened.compact()
+    assert reopened.stats()['pending_documents'] == 0
+    with open(reopened.log_file, 'rb') as f:
+        assert f.read() == b''
+    compacted = SearchIndex(csv_file)
+    for query in QUERIES:
+        assert dict(compacted.search(query, limit=150)) == pytest.approx(dict(expected[query]), rel=1e-5)
+    assert_matches_reference(compacted, documents)
+
+
+def test_replace_and_remove_documents(csv_file):
+    documents = make_documents(50)
+    index = SearchIndex(csv_file)
+    index.add_documents(documents)
+    replacement = dict(documents[0], title='bracket debonding', abstract='抄録なし', mesh_terms='MeSH用語なし')
+    index.add_documents([replacement])
+    index.remove_documents(['2', '3', '999'])
+
+    def found(index, query):
+        return {pmid for pmid, _ in index.search(query, limit=100)}
+
+    for current in (index, SearchIndex(csv_file)):
+        assert len(current) == 48
+        assert found(current, 'debonding') == {'1'}
+        assert not found(current, ' '.join(WORDS)) & {'2', '3'}
+
+    # 統合すると置き換え前・削除済みの論文は索引から取り除かれ、スコアも残りの論文だけから求まる
+    index.compact()
+    assert index.stats()['documents'] == 48
+    assert_matches_reference(SearchIndex(csv_file), [replacement] + documents[3:])
+
+
+def test_other_instance_sees_appended_documents(csv_file):
+    first = SearchIndex(csv_file)
+    second = SearchIndex(csv_file)
+    first.add_documents(make_documents(20))
+    assert len(second) == 20
+    first.add_documents(make_documents(5, seed=1, first_pmid=21))
+    first.remove_documents(['1'])
+    assert len(second) == 24
+    assert second.search('crowding', limit=50) == first.search('crowding', limit=50)
+
+
+def test_compaction_keeps_documents_appended_by_another_instance(csv_file):
+    first = SearchIndex(csv_file)
+    second = SearchIndex(csv_file)
+    documents = make_documents(30)
+    first.add_documents(documents[:20])
+    second.add_documents(documents[20:])
+    # second がまだ反映していない first の追記も、統合で失われない
+    first.add_documents([dict(documents[0], abstract='zygomatic anchorage')])
+    second.compact()
+
+    reopened = SearchIndex(csv_file)
+    assert reopened.stats()['pending_documents'] == 0
+    assert [pmid for pmid, _ in reopened.search('zygomatic')] == ['1']
+    assert_matches_reference(reopened, [dict(documents[0], abstract='zygomatic anchorage')] + documents[1:])
+
+
+def _add_and_compact(csv_file, worker, batches, batch_size):
+    index = SearchIndex(csv_file)
+    for batch in range(batches):
+        first_pmid = 1 + (worker * batches + batch) * batch_size
+        index.add_documents(make_documents(batch_size, seed=first_pmid, first_pmid=first_pmid))
+        if batch % 2:
+            index.compact()
+
+
+def test_concurrent_processes_do_not_lose_documents(csv_file):
+    workers, batches, batch_size = 3, 6, 20
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_add_and_compact, args=(csv_file, worker, batches, batch_size))
+                 for worker in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    documents = [document for start in range(1, workers * batches * batch_size + 1, batch_size)
+                 for document in make_documents(batch_size, seed=start, first_pmid=start)]
+    assert_matches_reference(SearchIndex(csv_file), documents)
+
+
+def test_partial_log_line_is_ignored(csv_file):
+    index = SearchIndex(csv_file)
+    index.add_documents(make_documents(10))
+    with open(index.log_file, 'ab') as f:
+        f.write(b'{"pmid": "11", "terms": {"crow')
+    reopened = SearchIndex(csv_file)
+    assert len(reopened) == 10
+    assert '11' not in {pmid for pmid, _ in reopened.search('crowding', limit=20)}
+
+
+def test_papers_only_in_csv_are_indexed_from_csv_fields(csv_file):
+    rows = [make_paper_row(1), make_paper_row(2)]
+    rows[0]['title'] = 'Aligner retention outcomes'
+    get_paper_store(csv_file).add_rows(rows)
+
+    assert [pmid for pmid, _ in SearchIndex(csv_file).search('aligner')] == ['1']
+    papers = search_papers('aligner retention', csv_file)
+    assert papers['pmid'].tolist() == ['1']
+    assert papers['score'].iloc[0] > 0
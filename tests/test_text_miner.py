@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+import baseline_pubmed
+import pubmed_api
+
+TERMS = [term for _, terms in pubmed_api.STUDY_TYPE_TERMS + pubmed_api.DENTAL_ISSUE_TERMS for term in terms]
+TERMS += list(pubmed_api.CHILDREN_TERMS + pubmed_api.ADOLESCENT_TERMS + pubmed_api.ADULT_TERMS
+              + pubmed_api.ELDERLY_TERMS)
+FRAGMENTS = [
+    'a total of {n} patients', '{n} subjects were enrolled', 'sample size was {n}', 'the {n} children',
+    'n = {n} adults', 'sample: {n}', '95% CI {a}-{b}', '95% confidence interval of ({a}, {b})',
+    '[{a} to {b}] 95% CI', '95% CI: [{a}; {b}]', 'aged {a} to {b} years', 'ages between {a}-{b}',
+    '{a} to {b} years old', '{a}-{b} years of age', 'mean age was {x}', 'mean age of {x}',
+    '{x}% higher risk', 'risk increased by {x}%', 'odds ratio of {x}', 'relative risk = {x}',
+    'hazard ratio was {x}', 'absolute risk of {x}', 'orthodontic', 'treatment', 'outcome', 'p < 0.05',
+]
+# 小文字化・大文字小文字を区別しない照合で扱いが変わりうる文字
+SPECIAL = ['İ', 'ı', 'ſ', 'K', 'ß', 'Σ', 'ﬁ', '０', '²']
+
+
+def random_text(rng, pieces):
+    words = []
+    for _ in range(pieces):
+        kind = rng.random()
+        if kind < 0.35:
+            words.append(rng.choice(TERMS))
+        elif kind < 0.8:
+            words.append(rng.choice(FRAGMENTS).format(
+                n=rng.randint(1, 999), a=rng.randint(1, 80), b=rng.randint(1, 90),
+                x=rng.choice(['1.5', '12', '0.8', '45.25', '3.'])))
+        else:
+            words.append(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9))))
+    text = ' '.join(words)
+    if rng.random() < 0.3:
+        text = text.upper() if rng.random() < 0.5 else text.title()
+    if rng.random() < 0.2:
+        position = rng.randrange(len(text) + 1)
+        text = text[:position] + rng.choice(SPECIAL) + text[position:]
+    return text
+
+
+def cases(count=3000, seed=20240101):
+    rng = random.Random(seed)
+    for _ in range(count):
+        title = random_text(rng, rng.randint(0, 6))
+        abstract = '' if rng.random() < 0.05 else random_text(rng, rng.randint(1, 25))
+        yield title, abstract, random_text(rng, rng.randint(0, 3)), random_text(rng, rng.randint(0, 3))
+
+
+@pytest.mark.parametrize('name', ['determine_study_type', 'extract_risk_description'])
+def test_title_and_abstract_functions_match_baseline(name):
+    for title, abstract, _, _ in cases():
+        assert getattr(pubmed_api, name)(title, abstract) == getattr(baseline_pubmed, name)(title, abstract)
+
+
+@pytest.mark.parametrize('name', ['extract_sample_size', 'extract_confidence_interval', 'determine_age_group'])
+def test_abstract_functions_match_baseline(name):
+    for _, abstract, _, _ in cases():
+        assert getattr(pubmed_api, name)(abstract) == getattr(baseline_pubmed, name)(abstract)
+
+
+def test_mine_matches_baseline():
+    mismatches = []
+    for title, abstract, keywords, mesh_terms in cases():
+        expected = {
+            'study_type': baseline_pubmed.determine_study_type(title, abstract),
+            'sample_size': baseline_pubmed.extract_sample_size(abstract),
+            'confidence_interval': baseline_pubmed.extract_confidence_interval(abstract),
+            'age_group': baseline_pubmed.determine_age_group(abstract),
+            'risk_description': baseline_pubmed.extract_risk_description(title, abstract),
+            'issue': baseline_pubmed.classify_dental_issue(title, abstract, keywords, mesh_terms),
+        }
+        actual = pubmed_api.TEXT_MINER.mine(title, abstract, keywords, mesh_terms)
+        if actual != expected:
+            mismatches.append((title, abstract, keywords, mesh_terms))
+    assert not mismatches
+
+
+def test_cases_exercise_every_outcome():
+    # 生成したテキストで、各フィールドのほとんどの結果が実際に出現している
+    outcomes = {'study_type': set(), 'age_group': set(), 'issue': set()}
+    found = {'sample_size': 0, 'confidence_interval': 0, 'risk_description': 0}
+    for title, abstract, keywords, mesh_terms in cases():
+        mined = pubmed_api.TEXT_MINER.mine(title, abstract, keywords, mesh_terms)
+        for name in outcomes:
+            outcomes[name].add(mined[name])
+        found['sample_size'] += mined['sample_size'] is not None
+        found['confidence_interval'] += mined['confidence_interval'] is not None
+        found['risk_description'] += mined['risk_description'] != title
+    assert len(outcomes['study_type']) == 9 and len(outcomes['issue']) == 7
+    assert len(outcomes['age_group']) >= 7
+    assert all(count > 100 for count in found.values())